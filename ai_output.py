@@ -0,0 +1,177 @@
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Validation and repair of model output.
+# The model is asked for JSON, but responses can be wrapped in code fences,
+# cut off by the token limit or contain entries of the wrong shape. The parsers
+# here salvage every complete, valid entry instead of discarding the response,
+# so only what is actually missing has to be requested again.
+
+FEEDBACK_TYPES = ("double_down", "reconsider", "raise_the_bar", "affirm")
+
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+
+class AIOutputError(ValueError):
+    """Raised when model output holds no usable payload"""
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*(?:```)?$", text, re.DOTALL)
+    return fenced.group(1) if fenced else text
+
+def complete_objects(text: str) -> List[Any]:
+    """Parse every complete JSON object in text, skipping a truncated tail.
+
+    Objects are found by scanning for balanced braces outside of strings. The
+    outermost objects that are complete are returned, so for a cut-off
+    {"months": [{...}, {...}, {... the complete month objects are returned.
+    """
+    found = []
+    stack = []
+    in_string = False
+    escaped = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == "{":
+            stack.append(position)
+        elif char == "}" and stack:
+            start = stack.pop()
+            try:
+                value = json.loads(text[start:position + 1])
+            except ValueError:
+                continue
+            # Objects nested in this one were collected first; keep the outer one
+            found = [item for item in found if not start <= item[0] < position]
+            found.append((start, value))
+    return [value for _, value in found]
+
+def load_json(text: str) -> Any:
+    """Parse model output as JSON, tolerating code fences and surrounding text; None if nothing parses"""
+    if not text:
+        return None
+    text = _strip_fences(text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start = min((index for index in (text.find("{"), text.find("[")) if index >= 0), default=-1)
+    if start >= 0:
+        try:
+            return json.loads(text[start:])
+        except ValueError:
+            pass
+    return None
+
+def _month_number(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        month = value
+    elif isinstance(value, float) and value.is_integer():
+        month = int(value)
+    elif isinstance(value, str):
+        value = value.strip().lower()
+        if value.isdigit():
+            month = int(value)
+        elif value[:3] in [name[:3] for name in MONTH_NAMES]:
+            month = [name[:3] for name in MONTH_NAMES].index(value[:3]) + 1
+        else:
+            return None
+    else:
+        return None
+    return month if 1 <= month <= 12 else None
+
+def validate_month_entries(entries: Any) -> Dict[int, str]:
+    """Keep the entries that have a month 1-12 and a non-empty description (first entry per month wins)"""
+    months = {}
+    if not isinstance(entries, list):
+        return months
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        month = _month_number(entry.get("month"))
+        description = entry.get("description")
+        if month is None or not isinstance(description, str) or not description.strip():
+            continue
+        months.setdefault(month, description.strip())
+    return months
+
+def parse_months(text: str) -> Tuple[Dict[int, str], bool]:
+    """Get the valid month descriptions from a breakdown response, and whether the response was well-formed.
+
+    Accepts {"months": [...]} or a bare list. A truncated or malformed
+    response yields the complete entries that can be salvaged from it.
+    """
+    payload = load_json(text)
+    if isinstance(payload, dict) and isinstance(payload.get("months"), list):
+        entries, well_formed = payload["months"], True
+    elif isinstance(payload, list):
+        entries, well_formed = payload, True
+    else:
+        # Salvage the complete month objects of a cut-off response
+        objects = complete_objects(text or "")
+        entries = [item for item in objects if isinstance(item, dict) and "month" in item]
+        for item in objects:
+            if isinstance(item, dict) and isinstance(item.get("months"), list):
+                entries = item["months"]
+        well_formed = False
+    months = validate_month_entries(entries)
+    return months, well_formed and len(months) == len(entries)
+
+def validate_feedback(payload: Any) -> Dict[str, str]:
+    """Check a feedback payload and normalize its type; raises AIOutputError if it is unusable"""
+    if not isinstance(payload, dict):
+        raise AIOutputError("Feedback is not a JSON object")
+    text = payload.get("feedback_text")
+    if not isinstance(text, str) or not text.strip():
+        raise AIOutputError("Feedback has no feedback_text")
+    feedback_type = payload.get("feedback_type")
+    if isinstance(feedback_type, str):
+        feedback_type = re.sub(r"[\s-]+", "_", feedback_type.strip().strip('"').lower())
+    if feedback_type not in FEEDBACK_TYPES:
+        raise AIOutputError(f"Feedback type {payload.get('feedback_type')!r} is not one of {', '.join(FEEDBACK_TYPES)}")
+    return {"feedback_text": text.strip(), "feedback_type": feedback_type}
+
+def parse_feedback(text: str) -> Dict[str, str]:
+    """Get a validated feedback payload from a response, repairing a cut-off one when its fields are complete"""
+    payload = load_json(text)
+    if payload is None:
+        # Fields that were completed before the response was cut off
+        payload = {}
+        for field in ("feedback_text", "feedback_type"):
+            match = re.search(rf'"{field}"\s*:\s*"((?:[^"\\]|\\.)*)"', text or "")
+            if match:
+                payload[field] = json.loads(f'"{match.group(1)}"')
+    return validate_feedback(payload)
+
+def parse_batch(text: str) -> Dict[str, Dict[str, Any]]:
+    """Get the per-goal entries of a batched response, keyed by goal id.
+
+    Expects {"goals": [{"id": ..., ...}, ...]}; from a truncated response the
+    complete goal entries are returned.
+    """
+    payload = load_json(text)
+    if isinstance(payload, dict) and isinstance(payload.get("goals"), list):
+        entries = payload["goals"]
+    else:
+        entries = complete_objects(text or "")
+        for item in entries:
+            if isinstance(item, dict) and isinstance(item.get("goals"), list):
+                entries = item["goals"]
+                break
+    batch = {}
+    for entry in entries:
+        if isinstance(entry, dict) and isinstance(entry.get("id"), (str, int)):
+            batch.setdefault(str(entry["id"]), entry)
+    return batch
@@ -1,119 +1,498 @@
-import openai
 import json
+import time
+import hashlib
 from typing import List, Dict, Any
+import config
+import rate_limiter
+import metrics
+import tracing
+import deadlines
+from prompt_builder import PromptBuilder, summarize_progress
+from model_router import ModelRouter
+from local_planner import plan_year
+from ai_output import parse_months, parse_feedback, parse_batch, validate_month_entries, validate_feedback, AIOutputError
+
+BREAKDOWN_SYSTEM_PROMPT = "You are a helpful assistant that creates monthly breakdowns for yearly goals."
+
+BREAKDOWN_TEMPLATE = """
+    I'm planning to achieve the following goal in {year}:
+    
+    Goal: {goal_title}
+    Description: {goal_description}
+    
+    Please create a monthly breakdown for this goal with specific milestones or actions for each month (January through December).
+    Each month should have a clear, actionable description of what I should achieve.
+    
+    Format the response as JSON like this:
+    {{
+        "months": [
+            {{"month": 1, "description": "January milestone"}},
+            {{"month": 2, "description": "February milestone"}},
+            ...and so on for all 12 months
+        ]
+    }}
+    
+    Only respond with the JSON object as specified above, no additional text.
+"""
+
+MISSING_MONTHS_TEMPLATE = """
+    I'm planning to achieve the following goal in {year}:
+    
+    Goal: {goal_title}
+    Description: {goal_description}
+    
+    These are the milestones I already have:
+    {existing_plan}
+    
+    Please create milestones only for these months: {missing_months}.
+    Each month should have a clear, actionable description of what I should achieve.
+    
+    Format the response as JSON like this:
+    {{
+        "months": [
+            {{"month": 3, "description": "March milestone"}}
+        ]
+    }}
+    
+    Only respond with the JSON object as specified above, no additional text.
+"""
+
+# Several goals in one request: each goal is a block tagged with its id, and the
+# response carries one entry per id
+GOAL_BLOCK_TEMPLATE = """
+    [{goal_id}] Year: {year}
+    Goal: {goal_title}
+    Description: {goal_description}
+"""
+
+BATCH_BREAKDOWN_TEMPLATE = """
+    I'm planning to achieve each of the following goals in the year given with it:
+    
+    {goal_blocks}
+    
+    For each goal, please create a monthly breakdown with specific milestones or actions for each month (January through December).
+    Each month should have a clear, actionable description of what I should achieve.
+    
+    Format the response as JSON like this, with one entry per goal id:
+    {{
+        "goals": [
+            {{"id": "goal_1", "months": [
+                {{"month": 1, "description": "January milestone"}},
+                ...and so on for all 12 months
+            ]}}
+        ]
+    }}
+    
+    Only respond with the JSON object as specified above, no additional text.
+"""
+
+# Pause before the first retry of a failed OpenAI request; doubled for each further retry
+OPENAI_RETRY_BACKOFF_SECONDS = 0.5
+
+# Returned when no feedback could be generated; "fallback" keeps it from being fingerprinted
+FALLBACK_FEEDBACK = {
+    "feedback_text": "Unable to generate personalized feedback at this time.",
+    "feedback_type": "affirm",
+    "fallback": True
+}
+
+FEEDBACK_SYSTEM_PROMPT = "You are a goal achievement analyst who provides constructive feedback."
+
+FEEDBACK_TEMPLATE = """
+    I'm tracking progress on this goal:
+    
+    Goal: {goal_title}
+    Description: {goal_description}
+    
+    Here's my progress so far (we're currently in month {current_month}):
+    
+    {status_summary}
+    
+    Based on this progress, provide an analysis of my goal achievement and a recommendation.
+    Choose exactly ONE of these recommendation types:
+    1. "double_down" - if I need to focus more effort on this goal
+    2. "reconsider" - if I should rethink my approach or adjust the goal
+    3. "raise_the_bar" - if I'm doing so well I should set more ambitious targets
+    4. "affirm" - if I'm on track and should continue as planned
+    
+    Format your response as a JSON object with these fields:
+    - feedback_text: [your detailed analysis and advice]
+    - feedback_type: [one of: "double_down", "reconsider", "raise_the_bar", "affirm"]
+    
+    Only respond with the JSON object, no additional text.
+"""
+
+FEEDBACK_BLOCK_TEMPLATE = """
+    [{goal_id}] Goal: {goal_title}
+    Description: {goal_description}
+    Progress so far (we're currently in month {current_month}):
+    {status_summary}
+"""
+
+BATCH_FEEDBACK_TEMPLATE = """
+    I'm tracking progress on these goals:
+    
+    {goal_blocks}
+    
+    For each goal, provide an analysis of my goal achievement and a recommendation based on its progress.
+    Choose exactly ONE of these recommendation types per goal:
+    1. "double_down" - if I need to focus more effort on this goal
+    2. "reconsider" - if I should rethink my approach or adjust the goal
+    3. "raise_the_bar" - if I'm doing so well I should set more ambitious targets
+    4. "affirm" - if I'm on track and should continue as planned
+    
+    Format your response as JSON like this, with one entry per goal id:
+    {{
+        "goals": [
+            {{"id": "goal_1", "feedback_text": "your detailed analysis and advice", "feedback_type": "affirm"}}
+        ]
+    }}
+    
+    Only respond with the JSON object as specified above, no additional text.
+"""
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    size = max(1, size)
+    return [items[start:start + size] for start in range(0, len(items), size)]
 
 class AIService:
-    def __init__(self, api_key):
-        """Initialize the AI service with OpenAI API key"""
+    def __init__(self, api_key, cache=None, router=None):
+        """Initialize the AI service with OpenAI API key, an optional SharedCache for results and a ModelRouter"""
+        # Imported here rather than at module level: the openai package takes
+        # most of a second to import and is only needed once AI features are used
+        import openai
         openai.api_key = api_key
-        # Use the specified model from requirements
-        self.model = "o3-mini-2025-01-31"
+        # The SDK would retry a timed-out request with the same timeout, up to three
+        # times the remaining budget; _create_completion retries within the deadline instead
+        openai.max_retries = 0
+        self.openai = openai
+        self.api_key = api_key
+        # Default model from requirements; cached results are keyed by it, whichever model answered
+        self.model = config.OPENAI_MODEL
+        # Chooses the model for each request from the latency SLOs and observed latencies
+        self.router = router if router is not None else ModelRouter(
+            self.model,
+            models={"breakdowns": config.AI_MODELS_BREAKDOWNS, "feedback": config.AI_MODELS_FEEDBACK},
+            slos={"breakdowns": config.AI_SLO_BREAKDOWNS_SECONDS, "feedback": config.AI_SLO_FEEDBACK_SECONDS},
+            window=config.AI_ROUTER_WINDOW,
+            quantile=config.AI_ROUTER_QUANTILE,
+            probe_seconds=config.AI_ROUTER_PROBE_SECONDS
+        )
+        # Token usage of the most recent call, keyed by operation name
+        self.token_usage = {}
+        self.cache = cache
+    
+    def _cache_key(self, operation: str, system_prompt: str, prompt: str) -> str:
+        """Key for a result: the final prompt captures every input of the call"""
+        payload = json.dumps([self.model, operation, system_prompt, prompt])
+        return f"ai:{operation}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    
+    def _cached_result(self, key: str):
+        if self.cache is None:
+            return None
+        result = self.cache.get(key)
+        metrics.record_cache("shared_ai", result is not None)
+        return result
+    
+    def _store_result(self, key: str, result) -> None:
+        if self.cache is not None:
+            self.cache.set(key, result, ttl=config.SHARED_CACHE_AI_TTL_SECONDS)
+    
+    def _create_completion(self, operation: str, system_prompt: str, prompt: str):
+        """Send a JSON-mode chat completion request to the routed model through the shared OpenAI rate limiter.
+        
+        Raises DeadlineExceeded without a request when no model is expected to
+        answer within the remaining budget.
+        """
+        model = self.router.choose(operation)
+        metrics.AI_ROUTES.inc(operation=operation, model=model or "local")
+        if model is None:
+            raise deadlines.exceeded("openai", f"No model is expected to answer {operation} within the latency budget")
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            for attempt in range(config.OPENAI_MAX_RETRIES + 1):
+                try:
+                    response = self._attempt_completion(operation, model, system_prompt, prompt, attempt)
+                except (self.openai.APIConnectionError, self.openai.RateLimitError,
+                        self.openai.InternalServerError) as e:
+                    # A timed-out request used up its share of the budget; asking again would not be faster
+                    if isinstance(e, self.openai.APITimeoutError) or attempt == config.OPENAI_MAX_RETRIES:
+                        raise
+                    backoff = OPENAI_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                    left = deadlines.remaining()
+                    if left is not None and left <= backoff:
+                        raise
+                    print(f"OpenAI {operation} request failed, retrying in {backoff:.1f}s: {str(e)}")
+                    time.sleep(backoff)
+                    continue
+                outcome = "ok"
+                return response
+        finally:
+            metrics.LLM_REQUESTS.inc(operation=operation, outcome=outcome)
+            metrics.LLM_SECONDS.observe(time.perf_counter() - start, operation=operation)
+    
+    def _attempt_completion(self, operation: str, model: str, system_prompt: str, prompt: str, attempt: int):
+        """Send one request, with the remaining budget as its timeout, and record its latency for the router"""
+        with tracing.span(f"llm.{operation}", model=model, attempt=attempt), \
+                rate_limiter.get_limiter("openai").limit():
+            sent = time.perf_counter()
+            try:
+                # No temperature parameter as specified in requirements
+                response = self.openai.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"},
+                    timeout=deadlines.timeout(config.OPENAI_TIMEOUT_SECONDS, "openai")
+                )
+            except self.openai.APITimeoutError:
+                # A cancelled request tells the router the model is at least this slow
+                self.router.record(model, operation, time.perf_counter() - sent)
+                raise
+            self.router.record(model, operation, time.perf_counter() - sent)
+            return response
+    
+    def _record_usage(self, operation: str, prompt_usage: Dict[str, int], response) -> None:
+        """Store the estimated prompt size and, when reported, the actual token usage of a call"""
+        usage = {f"{name}_tokens": tokens for name, tokens in prompt_usage.items()}
+        reported = getattr(response, "usage", None)
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = getattr(reported, field, None)
+            if isinstance(value, int):
+                usage[f"reported_{field}"] = value
+        self.token_usage[operation] = usage
+    
+    def _goal_sections(self, builder: PromptBuilder, goal_title: str, goal_description: str) -> PromptBuilder:
+        builder.add("goal_title", goal_title, config.PROMPT_TITLE_TOKENS)
+        builder.add("goal_description", goal_description, config.PROMPT_DESCRIPTION_TOKENS)
+        return builder
+    
+    def _breakdown_cache_key(self, goal_title: str, goal_description: str, year: int) -> str:
+        """Key of a goal's breakdowns; batched and single requests share it"""
+        prompt = self._goal_sections(PromptBuilder(BREAKDOWN_TEMPLATE).add("year", year),
+                                     goal_title, goal_description).build()
+        return self._cache_key("monthly_breakdowns", BREAKDOWN_SYSTEM_PROMPT, prompt)
     
     def generate_monthly_breakdowns(self, goal_title: str, goal_description: str, year: int) -> List[Dict[str, Any]]:
         """Generate monthly breakdowns for a yearly goal using OpenAI API"""
-        prompt = f"""
-        I'm planning to achieve the following goal in {year}:
-        
-        Goal: {goal_title}
-        Description: {goal_description}
+        builder = self._goal_sections(PromptBuilder(BREAKDOWN_TEMPLATE).add("year", year), goal_title, goal_description)
+        prompt = builder.build()
         
-        Please create a monthly breakdown for this goal with specific milestones or actions for each month (January through December).
-        Each month should have a clear, actionable description of what I should achieve.
+        # The same goal text gets the same plan, whichever process asks
+        cache_key = self._cache_key("monthly_breakdowns", BREAKDOWN_SYSTEM_PROMPT, prompt)
+        cached = self._cached_result(cache_key)
+        if cached is not None:
+            return cached
         
-        Format the response as JSON like this:
-        {{
-            "months": [
-                {{"month": 1, "description": "January milestone"}},
-                {{"month": 2, "description": "February milestone"}},
-                ...and so on for all 12 months
-            ]
-        }}
+        months = {}
+        retries = config.AI_MISSING_MONTHS_RETRIES
+        # The SLO covers the follow-up requests too; past it the local planner fills in
+        with self.router.slo("breakdowns"):
+            try:
+                response = self._create_completion("monthly_breakdowns", BREAKDOWN_SYSTEM_PROMPT, prompt)
+                self._record_usage("monthly_breakdowns", builder.usage, response)
+                months, well_formed = parse_months(response.choices[0].message.content)
+                metrics.AI_OUTPUT.inc(operation="monthly_breakdowns", result="valid" if well_formed else "repaired")
+            except rate_limiter.RateLimitExceeded:
+                # Shed by the rate limiter: the caller tells the user rather than getting a local plan
+                raise
+            except Exception as e:
+                # The API itself failed; asking again right away would fail the same way
+                print(f"Error generating monthly breakdowns: {str(e)}")
+                retries = 0
+            return self._complete_breakdowns(goal_title, goal_description, year, months, retries, cache_key)
+    
+    def _complete_breakdowns(self, goal_title: str, goal_description: str, year: int, months: Dict[int, str],
+                             retries: int, cache_key: str) -> List[Dict[str, Any]]:
+        """Fill in the months a response left out, cache a complete year and plan the rest locally"""
+        # Ask again for the months that are missing or invalid, not the whole year
+        for _ in range(retries):
+            if len(months) == 12:
+                break
+            months.update(self._request_missing_months(goal_title, goal_description, year, months))
         
-        Only respond with the JSON object as specified above, no additional text.
-        """
+        if len(months) == 12:
+            breakdowns = [{"month": month, "description": months[month]} for month in range(1, 13)]
+            self._store_result(cache_key, breakdowns)
+            return breakdowns
         
+        # Placeholders from the local planner only for the months that could not be generated
+        print(f"Monthly breakdowns incomplete, planning {12 - len(months)} months locally")
+        metrics.AI_OUTPUT.inc(12 - len(months), operation="monthly_breakdowns", result="placeholder")
+        local_plan = plan_year(goal_title, goal_description, year)
+        return [{"month": month, "description": months[month]} if month in months
+                else {"month": month, "description": local_plan[month], "placeholder": True}
+                for month in range(1, 13)]
+    
+    def _request_missing_months(self, goal_title: str, goal_description: str, year: int,
+                                months: Dict[int, str]) -> Dict[int, str]:
+        """Generate milestones for the months missing from a partial breakdown"""
+        missing = [month for month in range(1, 13) if month not in months]
+        existing_plan = "\n".join(f"Month {month}: {description}" for month, description in sorted(months.items()))
+        builder = PromptBuilder(MISSING_MONTHS_TEMPLATE)
+        builder.add("year", year)
+        builder.add("goal_title", goal_title, config.PROMPT_TITLE_TOKENS)
+        builder.add("goal_description", goal_description, config.PROMPT_DESCRIPTION_TOKENS)
+        builder.add("existing_plan", existing_plan or "(none yet)", config.PROMPT_PROGRESS_TOKENS)
+        builder.add("missing_months", ", ".join(str(month) for month in missing))
         try:
-            # No temperature parameter as specified in requirements
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that creates monthly breakdowns for yearly goals."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            # Parse the content as JSON and extract the array
-            result = json.loads(content)
-            
-            # Ensure we have a list
-            if isinstance(result, dict) and "months" in result:
-                return result["months"]
-            elif isinstance(result, list):
-                return result
-            else:
-                # Create a fallback list if format is unexpected
-                return [{"month": i, "description": f"Month {i} milestone"} for i in range(1, 13)]
-                
+            response = self._create_completion("missing_months", BREAKDOWN_SYSTEM_PROMPT, builder.build())
+            self._record_usage("missing_months", builder.usage, response)
+            generated, _ = parse_months(response.choices[0].message.content)
+        except rate_limiter.RateLimitExceeded:
+            raise
         except Exception as e:
-            # Log error and return a default list
-            print(f"Error generating monthly breakdowns: {str(e)}")
-            return [{"month": i, "description": f"Month {i} milestone"} for i in range(1, 13)]
+            print(f"Error generating missing months: {str(e)}")
+            return {}
+        metrics.AI_OUTPUT.inc(operation="monthly_breakdowns", result="rerequested")
+        return {month: description for month, description in generated.items() if month in missing}
+    
+    def _feedback_sections(self, builder: PromptBuilder, goal_title: str, goal_description: str,
+                           monthly_breakdowns: List[Dict], current_month: int) -> PromptBuilder:
+        # Summarize progress within its budget; older months are compacted first
+        status_summary = summarize_progress(
+            monthly_breakdowns,
+            current_month,
+            config.PROMPT_PROGRESS_TOKENS,
+            recent_months=config.PROMPT_RECENT_MONTHS
+        )
+        self._goal_sections(builder, goal_title, goal_description)
+        builder.add("current_month", current_month)
+        builder.add("status_summary", status_summary)
+        return builder
     
     def generate_goal_feedback(self, goal_title: str, goal_description: str, 
                               monthly_breakdowns: List[Dict], 
                               current_month: int) -> Dict[str, Any]:
         """Generate feedback on goal progress based on monthly statuses"""
+        builder = self._feedback_sections(PromptBuilder(FEEDBACK_TEMPLATE), goal_title, goal_description,
+                                          monthly_breakdowns, current_month)
+        prompt = builder.build()
         
-        # Create a status summary to feed into the prompt
-        status_summary = ""
-        for breakdown in monthly_breakdowns:
-            if breakdown["month"] <= current_month:
-                status_summary += f"Month {breakdown['month']}: {breakdown['description']} - Status: {breakdown.get('status', 'unknown')}\n"
-        
-        prompt = f"""
-        I'm tracking progress on this goal:
+        cache_key = self._cache_key("goal_feedback", FEEDBACK_SYSTEM_PROMPT, prompt)
+        cached = self._cached_result(cache_key)
+        if cached is not None:
+            return cached
         
-        Goal: {goal_title}
-        Description: {goal_description}
-        
-        Here's my progress so far (we're currently in month {current_month}):
+        try:
+            with self.router.slo("feedback"):
+                response = self._create_completion("goal_feedback", FEEDBACK_SYSTEM_PROMPT, prompt)
+            self._record_usage("goal_feedback", builder.usage, response)
+            
+            feedback = parse_feedback(response.choices[0].message.content)
+            metrics.AI_OUTPUT.inc(operation="goal_feedback", result="valid")
+            self._store_result(cache_key, feedback)
+            return feedback
         
-        {status_summary}
+        except rate_limiter.RateLimitExceeded:
+            # Shed by the rate limiter: the caller tells the user rather than showing generic feedback
+            raise
+        except Exception as e:
+            # Log error and return a default response
+            print(f"Error generating goal feedback: {str(e)}")
+            if isinstance(e, AIOutputError):
+                metrics.AI_OUTPUT.inc(operation="goal_feedback", result="invalid")
+            return dict(FALLBACK_FEEDBACK)
+    
+    def _batch_request(self, operation: str, system_prompt: str, template: str, blocks: List[str]) -> Dict[str, Dict]:
+        """Send goal blocks in one request and get the response entries by goal id; raises if the request fails"""
+        builder = PromptBuilder(template)
+        builder.add("goal_blocks", "\n\n".join(blocks))
+        response = self._create_completion(operation, system_prompt, builder.build())
+        self._record_usage(operation, builder.usage, response)
+        return parse_batch(response.choices[0].message.content)
+    
+    def generate_monthly_breakdowns_batch(self, goals: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Generate monthly breakdowns for several goals ({"title", "description", "year"}) in shared requests.
         
-        Based on this progress, provide an analysis of my goal achievement and a recommendation.
-        Choose exactly ONE of these recommendation types:
-        1. "double_down" - if I need to focus more effort on this goal
-        2. "reconsider" - if I should rethink my approach or adjust the goal
-        3. "raise_the_bar" - if I'm doing so well I should set more ambitious targets
-        4. "affirm" - if I'm on track and should continue as planned
+        Up to AI_BATCH_MAX_GOALS goals go into one request. Months a batched
+        response leaves out are requested for their goal alone, as in
+        generate_monthly_breakdowns. Results come back in the order of goals.
+        """
+        results = [None] * len(goals)
+        uncached = []
+        for index, goal in enumerate(goals):
+            cache_key = self._breakdown_cache_key(goal["title"], goal["description"], goal["year"])
+            results[index] = self._cached_result(cache_key)
+            if results[index] is None:
+                uncached.append((index, cache_key))
         
-        Format your response as a JSON object with these fields:
-        - feedback_text: [your detailed analysis and advice]
-        - feedback_type: [one of: "double_down", "reconsider", "raise_the_bar", "affirm"]
+        for chunk in _chunks(uncached, config.AI_BATCH_MAX_GOALS):
+            if len(chunk) == 1:
+                goal = goals[chunk[0][0]]
+                results[chunk[0][0]] = self.generate_monthly_breakdowns(goal["title"], goal["description"], goal["year"])
+                continue
+            blocks = []
+            for position, (index, _) in enumerate(chunk, start=1):
+                goal = goals[index]
+                block = PromptBuilder(GOAL_BLOCK_TEMPLATE).add("goal_id", f"goal_{position}").add("year", goal["year"])
+                blocks.append(self._goal_sections(block, goal["title"], goal["description"]).build())
+            retries = config.AI_MISSING_MONTHS_RETRIES
+            try:
+                entries = self._batch_request("batch_monthly_breakdowns", BREAKDOWN_SYSTEM_PROMPT,
+                                              BATCH_BREAKDOWN_TEMPLATE, blocks)
+            except rate_limiter.RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"Error generating batched monthly breakdowns: {str(e)}")
+                entries, retries = {}, 0
+            for position, (index, cache_key) in enumerate(chunk, start=1):
+                goal = goals[index]
+                months = validate_month_entries(entries.get(f"goal_{position}", {}).get("months"))
+                if entries:
+                    metrics.AI_OUTPUT.inc(operation="monthly_breakdowns",
+                                          result="valid" if len(months) == 12 else "repaired")
+                results[index] = self._complete_breakdowns(goal["title"], goal["description"], goal["year"],
+                                                           months, retries, cache_key)
+        return results
+    
+    def generate_goal_feedback_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Generate feedback for several goals ({"title", "description", "monthly_breakdowns", "current_month"}) in shared requests.
         
-        Only respond with the JSON object, no additional text.
+        Up to AI_BATCH_MAX_GOALS goals go into one request. A goal whose entry
+        is missing or invalid is asked for on its own. Results come back in the
+        order of items.
         """
+        results = [None] * len(items)
+        uncached = []
+        for index, item in enumerate(items):
+            prompt = self._feedback_sections(PromptBuilder(FEEDBACK_TEMPLATE), item["title"], item["description"],
+                                             item["monthly_breakdowns"], item["current_month"]).build()
+            cache_key = self._cache_key("goal_feedback", FEEDBACK_SYSTEM_PROMPT, prompt)
+            results[index] = self._cached_result(cache_key)
+            if results[index] is None:
+                uncached.append((index, cache_key))
         
-        try:
-            # No temperature parameter as specified in requirements
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a goal achievement analyst who provides constructive feedback."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-                
-        except Exception as e:
-            # Log error and return a default response
-            print(f"Error generating goal feedback: {str(e)}")
-            return {
-                "feedback_text": "Unable to generate personalized feedback at this time.",
-                "feedback_type": "affirm"
-            }
+        for chunk in _chunks(uncached, config.AI_BATCH_MAX_GOALS):
+            blocks = []
+            for position, (index, _) in enumerate(chunk, start=1):
+                item = items[index]
+                block = PromptBuilder(FEEDBACK_BLOCK_TEMPLATE).add("goal_id", f"goal_{position}")
+                blocks.append(self._feedback_sections(block, item["title"], item["description"],
+                                                      item["monthly_breakdowns"], item["current_month"]).build())
+            try:
+                entries = self._batch_request("batch_goal_feedback", FEEDBACK_SYSTEM_PROMPT,
+                                              BATCH_FEEDBACK_TEMPLATE, blocks) if len(chunk) > 1 else {}
+            except rate_limiter.RateLimitExceeded:
+                raise
+            except Exception as e:
+                # The API itself failed; the same request per goal would fail the same way
+                print(f"Error generating batched goal feedback: {str(e)}")
+                for index, _ in chunk:
+                    results[index] = dict(FALLBACK_FEEDBACK)
+                continue
+            for position, (index, cache_key) in enumerate(chunk, start=1):
+                try:
+                    feedback = validate_feedback(entries.get(f"goal_{position}"))
+                except AIOutputError:
+                    item = items[index]
+                    results[index] = self.generate_goal_feedback(item["title"], item["description"],
+                                                                 item["monthly_breakdowns"], item["current_month"])
+                    continue
+                metrics.AI_OUTPUT.inc(operation="goal_feedback", result="valid")
+                self._store_result(cache_key, feedback)
+                results[index] = feedback
+        return results
@@ -2,23 +2,30 @@ import streamlit as st
 import datetime
 import uuid
 import json
-from database import Database
-from auth import Auth
-from goals import GoalManager
-from ai_service import AIService
+import config
+import services
+import metrics
+import tracing
+import profiler
+import deadlines
+import rate_limiter
 import ui_components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-# Load OpenAI API key
-try:
-    with open('openaikey.txt', 'r') as f:
-        openai_api_key = f.read().strip()
-except Exception as e:
-    st.error(f"Failed to load OpenAI API key: {str(e)}")
-    openai_api_key = ""
+# Shared components, built once per process and reused across reruns
+auth = services.get_auth()
+goal_manager = services.get_goal_manager()
+session_store = services.get_session_store()
+# Offline AI jobs (batched feedback and breakdowns) run on a background worker
+services.get_batch_queue()
+# Scheduled off-peak feedback runs over every active goal (one replica per host runs each)
+services.get_scheduler()
+# Connections, imports, bcrypt and the goals of recent users warm up in the background, once per process
+services.get_warmup()
 
-# Initialize components
-auth = Auth()
-goal_manager = GoalManager(openai_api_key)
+# Metrics side server, started once per process
+if config.METRICS_PORT:
+    metrics.start_metrics_server(config.METRICS_PORT, config.METRICS_HOST, tries=config.METRICS_PORT_RANGE)
 
 # Set page config
 st.set_page_config(
@@ -38,16 +45,63 @@ if 'user_uuid' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state.username = None
     
-if 'goals' not in st.session_state:
-    st.session_state.goals = []
+# Goals, feedback and debug info of this session live in the process-wide
+# session store under this key, so that idle sessions can be evicted
+if 'session_key' not in st.session_state:
+    st.session_state.session_key = str(uuid.uuid4())
     
-if 'current_feedback' not in st.session_state:
-    st.session_state.current_feedback = None
-    
-if 'debug_info' not in st.session_state:
-    st.session_state.debug_info = {}
+# Traces of this session's most recent reruns, shown in the debug panel
+TRACES_PER_SESSION = 10
+if 'traces' not in st.session_state:
+    st.session_state.traces = []
+
+# Per-session profiling, switched on with the ?profile=1 query parameter
+if 'profiling' not in st.session_state:
+    st.session_state.profiling = st.query_params.get("profile") == "1"
+
+def _profiling_session():
+    """Session key of the current script run if its session opted in to profiling.
+
+    Looked up on every profiled block rather than set once here, because
+    callbacks run before this script body on the next rerun.
+    """
+    if get_script_run_ctx() is None or not st.session_state.get('profiling'):
+        return None
+    return st.session_state.get('session_key')
+
+profiler.set_session_lookup(_profiling_session)
+
+# Count this browser session as active
+_script_ctx = get_script_run_ctx()
+if _script_ctx is not None:
+    metrics.touch_session(_script_ctx.session_id)
+
+def _reload_goals():
+    if not st.session_state.user_uuid:
+        return []
+    return goal_manager.get_user_goals(st.session_state.user_uuid)
+
+def get_goals():
+    """Get this session's goals, reloading them if they were evicted from the session store"""
+    try:
+        return session_store.get(st.session_state.session_key, "goals", loader=_reload_goals)
+    except Exception as e:
+        st.error(f"Failed to load goals: {str(e)}")
+        return []
+
+def get_current_feedback():
+    return session_store.get(st.session_state.session_key, "current_feedback")
+
+def get_debug_info():
+    return session_store.get(st.session_state.session_key, "debug_info", default={})
+
+def update_debug_info(**values):
+    session_store.update(st.session_state.session_key, "debug_info", values)
 
 # Auth callbacks
+@metrics.track_callback("login_callback")
+@tracing.traced("callback.login_callback")
+@deadlines.with_deadline(config.DEADLINE_ACTION_SECONDS)
 def login_callback(username, password):
     """Handle login form submission"""
     success, result = auth.login_user(username, password)
@@ -55,12 +109,17 @@ def login_callback(username, password):
         st.session_state.user_logged_in = True
         st.session_state.user_uuid = result
         st.session_state.username = username
+        # Users who logged in recently get their goals loaded by the next process's warm-up
+        services.get_recent_users().note(result)
         load_user_goals()
         st.success(f"Welcome back, {username}!")
         st.rerun()
     else:
         st.error(f"Login failed: {result}")
 
+@metrics.track_callback("signup_callback")
+@tracing.traced("callback.signup_callback")
+@deadlines.with_deadline(config.DEADLINE_ACTION_SECONDS)
 def signup_callback(username, password):
     """Handle signup form submission"""
     if len(username) < 3:
@@ -81,29 +140,37 @@ def signup_callback(username, password):
     else:
         st.error(f"Registration failed: {result}")
 
+@metrics.track_callback("logout")
+@tracing.traced("callback.logout")
+@deadlines.with_deadline(config.DEADLINE_ACTION_SECONDS)
 def logout():
     """Handle logout"""
     st.session_state.user_logged_in = False
     st.session_state.user_uuid = None
     st.session_state.username = None
-    st.session_state.goals = []
-    st.session_state.current_feedback = None
+    session_store.drop(st.session_state.session_key)
     st.rerun()
 
 # Goal management callbacks
+@metrics.track_callback("load_user_goals")
+@tracing.traced("callback.load_user_goals")
+@deadlines.with_deadline(config.DEADLINE_ACTION_SECONDS)
 def load_user_goals():
     """Load goals for the current user"""
     if st.session_state.user_uuid:
         try:
-            st.session_state.goals = goal_manager.get_user_goals(st.session_state.user_uuid)
+            goals = goal_manager.get_user_goals(st.session_state.user_uuid)
+            session_store.set(st.session_state.session_key, "goals", goals)
             
             # Update debug info
-            st.session_state.debug_info["goals_loaded"] = len(st.session_state.goals)
-            st.session_state.debug_info["load_timestamp"] = datetime.datetime.now().isoformat()
+            update_debug_info(goals_loaded=len(goals), load_timestamp=datetime.datetime.now().isoformat())
         except Exception as e:
             st.error(f"Failed to load goals: {str(e)}")
-            st.session_state.debug_info["load_error"] = str(e)
+            update_debug_info(load_error=str(e))
 
+@metrics.track_callback("create_goal_callback")
+@tracing.traced("callback.create_goal_callback")
+@deadlines.with_deadline(config.DEADLINE_AI_ACTION_SECONDS)
 def create_goal_callback(title, description, year):
     """Handle goal creation"""
     try:
@@ -116,82 +183,112 @@ def create_goal_callback(title, description, year):
             )
             
             # Update debug info
-            st.session_state.debug_info["last_goal_created"] = {
+            update_debug_info(last_goal_created={
                 "uuid": goal_uuid,
                 "title": title,
                 "timestamp": datetime.datetime.now().isoformat()
-            }
+            })
             
             # Reload goals
             load_user_goals()
             
             st.success("Goal created successfully with AI-generated monthly breakdown!")
+    except rate_limiter.RateLimitExceeded as e:
+        st.error(f"The AI service is busy, so the goal was not created. Please try again in a moment. ({str(e)})")
+        update_debug_info(create_goal_error=str(e))
     except Exception as e:
         st.error(f"Failed to create goal: {str(e)}")
-        st.session_state.debug_info["create_goal_error"] = str(e)
+        update_debug_info(create_goal_error=str(e))
 
-def update_status_callback(breakdown_uuid, new_status):
+@metrics.track_callback("update_status_callback")
+@tracing.traced("callback.update_status_callback")
+@deadlines.with_deadline(config.DEADLINE_ACTION_SECONDS)
+def update_status_callback(breakdown_uuid, new_status, goal_uuid=None):
     """Update the status of a monthly breakdown"""
-    success = goal_manager.update_monthly_breakdown(breakdown_uuid, status=new_status)
+    success = goal_manager.update_monthly_breakdown(breakdown_uuid, status=new_status, goal_uuid=goal_uuid)
     if success:
         # Reload goals to update the UI
         load_user_goals()
     else:
         st.error("Failed to update status")
 
+@metrics.track_callback("view_feedback_callback")
+@tracing.traced("callback.view_feedback_callback")
+@deadlines.with_deadline(config.DEADLINE_AI_ACTION_SECONDS)
 def view_feedback_callback(goal_uuid):
     """Generate and display AI feedback for a goal"""
     with st.spinner("Analyzing goal progress and generating feedback..."):
-        feedback = goal_manager.generate_feedback(goal_uuid)
+        try:
+            feedback = goal_manager.generate_feedback(goal_uuid)
+        except deadlines.DeadlineExceeded as e:
+            st.error(f"Feedback took too long, please try again: {str(e)}")
+            return
+        except rate_limiter.RateLimitExceeded as e:
+            st.error(f"The AI service is busy, please try again in a moment: {str(e)}")
+            return
         if feedback:
-            st.session_state.current_feedback = feedback
+            session_store.set(st.session_state.session_key, "current_feedback", feedback)
             
             # Update debug info
-            st.session_state.debug_info["last_feedback"] = {
+            update_debug_info(last_feedback={
                 "goal_uuid": goal_uuid,
                 "feedback_type": feedback.get("feedback_type", ""),
                 "timestamp": datetime.datetime.now().isoformat()
-            }
+            })
         else:
             st.error("Failed to generate feedback")
 
 # Main application layout
 def main():
     """Main application function"""
-    ui_components.render_header()
-    
-    # Show logout button if logged in
-    if st.session_state.user_logged_in:
-        col1, col2 = st.columns([0.9, 0.1])
-        with col2:
-            st.button("Logout", on_click=logout)
+    with tracing.span("render"):
+        ui_components.render_header()
         
-        # Show goal creation if user has fewer than 2 goals
-        if len(st.session_state.goals) < 2:
-            ui_components.render_goal_creation_form(create_goal_callback)
+        # Show logout button if logged in
+        if st.session_state.user_logged_in:
+            col1, col2 = st.columns([0.9, 0.1])
+            with col2:
+                st.button("Logout", on_click=logout)
             
-        # Show goals timeline
-        ui_components.render_year_timeline(
-            st.session_state.goals,
-            update_status_callback,
-            view_feedback_callback
-        )
-        
-        # Show feedback if available
-        if st.session_state.current_feedback:
-            ui_components.render_feedback(st.session_state.current_feedback)
+            goals = get_goals()
+            # Show goal creation if user has fewer than 2 goals
+            if len(goals) < 2:
+                ui_components.render_goal_creation_form(create_goal_callback)
+                
+            # Show goals timeline
+            ui_components.render_year_timeline(
+                goals,
+                update_status_callback,
+                view_feedback_callback
+            )
             
+            # Show feedback if available
+            current_feedback = get_current_feedback()
+            if current_feedback:
+                ui_components.render_feedback(current_feedback)
+        else:
+            # Show login/signup forms
+            ui_components.render_login_signup_forms(login_callback, signup_callback)
+    
+    # Close the trace of this rerun (callbacks and rendering) before showing it
+    trace = tracing.finish_rerun("rerun", username=st.session_state.username)
+    if trace:
+        st.session_state.traces = (st.session_state.traces + [trace])[-TRACES_PER_SESSION:]
+        
+    if st.session_state.user_logged_in:
         # Debug information (collapsed by default)
         ui_components.render_debug_info({
             "user_uuid": st.session_state.user_uuid,
             "username": st.session_state.username,
-            "goal_count": len(st.session_state.goals),
-            **st.session_state.debug_info
-        })
-    else:
-        # Show login/signup forms
-        ui_components.render_login_signup_forms(login_callback, signup_callback)
+            "goal_count": len(get_goals()),
+            "session_data_bytes": session_store.session_bytes(st.session_state.session_key),
+            **get_debug_info()
+        }, st.session_state.traces,
+           profiler.hot_functions() if profiler.is_enabled() else None)
+        
+    metrics.finish_rerun()
 
 # Run the app
 if __name__ == "__main__":
-    main()
+    with profiler.profile("rerun"):
+        main()
@@ -1,21 +1,28 @@
 import bcrypt
 import uuid
+import time
 from database import Database
+import metrics
 
 class Auth:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db if db is not None else Database()
         
     def hash_password(self, password):
         """Hash a password using bcrypt"""
+        start = time.perf_counter()
         # Generate a salt and hash the password
         salt = bcrypt.gensalt()
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+        metrics.PASSWORD_HASH_SECONDS.observe(time.perf_counter() - start, operation="hash")
         return hashed.decode('utf-8')
     
     def verify_password(self, password, hashed_password):
         """Verify a password against a hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        start = time.perf_counter()
+        matches = bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        metrics.PASSWORD_HASH_SECONDS.observe(time.perf_counter() - start, operation="verify")
+        return matches
     
     def register_user(self, username, password):
         """Register a new user"""
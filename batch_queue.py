@@ -0,0 +1,249 @@
+"""Offline queue of non-interactive AI work, processed in batches.
+
+Jobs ("feedback" or "breakdowns" for a goal) are appended to a local queue file
+and processed asynchronously: a background worker (or the CLI, e.g. from a
+nightly cron job) takes every pending job, drops duplicates and runs them
+through GoalManager's batched methods, so several goals share one AI request.
+Results are saved to the database like interactive results: stored feedback
+is reused when a user asks for it later.
+
+Usage: python batch_queue.py enqueue {feedback,breakdowns} (--goal UUID ... | --user NAME ...)
+       python batch_queue.py process
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List
+import metrics
+import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on Windows; run a single processor there
+    fcntl = None
+
+KINDS = ("feedback", "breakdowns")
+
+class BatchQueue:
+    """Queue file of AI jobs with a checkpoint of the processed bytes.
+
+    Files in the queue directory:
+      queue.jsonl       one job per line: {"kind", "goal_uuid", "ts"}
+      checkpoint.json   {"offset": bytes of queue.jsonl already processed,
+                         "end": end of the jobs being processed,
+                         "done": [kind, goal_uuid] of those already processed}
+      queue.lock        held briefly to append, read the pending jobs, checkpoint or compact
+      process.lock      held by the one process running jobs, for the whole run
+    """
+
+    def __init__(self, goal_manager, directory: str, batch_size: int = 20, interval: float = 30.0):
+        self.goal_manager = goal_manager
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.queue_path = os.path.join(directory, "queue.jsonl")
+        self.checkpoint_path = os.path.join(directory, "checkpoint.json")
+        self.lock_path = os.path.join(directory, "queue.lock")
+        self.process_lock_path = os.path.join(directory, "process.lock")
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the queue lock of this process and, where supported, of every process"""
+        with self._lock:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _processing(self):
+        """Yield whether this caller became the only processor; another thread or process may be running jobs"""
+        if not self._process_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            with open(self.process_lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        yield False
+                        return
+                try:
+                    yield True
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            self._process_lock.release()
+
+    def enqueue(self, kind: str, goal_uuids: List[str]) -> None:
+        """Queue a job of kind for each goal"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown batch job kind: {kind}")
+        lines = "".join(json.dumps({"kind": kind, "goal_uuid": goal_uuid, "ts": time.time()}) + "\n"
+                        for goal_uuid in goal_uuids)
+        with self._locked():
+            with open(self.queue_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        metrics.BATCH_JOBS.inc(len(goal_uuids), kind=kind, outcome="queued")
+
+    def _read_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return {"offset": 0, "end": None, "done": []}
+        return {"offset": int(checkpoint["offset"]), "end": checkpoint.get("end"), "done": checkpoint.get("done", [])}
+
+    def _write_checkpoint(self, offset: int, end: int = None, done: List[List[str]] = ()) -> None:
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "end": end, "done": list(done)}, f)
+        os.replace(temporary, self.checkpoint_path)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Jobs not processed yet, in queue order"""
+        with self._locked():
+            return self._read_pending(self._read_checkpoint())[0]
+
+    def _read_pending(self, checkpoint: Dict[str, Any]):
+        """Jobs after the checkpoint, leaving out those of an interrupted run that were done, and their end offset"""
+        offset = checkpoint["offset"]
+        try:
+            with open(self.queue_path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        complete = data[:data.rfind(b"\n") + 1]
+        done = {tuple(job) for job in checkpoint["done"]}
+        jobs = []
+        position = offset
+        for line in complete.splitlines(keepends=True):
+            position += len(line)
+            try:
+                job = json.loads(line)
+            except ValueError:
+                continue
+            if checkpoint["end"] is not None and position <= checkpoint["end"] \
+                    and (job.get("kind"), job.get("goal_uuid")) in done:
+                continue
+            jobs.append(job)
+        return jobs, offset + len(complete)
+
+    def process(self) -> Dict[str, int]:
+        """Run every pending job in batches; returns the number of goals processed per kind.
+
+        The queue lock is only held to read the jobs and to checkpoint, so jobs
+        can be queued while the AI requests run. Each batch is checkpointed, so
+        a run that stops part way resumes after the last finished batch. Returns
+        at once, with nothing processed, while another processor is running.
+        """
+        processed = {kind: 0 for kind in KINDS}
+        with self._processing() as processor:
+            if not processor:
+                return processed
+            with self._locked():
+                checkpoint = self._read_checkpoint()
+                jobs, end = self._read_pending(checkpoint)
+            if not jobs:
+                return processed
+            # Jobs of an interrupted run keep their place: the window grows to the new end
+            done = list(checkpoint["done"]) if checkpoint["end"] is not None else []
+            for kind in KINDS:
+                # A goal queued several times is processed once
+                goal_uuids = list(dict.fromkeys(job["goal_uuid"] for job in jobs if job.get("kind") == kind))
+                for start in range(0, len(goal_uuids), self.batch_size):
+                    batch = goal_uuids[start:start + self.batch_size]
+                    try:
+                        with tracing.span("batch_queue.process", kind=kind, goals=len(batch)):
+                            if kind == "feedback":
+                                self.goal_manager.generate_feedback_batch(batch)
+                            else:
+                                self.goal_manager.generate_missing_breakdowns(batch)
+                        metrics.BATCH_JOBS.inc(len(batch), kind=kind, outcome="ok")
+                    except Exception as e:
+                        # Jobs are advisory; a failed batch is logged and not retried
+                        print(f"Batch queue: {kind} batch of {len(batch)} goals failed: {str(e)}")
+                        metrics.BATCH_JOBS.inc(len(batch), kind=kind, outcome="error")
+                    finally:
+                        tracing.finish_rerun("batch_queue")
+                    processed[kind] += len(batch)
+                    done.extend([kind, goal_uuid] for goal_uuid in batch)
+                    with self._locked():
+                        self._write_checkpoint(checkpoint["offset"], end, done)
+            with self._locked():
+                self._write_checkpoint(end)
+                self._compact(end)
+        return processed
+
+    def _compact(self, offset: int) -> None:
+        """Empty the queue file once everything in it has been processed (called with the queue lock held)"""
+        if os.path.getsize(self.queue_path) != offset:
+            return
+        with open(self.queue_path, "w", encoding="utf-8"):
+            pass
+        self._write_checkpoint(0)
+
+    def start(self) -> "BatchQueue":
+        """Process the queue every interval seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="batch-queue", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.process()
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="queue jobs for goals")
+    enqueue.add_argument("kind", choices=KINDS)
+    enqueue.add_argument("--goal", action="append", default=[], help="goal UUID (repeatable)")
+    enqueue.add_argument("--user", action="append", default=[], help="queue every goal of this username (repeatable)")
+    commands.add_parser("process", help="process every pending job now")
+    args = parser.parse_args()
+
+    import services
+    queue = services.get_batch_queue(start=False)
+    if args.command == "enqueue":
+        goal_uuids = list(args.goal)
+        db = services.get_database()
+        for username in args.user:
+            user = db.get_user_by_username(username)
+            if user is None:
+                sys.exit(f"Unknown user: {username}")
+            goal_uuids.extend(goal['uuid'] for goal in db.get_goals_by_user_uuid(user['uuid']))
+        queue.enqueue(args.kind, goal_uuids)
+        print(f"Queued {len(goal_uuids)} {args.kind} jobs")
+    else:
+        processed = queue.process()
+        print(", ".join(f"{count} {kind}" for kind, count in processed.items()) + " goals processed")
+    services.reset()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark import time and per-rerun service construction.
+
+Compares building Auth and GoalManager on every rerun (what app.py used to do)
+against looking them up in the shared service container, and measures the
+import time of the app modules in a fresh interpreter with and without the
+AI service being constructed.
+
+Usage: python benchmarks/bench_startup.py [--reruns 200]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# Add parent directory to path to import modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.append({root!r})
+start = time.perf_counter()
+import config, services, database, auth, goals, ui_components
+services.get_auth()
+manager = services.get_goal_manager()
+{extra}
+elapsed = time.perf_counter() - start
+print(elapsed, 'openai' in sys.modules, 'pandas' in sys.modules)
+"""
+
+def measure_import(extra):
+    """Import the app modules in a fresh interpreter and return (seconds, openai loaded, pandas loaded)"""
+    code = IMPORT_SNIPPET.format(root=ROOT, extra=extra)
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, text=True)
+    elapsed, openai_loaded, pandas_loaded = output.split()
+    return float(elapsed), openai_loaded == "True", pandas_loaded == "True"
+
+def measure_reruns(reruns):
+    """Return seconds per rerun for per-rerun construction and for the shared container"""
+    import config
+    import services
+    from auth import Auth
+    from goals import GoalManager
+    from ai_service import AIService
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        # Old behaviour: config files re-read and every service rebuilt
+        config.load_project_info.cache_clear()
+        Auth()
+        GoalManager("benchmark-key", ai_service=AIService("benchmark-key"))
+    per_rerun_construction = (time.perf_counter() - start) / reruns
+
+    services.reset()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        services.get_auth()
+        services.get_goal_manager()
+    shared_container = (time.perf_counter() - start) / reruns
+    return per_rerun_construction, shared_container
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    print("Cold import of app modules (fresh interpreter)")
+    for label, extra in (("lazy (no AI call yet)", ""),
+                         ("after first AI use", "manager.ai_service")):
+        elapsed, openai_loaded, pandas_loaded = measure_import(extra)
+        print(f"  {label:<24} {elapsed * 1000:>8.1f} ms  openai loaded={openai_loaded}  pandas loaded={pandas_loaded}")
+
+    construction, container = measure_reruns(args.reruns)
+    print("Service setup per rerun")
+    print(f"  {'construct every rerun':<24} {construction * 1e6:>8.1f} us")
+    print(f"  {'shared container':<24} {container * 1e6:>8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the two timeline render modes.
+
+Renders the year timeline for a number of fake goals with Streamlit's AppTest
+and reports the number of elements sent to the frontend and the average rerun
+time per goal for each mode.
+
+Usage: python benchmarks/bench_timeline.py [--goals 2] [--reruns 20]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path to import modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+SCRIPT = f"""
+import sys
+sys.path.append({ROOT!r})
+import streamlit as st
+import ui_components
+
+goals = []
+for g in range(st.session_state.goal_count):
+    goals.append({{
+        "uuid": f"goal-{{g}}",
+        "title": f"Benchmark goal {{g}}",
+        "monthly_breakdowns": [
+            {{"uuid": f"bd-{{g}}-{{m}}", "month": m, "status": "on_track",
+              "description": f"Milestone {{m}} for goal {{g}} " * 3}}
+            for m in range(1, 13)
+        ],
+    }})
+
+ui_components.render_year_timeline(
+    goals,
+    lambda breakdown_uuid, status, goal_uuid: None,
+    lambda goal_uuid: None,
+    mode=st.session_state.mode,
+)
+"""
+
+def count_elements(node):
+    """Count the elements and blocks below a node of the AppTest element tree"""
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(count_elements(child) for child in children.values())
+
+def run_mode(mode, goal_count, reruns):
+    """Render the timeline repeatedly and return (element count, seconds per rerun)"""
+    at = AppTest.from_string(SCRIPT, default_timeout=30)
+    at.session_state["mode"] = mode
+    at.session_state["goal_count"] = goal_count
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    elements = count_elements(at._tree) - 1
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        at.run()
+    elapsed = (time.perf_counter() - start) / reruns
+    return elements, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goals", type=int, default=2)
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'elements':>9} {'elements/goal':>14} {'rerun ms':>9} {'ms/goal':>8}")
+    for mode in ("columns", "editor"):
+        elements, elapsed = run_mode(mode, args.goals, args.reruns)
+        print(f"{mode:<10} {elements:>9} {elements / args.goals:>14.1f} "
+              f"{elapsed * 1000:>9.1f} {elapsed * 1000 / args.goals:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the Gibson AI query transports on large result sets.
+
+Fills a mock Gibson AI server with goals and long monthly breakdowns, then
+runs the same SELECT * queries from several threads through each transport
+and reports the time per query, throughput and bytes sent over the wire.
+The httpx transport only uses HTTP/2 against servers that negotiate it and
+when the h2 package is installed; the mock server speaks HTTP/1.1.
+
+Usage: python benchmarks/bench_transport.py [--goals 50] [--queries 200] [--threads 8] [--db-latency 0.02]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to import modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "tools"))
+# Measure the transports, not the client-side rate limiter
+os.environ.setdefault("GIBSON_RATE_PER_SECOND", "100000")
+os.environ.setdefault("GIBSON_RATE_BURST", "100000")
+
+import transports
+from database import Database
+from mock_servers import MockGibsonServer
+
+QUERY = "SELECT * FROM `goal_monthly_breakdown`"
+
+def fill(db, goal_count):
+    """Create one user with goal_count goals of 12 breakdowns each"""
+    user_uuid = db.create_user("bench_transport", "hashed")
+    for g in range(goal_count):
+        goal_uuid = db.create_goal(user_uuid, f"Benchmark goal {g}", "A long description. " * 20, 2025)
+        for month in range(1, 13):
+            db.create_monthly_breakdown(goal_uuid, month, f"Milestone {month} of goal {g}. " * 10)
+
+def run(db, server, queries, threads):
+    """Run queries concurrently and return (ms per query, queries per second, wire bytes per query)"""
+    db.execute_query(QUERY)
+    server.bytes_sent = 0
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        db.execute_query(QUERY)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(queries)))
+    elapsed = time.perf_counter() - start
+    return sum(latencies) / len(latencies) * 1000, queries / elapsed, server.bytes_sent / queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goals", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds the mock server adds per query")
+    args = parser.parse_args()
+
+    server = MockGibsonServer(latency=args.db_latency).start()
+    try:
+        setup = Database(transport="requests")
+        setup.endpoint = server.endpoint
+        fill(setup, args.goals)
+        rows = len(setup.execute_query(QUERY))
+
+        variants = [
+            ("requests, identity", "requests", False, False),
+            ("requests, gzip", "requests", True, False),
+            ("httpx http/1.1, gzip", "httpx", True, False),
+        ]
+        if transports.HTTP2_AVAILABLE:
+            variants.append(("httpx http/2, gzip", "httpx", True, True))
+        else:
+            print("h2 is not installed, skipping the HTTP/2 variant")
+
+        print(f"{rows} rows per query, {args.queries} queries on {args.threads} threads")
+        print(f"{'transport':<22} {'ms/query':>9} {'queries/s':>10} {'wire KB/query':>14}")
+        for label, name, compress, http2 in variants:
+            server.compress = compress
+            db = Database(transport=transports.create_transport(name, http2=http2, max_connections=args.threads))
+            db.endpoint = server.endpoint
+            latency, throughput, wire_bytes = run(db, server, args.queries, args.threads)
+            db.transport.close()
+            print(f"{label:<22} {latency:>9.1f} {throughput:>10.1f} {wire_bytes / 1024:>14.1f}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
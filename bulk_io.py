@@ -0,0 +1,356 @@
+"""Streaming import and export of goals with their monthly breakdowns and feedback.
+
+Two formats are supported:
+  jsonl   one goal per line, with nested "monthly_breakdowns" and "feedback" lists
+  csv     one goal per row, with month_1..month_12 (and month_N_status) columns and
+          the goal's latest feedback
+
+Export pages through the goal table by id, so memory use does not grow with
+the number of goals. Import reads the input in batches and writes each batch
+with one multi-row INSERT per table. Goals imported without breakdowns can
+have them generated by the AI (several goals per request, several requests at
+once) or queued as jobs for the offline batch queue.
+
+A goal keeps the "uuid" of its record. Goals that already exist are not
+created again and only get the months and feedback they do not have yet, so
+an import that stopped part way can be run again on the same file to finish.
+
+Usage: python bulk_io.py export [--format {jsonl,csv}] [--output FILE]
+       python bulk_io.py import FILE [--format {jsonl,csv}] [--breakdowns {none,generate,queue}]
+"""
+import re
+import sys
+import csv
+import json
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List
+import config
+import metrics
+import rate_limiter
+import tracing
+
+FORMATS = ("jsonl", "csv")
+# What to do for imported goals that come without monthly breakdowns
+BREAKDOWN_MODES = ("none", "generate", "queue")
+
+GOAL_FIELDS = ["uuid", "username", "title", "description", "year", "status", "date_created"]
+CSV_FIELDS = (GOAL_FIELDS
+              + [f"month_{month}" for month in range(1, 13)]
+              + [f"month_{month}_status" for month in range(1, 13)]
+              + ["feedback_text", "feedback_type", "feedback_timestamp"])
+
+_ISO_TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})")
+
+def detect_format(path: str) -> str:
+    """Format of a file from its extension (JSON Lines unless it ends in .csv)"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
+def _timestamp(value: Any) -> str:
+    """A timestamp in the form both SQLite and MySQL accept, or None"""
+    match = _ISO_TIMESTAMP.match(str(value or ""))
+    return f"{match.group(1)} {match.group(2)}" if match else None
+
+# Export
+
+def iter_goals(db, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Every goal as an export record, read a page at a time (three queries per page)"""
+    after_id = 0
+    while True:
+        with tracing.span("bulk_io.export_page", after_id=after_id):
+            page = db.get_goals_page(after_id, page_size)
+            if not page:
+                return
+            goal_uuids = [goal['uuid'] for goal in page]
+            breakdowns = {}
+            for row in db.get_monthly_breakdowns_for_goals(goal_uuids):
+                breakdowns.setdefault(row['goal_uuid'], []).append(row)
+            feedback = {}
+            for row in db.get_feedback_for_goals(goal_uuids):
+                feedback.setdefault(row['goal_uuid'], []).append(row)
+        tracing.finish_rerun("bulk_io")
+        for goal in page:
+            yield {
+                **{field: goal.get(field) for field in GOAL_FIELDS},
+                "monthly_breakdowns": [
+                    {"month": row['month'], "description": row['description'], "status": row['status']}
+                    for row in sorted(breakdowns.get(goal['uuid'], []), key=lambda row: row['month'])
+                ],
+                "feedback": [
+                    {"feedback_text": row['feedback_text'], "feedback_type": row['feedback_type'],
+                     "feedback_timestamp": row['feedback_timestamp']}
+                    for row in sorted(feedback.get(goal['uuid'], []), key=lambda row: str(row['feedback_timestamp']),
+                                      reverse=True)
+                ]
+            }
+        metrics.BULK_GOALS.inc(len(page), operation="export", outcome="ok")
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+def _csv_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {field: record.get(field) for field in GOAL_FIELDS}
+    for breakdown in record.get("monthly_breakdowns") or []:
+        row[f"month_{breakdown['month']}"] = breakdown.get("description")
+        row[f"month_{breakdown['month']}_status"] = breakdown.get("status")
+    latest = (record.get("feedback") or [None])[0]
+    if latest:
+        row.update({key: latest.get(key) for key in ("feedback_text", "feedback_type", "feedback_timestamp")})
+    return row
+
+def write_records(records: Iterable[Dict[str, Any]], stream: IO[str], fmt: str = "jsonl") -> int:
+    """Write records to a text stream as they come; returns how many were written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(_csv_row(record))
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record, default=str) + "\n")
+            count += 1
+    return count
+
+# Import
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    record = {field: row.get(field) or None for field in GOAL_FIELDS}
+    record["monthly_breakdowns"] = [
+        {"month": month, "description": row[f"month_{month}"], "status": row.get(f"month_{month}_status") or None}
+        for month in range(1, 13) if row.get(f"month_{month}")
+    ]
+    record["feedback"] = [
+        {key: row.get(key) or None for key in ("feedback_text", "feedback_type", "feedback_timestamp")}
+    ] if row.get("feedback_text") else []
+    return record
+
+def read_records(stream: IO[str], fmt: str = "jsonl") -> Iterator[Dict[str, Any]]:
+    """Records from a text stream, one at a time; blank JSON Lines are skipped"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield _csv_record(row)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {str(e)}")
+
+def _valid_breakdowns(goal_uuid: str, breakdowns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"goal_uuid": goal_uuid, "month": int(breakdown['month']), "description": breakdown['description'],
+         "status": breakdown.get('status')}
+        for breakdown in breakdowns or []
+        if str(breakdown.get('month', '')).isdigit() and 1 <= int(breakdown['month']) <= 12
+        and breakdown.get('description')
+    ]
+
+class Importer:
+    """Writes records to the database in batches and takes care of missing breakdowns"""
+
+    def __init__(self, goal_manager, batch_size: int = 200, insert_max_rows: int = 1000,
+                 breakdowns: str = "none", ai_concurrency: int = 4, queue=None,
+                 progress: Callable[[Dict[str, int]], None] = None):
+        if breakdowns not in BREAKDOWN_MODES:
+            raise ValueError(f"Unknown breakdown mode: {breakdowns}")
+        if breakdowns == "queue" and queue is None:
+            raise ValueError("Queueing breakdowns needs a batch queue")
+        self.goal_manager = goal_manager
+        self.db = goal_manager.db
+        self.batch_size = max(1, batch_size)
+        self.insert_max_rows = max(1, insert_max_rows)
+        self.breakdowns = breakdowns
+        self.ai_concurrency = max(1, ai_concurrency)
+        self.queue = queue
+        # Called with the counts after every batch
+        self.progress = progress
+        # Users are looked up once per import
+        self._users = {}
+        self.counts = {"goals": 0, "existing": 0, "skipped": 0, "breakdowns": 0, "feedback": 0,
+                       "generated": 0, "queued": 0}
+
+    def _resolve_users(self, usernames: List[str]) -> None:
+        unknown = sorted(set(usernames) - set(self._users))
+        for batch in _batches(unknown, self.batch_size):
+            for user in self.db.get_users_by_usernames(batch):
+                self._users[user['username']] = user['uuid']
+            for username in batch:
+                self._users.setdefault(username, None)
+
+    def _insert(self, method, rows: List[Dict[str, Any]]) -> int:
+        return sum(method(batch) for batch in _batches(rows, self.insert_max_rows))
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert one batch of records; returns the goals that came without breakdowns and still have none"""
+        self._resolve_users([record.get('username') for record in records if record.get('username')])
+        # Goals of the records that a previous run of the import already wrote
+        existing = self.db.get_existing_uuids("goal", [record['uuid'] for record in records if record.get('uuid')])
+        goals, resumed, seen = [], [], set()
+        for record in records:
+            user_uuid = self._users.get(record.get('username'))
+            if user_uuid is None or not record.get('title') or not str(record.get('year', '')).isdigit() \
+                    or (record.get('uuid') and record['uuid'] in seen):
+                self.counts["skipped"] += 1
+                continue
+            goal = {"uuid": record.get('uuid'), "user_uuid": user_uuid, "title": record['title'],
+                    "description": record.get('description') or "", "year": int(record['year']),
+                    "status": record.get('status')}
+            seen.add(goal['uuid'])
+            (resumed if goal['uuid'] in existing else goals).append((record, goal))
+        goal_uuids = self.db.create_goals([goal for _, goal in goals]) if goals else []
+
+        breakdowns, feedback, missing = [], [], []
+        created = 0
+        saved = list(zip(goals, goal_uuids)) + [((record, goal), goal['uuid']) for record, goal in resumed]
+        for (record, goal), goal_uuid in saved:
+            if goal_uuid is None:
+                self.counts["skipped"] += 1
+                continue
+            goal_breakdowns = _valid_breakdowns(goal_uuid, record.get('monthly_breakdowns'))
+            breakdowns.extend(goal_breakdowns)
+            if not goal_breakdowns:
+                missing.append(dict(goal, uuid=goal_uuid))
+            feedback.extend(
+                {"goal_uuid": goal_uuid, "feedback_text": item.get('feedback_text'),
+                 "feedback_type": item.get('feedback_type'), "feedback_timestamp": _timestamp(item.get('feedback_timestamp'))}
+                for item in record.get('feedback') or [] if item.get('feedback_text')
+            )
+            created += goal['uuid'] not in existing
+
+        if resumed:
+            # Months and feedback the previous run already wrote, including breakdowns it generated
+            resumed_uuids = [goal['uuid'] for _, goal in resumed]
+            months = {(row['goal_uuid'], int(row['month']))
+                      for row in self.db.get_monthly_breakdowns_for_goals(resumed_uuids)}
+            texts = {(row['goal_uuid'], row['feedback_text']) for row in self.db.get_feedback_for_goals(resumed_uuids)}
+            breakdowns = [row for row in breakdowns if (row['goal_uuid'], row['month']) not in months]
+            feedback = [row for row in feedback if (row['goal_uuid'], row['feedback_text']) not in texts]
+            planned = {goal_uuid for goal_uuid, _ in months}
+            missing = [goal for goal in missing if goal['uuid'] not in planned]
+        self.counts["breakdowns"] += self._insert(self.db.create_monthly_breakdowns, breakdowns)
+        self.counts["feedback"] += self._insert(self.db.create_feedbacks, feedback)
+        self.counts["goals"] += created
+        self.counts["existing"] += len(resumed)
+        metrics.BULK_GOALS.inc(created, operation="import", outcome="ok")
+        metrics.BULK_GOALS.inc(len(resumed), operation="import", outcome="existing")
+        metrics.BULK_GOALS.inc(len(records) - created - len(resumed), operation="import", outcome="skipped")
+        return missing
+
+    def _plan(self, goals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Breakdown rows for goals, from templates or the AI (runs on a worker thread)"""
+        try:
+            with rate_limiter.priority(rate_limiter.BACKGROUND), tracing.span("bulk_io.plan", goals=len(goals)):
+                plans = self.goal_manager.plan_breakdowns(goals)
+        finally:
+            tracing.finish_rerun("bulk_io.plan")
+        rows = []
+        for goal, plan in zip(goals, plans):
+            rows.extend(_valid_breakdowns(goal['uuid'], plan))
+        return rows
+
+    def _save_plan(self, future) -> None:
+        try:
+            rows = future.result()
+        except Exception as e:
+            # The goals stay without breakdowns; generate_missing_breakdowns can fill them in later
+            print(f"Bulk import: generating breakdowns failed: {str(e)}")
+            metrics.BULK_GOALS.inc(operation="import", outcome="generation_error")
+            return
+        self.counts["generated"] += len({row['goal_uuid'] for row in rows})
+        self.counts["breakdowns"] += self._insert(self.db.create_monthly_breakdowns, rows)
+
+    def run(self, records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Import every record; returns counts of new goals, goals that already existed, skipped records,
+        breakdowns, feedback, generated and queued goals"""
+        executor = ThreadPoolExecutor(max_workers=self.ai_concurrency, thread_name_prefix="bulk-ai") \
+            if self.breakdowns == "generate" else None
+        in_flight = deque()
+        try:
+            # Imports are background work: interactive queries go first
+            with rate_limiter.priority(rate_limiter.BACKGROUND):
+                for records_batch in _batches(records, self.batch_size):
+                    with tracing.span("bulk_io.import_batch", records=len(records_batch)):
+                        missing = self._write_batch(records_batch)
+                        if self.breakdowns == "queue" and missing:
+                            self.queue.enqueue("breakdowns", [goal['uuid'] for goal in missing])
+                            self.counts["queued"] += len(missing)
+                        elif executor is not None:
+                            # Goals go to the AI in batched requests, several requests at once; results are
+                            # saved as they arrive, each request traced on its own and linked to this batch
+                            plan = tracing.wrap(self._plan, detached=True)
+                            for goals in _batches(missing, config.AI_BATCH_MAX_GOALS):
+                                in_flight.append(executor.submit(plan, goals))
+                    tracing.finish_rerun("bulk_io")
+                    if self.progress is not None:
+                        self.progress(dict(self.counts))
+                    if executor is not None:
+                        # Reading pauses while too many requests are outstanding
+                        while len(in_flight) > 2 * self.ai_concurrency:
+                            self._save_plan(in_flight.popleft())
+                while in_flight:
+                    self._save_plan(in_flight.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        return dict(self.counts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write every goal to a file or stdout")
+    export_parser.add_argument("--format", choices=FORMATS)
+    export_parser.add_argument("--output", help="file to write (default: stdout)")
+    import_parser = commands.add_parser("import", help="create goals from a file ('-' for stdin)")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument("--breakdowns", choices=BREAKDOWN_MODES, default="none",
+                               help="for goals without breakdowns: leave them, generate them now, "
+                                    "or queue them for the batch queue")
+    args = parser.parse_args()
+
+    import services
+    goal_manager = services.get_goal_manager()
+    if args.command == "export":
+        fmt = args.format or (detect_format(args.output) if args.output else "jsonl")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as f:
+                count = goal_manager.export_goals(f, fmt)
+        else:
+            count = goal_manager.export_goals(sys.stdout, fmt)
+        print(f"Exported {count} goals", file=sys.stderr)
+    else:
+        fmt = args.format or detect_format(args.file)
+        queue = services.get_batch_queue(start=False) if args.breakdowns == "queue" else None
+        def progress(counts):
+            print(f"{counts['goals']} goals imported, {counts['existing']} already there, "
+                  f"{counts['skipped']} skipped", file=sys.stderr)
+        if args.file == "-":
+            counts = goal_manager.import_goals(sys.stdin, fmt, breakdowns=args.breakdowns, queue=queue,
+                                               progress=progress)
+        else:
+            with open(args.file, "r", encoding="utf-8", newline="") as f:
+                counts = goal_manager.import_goals(f, fmt, breakdowns=args.breakdowns, queue=queue,
+                                                   progress=progress)
+        print(", ".join(f"{count} {name}" for name, count in counts.items()), file=sys.stderr)
+    services.reset()
+
+if __name__ == "__main__":
+    main()
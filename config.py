@@ -0,0 +1,231 @@
+import os
+import json
+from functools import lru_cache
+
+# Runtime settings for the Goal Tracker app.
+# Every value can be overridden with an environment variable and is read once,
+# when this module is first imported.
+
+def _env_str(name, default):
+    """Read a string setting from the environment"""
+    return os.environ.get(name, default)
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+def _env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Invalid number for {name}: {value!r}, using {default}")
+        return default
+
+def _env_list(name, default):
+    """Read a comma-separated list setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _env_bool(name, default):
+    """Read a boolean setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# UI
+# "columns" renders the classic 12-column grid with one selectbox per month,
+# "editor" renders each goal's year as a single data editor.
+TIMELINE_RENDER_MODE = _env_str("GOAL_TRACKER_TIMELINE_MODE", "columns")
+
+# Gibson AI
+GIBSON_ENDPOINT = _env_str("GIBSON_ENDPOINT", "https://api.gibsonai.com/v1/-/query")
+GIBSON_API_KEY = _env_str("GIBSON_API_KEY",
+                          "gAAAAABoKegtPFi_H_deoBWKdlhyzFvAZfOse38cQsVzNrFJJbAPpRyTzX82hcKJpcqn_OBF2PLANc6nf3cvuaONWsWjTTJVQTa-uDKDJTRLGwj1viSMs04=")
+GIBSON_PROJECT_FILE = _env_str("GIBSON_PROJECT_FILE", ".gibsonai")
+# HTTP transport for queries: "requests" (pooled HTTP/1.1) or "httpx"
+# (concurrent queries multiplexed over one HTTP/2 connection when h2 is installed)
+GIBSON_TRANSPORT = _env_str("GIBSON_TRANSPORT", "requests")
+GIBSON_HTTP2 = _env_bool("GIBSON_HTTP2", True)
+# Compression of request bodies: "" (off), "gzip" or "br" (brotli, when installed);
+# bodies shorter than GIBSON_COMPRESS_MIN_BYTES are sent as they are
+GIBSON_REQUEST_ENCODING = _env_str("GIBSON_REQUEST_ENCODING", "")
+GIBSON_COMPRESS_MIN_BYTES = _env_int("GIBSON_COMPRESS_MIN_BYTES", 1024)
+
+# OpenAI
+OPENAI_KEY_FILE = _env_str("OPENAI_KEY_FILE", "openaikey.txt")
+OPENAI_MODEL = _env_str("OPENAI_MODEL", "o3-mini-2025-01-31")
+# Models tried for each kind of request, in order of preference (comma-separated)
+AI_MODELS_BREAKDOWNS = _env_list("GOAL_TRACKER_AI_MODELS_BREAKDOWNS", [OPENAI_MODEL])
+AI_MODELS_FEEDBACK = _env_list("GOAL_TRACKER_AI_MODELS_FEEDBACK", [OPENAI_MODEL])
+# Latency SLO of an interactive request, follow-up requests included (0 disables it);
+# past it the request is cancelled and the local fallback is used
+AI_SLO_BREAKDOWNS_SECONDS = _env_float("GOAL_TRACKER_AI_SLO_BREAKDOWNS", 20.0)
+AI_SLO_FEEDBACK_SECONDS = _env_float("GOAL_TRACKER_AI_SLO_FEEDBACK", 30.0)
+# Latency history of the model router: requests kept per model and operation,
+# the quantile compared with the budget, and the age after which a slow model is tried again
+AI_ROUTER_WINDOW = _env_int("GOAL_TRACKER_AI_ROUTER_WINDOW", 20)
+AI_ROUTER_QUANTILE = _env_float("GOAL_TRACKER_AI_ROUTER_QUANTILE", 0.9)
+AI_ROUTER_PROBE_SECONDS = _env_float("GOAL_TRACKER_AI_ROUTER_PROBE", 300.0)
+
+# Prompt token budgets (estimated tokens per prompt section)
+PROMPT_TITLE_TOKENS = _env_int("GOAL_TRACKER_PROMPT_TITLE_TOKENS", 64)
+PROMPT_DESCRIPTION_TOKENS = _env_int("GOAL_TRACKER_PROMPT_DESCRIPTION_TOKENS", 400)
+PROMPT_PROGRESS_TOKENS = _env_int("GOAL_TRACKER_PROMPT_PROGRESS_TOKENS", 800)
+# Months before the most recent ones are compacted to their status when the
+# progress section is over budget
+PROMPT_RECENT_MONTHS = _env_int("GOAL_TRACKER_PROMPT_RECENT_MONTHS", 3)
+
+# Follow-up requests for months missing from an incomplete breakdown response
+AI_MISSING_MONTHS_RETRIES = _env_int("GOAL_TRACKER_AI_MISSING_MONTHS_RETRIES", 1)
+
+# Reuse of stored monthly breakdowns for goals similar to earlier ones
+TEMPLATE_REUSE_ENABLED = _env_bool("GOAL_TRACKER_TEMPLATE_REUSE", True)
+TEMPLATE_INDEX_PATH = _env_str("GOAL_TRACKER_TEMPLATE_INDEX_PATH", "cache/goal_templates.jsonl")
+# Cosine similarity (0-1) of title and description needed to reuse a template
+TEMPLATE_REUSE_THRESHOLD = _env_float("GOAL_TRACKER_TEMPLATE_REUSE_THRESHOLD", 0.9)
+TEMPLATE_INDEX_MAX_ENTRIES = _env_int("GOAL_TRACKER_TEMPLATE_INDEX_MAX_ENTRIES", 5000)
+# Reuse one user's templates for other users' goals (off: each user only gets their own)
+TEMPLATE_REUSE_SHARED = _env_bool("GOAL_TRACKER_TEMPLATE_REUSE_SHARED", False)
+
+# Goals packed into one batched AI request
+AI_BATCH_MAX_GOALS = _env_int("GOAL_TRACKER_AI_BATCH_MAX_GOALS", 5)
+# Offline queue of non-interactive AI jobs, processed in batches by a background worker
+BATCH_QUEUE_WORKER = _env_bool("GOAL_TRACKER_BATCH_QUEUE_WORKER", True)
+BATCH_QUEUE_DIR = _env_str("GOAL_TRACKER_BATCH_QUEUE_DIR", "batch_jobs")
+BATCH_QUEUE_BATCH_SIZE = _env_int("GOAL_TRACKER_BATCH_QUEUE_BATCH_SIZE", 20)
+BATCH_QUEUE_INTERVAL_SECONDS = _env_float("GOAL_TRACKER_BATCH_QUEUE_INTERVAL", 30.0)
+
+# Bulk import and export (bulk_io.py): goals per export page and per import
+# batch, rows per multi-row INSERT, and AI requests in flight during an import
+BULK_PAGE_SIZE = _env_int("GOAL_TRACKER_BULK_PAGE_SIZE", 500)
+BULK_BATCH_SIZE = _env_int("GOAL_TRACKER_BULK_BATCH_SIZE", 200)
+BULK_INSERT_MAX_ROWS = _env_int("GOAL_TRACKER_BULK_INSERT_MAX_ROWS", 1000)
+BULK_AI_CONCURRENCY = _env_int("GOAL_TRACKER_BULK_AI_CONCURRENCY", 4)
+
+# Scheduled feedback for every goal of the current year, off-peak: "daily HH:MM",
+# "monthly DAY HH:MM" (local time) or "off"; one replica per host runs each slot
+FEEDBACK_SCHEDULE = _env_str("GOAL_TRACKER_FEEDBACK_SCHEDULE", "monthly 1 03:00")
+SCHEDULER_DIR = _env_str("GOAL_TRACKER_SCHEDULER_DIR", "scheduler")
+SCHEDULER_CONCURRENCY = _env_int("GOAL_TRACKER_SCHEDULER_CONCURRENCY", 2)
+SCHEDULER_PAGE_SIZE = _env_int("GOAL_TRACKER_SCHEDULER_PAGE_SIZE", 200)
+SCHEDULER_POLL_SECONDS = _env_float("GOAL_TRACKER_SCHEDULER_POLL", 60.0)
+# A slot missed while no replica was running is run late within this window
+SCHEDULER_CATCH_UP_SECONDS = _env_float("GOAL_TRACKER_SCHEDULER_CATCH_UP", 86400.0)
+
+# Warm-up of connections and caches in a background thread when the process starts
+WARMUP_ENABLED = _env_bool("GOAL_TRACKER_WARMUP", True)
+# Modules imported during warm-up instead of on first use
+WARMUP_IMPORTS = _env_list("GOAL_TRACKER_WARMUP_IMPORTS", ["openai"])
+# Timeout of each warm-up request to Gibson AI and OpenAI
+WARMUP_TIMEOUT_SECONDS = _env_float("GOAL_TRACKER_WARMUP_TIMEOUT", 10.0)
+# Most recently logged-in users on this host, whose goals are loaded into the shared cache (0 turns this off)
+WARMUP_RECENT_USERS = _env_int("GOAL_TRACKER_WARMUP_RECENT_USERS", 20)
+WARMUP_RECENT_USERS_PATH = _env_str("GOAL_TRACKER_WARMUP_RECENT_USERS_PATH", "cache/recent_users.json")
+
+# Background feedback pre-generation after status changes
+FEEDBACK_PREFETCH_ENABLED = _env_bool("GOAL_TRACKER_FEEDBACK_PREFETCH", True)
+# Quiet period after the last status change before a job starts
+FEEDBACK_PREFETCH_DELAY_SECONDS = _env_float("GOAL_TRACKER_FEEDBACK_PREFETCH_DELAY", 5.0)
+# Cap on background LLM calls per process per hour
+FEEDBACK_PREFETCH_MAX_CALLS_PER_HOUR = _env_int("GOAL_TRACKER_FEEDBACK_PREFETCH_MAX_CALLS", 30)
+
+# Deadlines: budget of one user action, spread over every query and AI call it
+# makes, and the longest any single call may take (also outside user actions)
+DEADLINE_ACTION_SECONDS = _env_float("GOAL_TRACKER_DEADLINE_ACTION", 15.0)
+DEADLINE_AI_ACTION_SECONDS = _env_float("GOAL_TRACKER_DEADLINE_AI_ACTION", 90.0)
+# Budget kept back from an AI call for the writes after it or a degraded answer
+DEADLINE_RESERVE_SECONDS = _env_float("GOAL_TRACKER_DEADLINE_RESERVE", 3.0)
+GIBSON_TIMEOUT_SECONDS = _env_float("GIBSON_TIMEOUT_SECONDS", 10.0)
+OPENAI_TIMEOUT_SECONDS = _env_float("OPENAI_TIMEOUT_SECONDS", 60.0)
+# Retries of an OpenAI request that failed to connect, was throttled or hit a server
+# error; made only while the deadline leaves time (the SDK's own retries are off)
+OPENAI_MAX_RETRIES = _env_int("OPENAI_MAX_RETRIES", 2)
+
+# Upstream rate limits, shared by every session of the process
+GIBSON_RATE_PER_SECOND = _env_float("GIBSON_RATE_PER_SECOND", 20.0)
+GIBSON_RATE_BURST = _env_int("GIBSON_RATE_BURST", 40)
+GIBSON_MAX_CONCURRENT = _env_int("GIBSON_MAX_CONCURRENT", 16)
+OPENAI_RATE_PER_SECOND = _env_float("OPENAI_RATE_PER_SECOND", 2.0)
+OPENAI_RATE_BURST = _env_int("OPENAI_RATE_BURST", 5)
+OPENAI_MAX_CONCURRENT = _env_int("OPENAI_MAX_CONCURRENT", 8)
+# Longest a call of each priority class waits for admission before it is shed
+RATE_LIMIT_MAX_WAIT_INTERACTIVE = _env_float("RATE_LIMIT_MAX_WAIT_INTERACTIVE", 5.0)
+RATE_LIMIT_MAX_WAIT_WRITE = _env_float("RATE_LIMIT_MAX_WAIT_WRITE", 10.0)
+RATE_LIMIT_MAX_WAIT_BACKGROUND = _env_float("RATE_LIMIT_MAX_WAIT_BACKGROUND", 60.0)
+# Calls queued per upstream beyond which new calls are rejected immediately
+RATE_LIMIT_MAX_QUEUE = _env_int("RATE_LIMIT_MAX_QUEUE", 200)
+
+# Per-session data (goal graphs, debug info) kept in one process-wide store:
+# sessions idle this long are dropped, and the least recently used ones are
+# evicted while the store is over its memory budget; their data is reloaded
+# when they rerun
+SESSION_STORE_MAX_MB = _env_float("GOAL_TRACKER_SESSION_STORE_MAX_MB", 256.0)
+SESSION_STORE_MAX_SESSIONS = _env_int("GOAL_TRACKER_SESSION_STORE_MAX_SESSIONS", 10000)
+SESSION_STORE_IDLE_SECONDS = _env_float("GOAL_TRACKER_SESSION_STORE_IDLE", 1800.0)
+
+# Prometheus metrics side server (0 disables it)
+METRICS_PORT = _env_int("GOAL_TRACKER_METRICS_PORT", 9464)
+# Loopback only by default: /metrics and /ready have no authentication
+METRICS_HOST = _env_str("GOAL_TRACKER_METRICS_HOST", "127.0.0.1")
+# Replicas on one host take the first free port from METRICS_PORT on
+METRICS_PORT_RANGE = _env_int("GOAL_TRACKER_METRICS_PORT_RANGE", 16)
+# A session counts as active if it reran within this many seconds
+METRICS_SESSION_WINDOW_SECONDS = _env_float("GOAL_TRACKER_METRICS_SESSION_WINDOW", 300.0)
+
+# Append every finished trace to this JSON Lines file (empty disables export)
+TRACE_EXPORT_PATH = _env_str("GOAL_TRACKER_TRACE_FILE", "")
+
+# Sampling profiler for reruns and GoalManager entry points
+# (sessions can also opt in with the ?profile=1 query parameter)
+PROFILE_ENABLED = _env_bool("GOAL_TRACKER_PROFILE", False)
+PROFILE_DIR = _env_str("GOAL_TRACKER_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_SECONDS = _env_float("GOAL_TRACKER_PROFILE_INTERVAL", 0.005)
+# Collapsed-stack files kept in PROFILE_DIR; older ones are deleted
+PROFILE_KEEP_FILES = _env_int("GOAL_TRACKER_PROFILE_KEEP_FILES", 200)
+
+# Write-ahead outbox: status, goal and feedback writes are journaled to local
+# disk and replayed to Gibson AI in the background
+OUTBOX_ENABLED = _env_bool("GOAL_TRACKER_OUTBOX", True)
+OUTBOX_DIR = _env_str("GOAL_TRACKER_OUTBOX_DIR", "outbox")
+OUTBOX_FLUSH_INTERVAL_SECONDS = _env_float("GOAL_TRACKER_OUTBOX_FLUSH_INTERVAL", 0.2)
+# Journaled writes replayed per flush (coalesced into one UPDATE per table)
+OUTBOX_BATCH_SIZE = _env_int("GOAL_TRACKER_OUTBOX_BATCH_SIZE", 50)
+# Attempts for a write Gibson AI rejects before it is moved to failed.jsonl
+OUTBOX_MAX_ATTEMPTS = _env_int("GOAL_TRACKER_OUTBOX_MAX_ATTEMPTS", 3)
+# Longest pause between replay attempts while Gibson AI is unreachable
+OUTBOX_MAX_BACKOFF_SECONDS = _env_float("GOAL_TRACKER_OUTBOX_MAX_BACKOFF", 30.0)
+# fsync every append; without it a machine crash can lose the latest writes
+OUTBOX_FSYNC = _env_bool("GOAL_TRACKER_OUTBOX_FSYNC", True)
+
+# Cache of goal, breakdown and feedback reads and AI results shared by every
+# app process on the host through a SQLite file
+SHARED_CACHE_ENABLED = _env_bool("GOAL_TRACKER_SHARED_CACHE", True)
+SHARED_CACHE_PATH = _env_str("GOAL_TRACKER_SHARED_CACHE_PATH", "cache/shared_cache.sqlite3")
+SHARED_CACHE_DB_TTL_SECONDS = _env_float("GOAL_TRACKER_SHARED_CACHE_DB_TTL", 300.0)
+SHARED_CACHE_AI_TTL_SECONDS = _env_float("GOAL_TRACKER_SHARED_CACHE_AI_TTL", 86400.0)
+
+@lru_cache(maxsize=None)
+def load_project_info():
+    """Load the Gibson AI project information (read once per process)"""
+    with open(GIBSON_PROJECT_FILE, 'r') as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def load_openai_api_key():
+    """Load the OpenAI API key (read once per process)"""
+    with open(OPENAI_KEY_FILE, 'r') as f:
+        return f.read().strip()
@@ -1,31 +1,55 @@
 import os
 import json
 import uuid
-import requests
+import time
 from datetime import datetime
 import re
+import config
+import rate_limiter
+import metrics
+import tracing
+import transports
+import deadlines
+
+class QueryError(Exception):
+    """Raised when a query fails; status is the HTTP status of Gibson's response, or None if there was none"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
 
 class Database:
-    def __init__(self):
+    # Migration that adds goal_feedback.fingerprint; until it is applied feedback is
+    # stored without a fingerprint and never reused. A missing column is looked for
+    # again after FINGERPRINT_RECHECK_SECONDS, so applying it needs no restart.
+    FINGERPRINT_MIGRATION = 2
+    FINGERPRINT_RECHECK_SECONDS = 300
+    _fingerprint_column = None
+    _fingerprint_checked = 0.0
+
+    def __init__(self, transport=None):
         # Load Gibson AI project information
         try:
-            with open('.gibsonai', 'r') as f:
-                project_info = json.load(f)
-                self.project_uuid = project_info.get('project_uuid')
+            project_info = config.load_project_info()
+            self.project_uuid = project_info.get('project_uuid')
                 
-            # Read API key from file specified in the instructions
-            with open('openaikey.txt', 'r') as f:
-                api_key_content = f.read().strip()
-                
-            # The API key from openaikey.txt is for OpenAI, not for Gibson
-            # Get the Gibson API key from environment or project info
-            gibson_api_key = os.environ.get('GIBSON_API_KEY', 
-                                          "gAAAAABoKegtPFi_H_deoBWKdlhyzFvAZfOse38cQsVzNrFJJbAPpRyTzX82hcKJpcqn_OBF2PLANc6nf3cvuaONWsWjTTJVQTa-uDKDJTRLGwj1viSMs04=")
-                
-            self.api_key = gibson_api_key
-            self.endpoint = "https://api.gibsonai.com/v1/-/query"
+            # The Gibson API key comes from the environment or the default in config.py
+            self.api_key = config.GIBSON_API_KEY
+            self.endpoint = config.GIBSON_ENDPOINT
         except Exception as e:
             raise Exception(f"Failed to initialize database connection: {str(e)}")
+        
+        # Reuse pooled keep-alive connections instead of a new TLS handshake per query;
+        # the transport can be given as a name ("requests" or "httpx") or an instance
+        if transport is None or isinstance(transport, str):
+            transport = transports.create_transport(
+                transport or config.GIBSON_TRANSPORT,
+                http2=config.GIBSON_HTTP2,
+                request_encoding=config.GIBSON_REQUEST_ENCODING,
+                compress_min_bytes=config.GIBSON_COMPRESS_MIN_BYTES,
+                max_connections=config.GIBSON_MAX_CONCURRENT
+            )
+        self.transport = transport
 
     def escape_sql(self, value):
         """Escape string values for SQL queries to prevent SQL injection and syntax errors"""
@@ -40,25 +64,94 @@ class Database:
             escaped = re.sub(r'[\\\x00\n\r\x1a]', '', escaped)
             return f"'{escaped}'"
     
-    def execute_query(self, query):
+    def execute_query(self, query, priority=None):
         """Execute a SQL query against the Gibson AI database"""
         headers = {"X-Gibson-API-Key": self.api_key}
         payload = {"query": query}
         
+        is_read = query.lstrip().upper().startswith("SELECT")
+        kind = "read" if is_read else "write"
+        # Reads are interactive unless the caller runs at a lower priority
+        if priority is None:
+            default = rate_limiter.INTERACTIVE if is_read else rate_limiter.WRITE
+            priority = max(default, rate_limiter.current_priority(default))
+        
+        metrics.count_query()
+        start = time.perf_counter()
+        outcome = "error"
+        table = re.search(r"(?:FROM|INTO|UPDATE)\s+`?(\w+)`?", query, re.IGNORECASE)
         try:
-            response = requests.post(self.endpoint, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            with tracing.span("db.query", kind=kind, table=table.group(1) if table else None):
+                with rate_limiter.get_limiter("gibson").limit(priority):
+                    # The remaining budget of the current action, capped at the per-query timeout
+                    timeout = deadlines.timeout(config.GIBSON_TIMEOUT_SECONDS, "gibson")
+                    result = self.transport.post(self.endpoint, headers, payload, timeout=timeout)
+            outcome = "ok"
+            return result
+        except transports.TransportError as e:
+            if deadlines.expired():
+                raise deadlines.exceeded("gibson", f"Deadline exceeded during Gibson AI query: {str(e)}")
             error_msg = f"Database query error: {str(e)}"
-            if hasattr(e, 'response') and e.response:
-                if e.response.text:
+            if e.detail:
+                error_msg += f" - {e.detail}"
+            raise QueryError(error_msg, status=e.status)
+        finally:
+            metrics.DB_QUERIES.inc(kind=kind, outcome=outcome)
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, kind=kind)
+
+    # Keys under which write results report the number of affected rows
+    AFFECTED_ROWS_KEYS = ("affected_rows", "affectedRows", "rows_affected", "rowcount", "row_count")
+
+    def affected_rows(self, result):
+        """Get the number of rows a write affected from its result, or None if the result does not say"""
+        if isinstance(result, list) and len(result) == 1:
+            result = result[0]
+        if isinstance(result, dict):
+            for key in self.AFFECTED_ROWS_KEYS:
+                if key in result:
                     try:
-                        error_details = e.response.json()
-                        error_msg += f" - {error_details.get('detail', '')}"
-                    except:
-                        error_msg += f" - {e.response.text}"
-            raise Exception(error_msg)
+                        return int(result[key])
+                    except (TypeError, ValueError):
+                        return None
+        return None
+
+    def _row_exists(self, table, row_uuid):
+        query = f"""
+        SELECT 1 AS `found` FROM `{table}`
+        WHERE `uuid` = {self.escape_sql(row_uuid)}
+        """
+        return bool(self.execute_query(query))
+
+    def _has_fingerprint_column(self):
+        """Whether the fingerprint migration is recorded as applied"""
+        if self._fingerprint_column or time.monotonic() - self._fingerprint_checked < self.FINGERPRINT_RECHECK_SECONDS:
+            return bool(self._fingerprint_column)
+        query = f"""
+        SELECT `version` FROM `schema_migrations`
+        WHERE `version` = {int(self.FINGERPRINT_MIGRATION)}
+        """
+        try:
+            self._fingerprint_column = bool(self.execute_query(query))
+        except Exception as e:
+            # A database created by hand has no schema_migrations table until it is baselined
+            print(f"Could not read the schema version: {str(e)}")
+            self._fingerprint_column = False
+        self._fingerprint_checked = time.monotonic()
+        if not self._fingerprint_column:
+            print(f"Feedback fingerprints are off until migration {self.FINGERPRINT_MIGRATION} is applied")
+        return self._fingerprint_column
+
+    def _insert_from_parent(self, query, table, row_uuid, parent_name):
+        """Run an INSERT ... SELECT that resolves the parent id in the same statement.
+
+        Raises "<parent> not found" when no row was inserted. If the result
+        does not report affected rows, the inserted row is looked up instead.
+        """
+        affected = self.affected_rows(self.execute_query(query))
+        if affected is None:
+            affected = 1 if self._row_exists(table, row_uuid) else 0
+        if affected == 0:
+            raise Exception(f"{parent_name} not found")
 
     # User operations
     def create_user(self, username, hashed_password):
@@ -98,35 +191,30 @@ class Database:
         """Create a new goal for the user"""
         goal_uuid = str(uuid.uuid4())
         
-        # First get the user ID from UUID
-        user = self.get_user_by_uuid(user_uuid)
-        if not user:
-            raise Exception("User not found")
-            
-        user_id = user['id']
-        
+        # Resolve the user ID from its UUID in the same statement
         query = f"""
         INSERT INTO `goal` (`uuid`, `user_id`, `title`, `description`, `year`, `status`)
-        VALUES ({self.escape_sql(goal_uuid)}, {user_id}, {self.escape_sql(title)}, {self.escape_sql(description)}, {year}, 'on_track')
+        SELECT {self.escape_sql(goal_uuid)}, u.`id`, {self.escape_sql(title)}, {self.escape_sql(description)}, {int(year)}, 'on_track'
+        FROM `user_profile` u
+        WHERE u.`uuid` = {self.escape_sql(user_uuid)}
         """
-        self.execute_query(query)
+        self._insert_from_parent(query, "goal", goal_uuid, "User")
         return goal_uuid
 
     def get_goals_by_user_uuid(self, user_uuid):
         """Get all goals for a specific user"""
-        # First get the user ID from UUID
-        user = self.get_user_by_uuid(user_uuid)
-        if not user:
-            raise Exception("User not found")
-            
-        user_id = user['id']
-        
+        # Resolve the user ID from its UUID in the same statement
         query = f"""
-        SELECT g.* FROM `goal` g
-        WHERE g.`user_id` = {user_id}
+        SELECT g.* FROM `user_profile` u
+        JOIN `goal` g ON g.`user_id` = u.`id`
+        WHERE u.`uuid` = {self.escape_sql(user_uuid)}
         ORDER BY g.`year` DESC, g.`date_created` DESC
         """
-        return self.execute_query(query)
+        goals = self.execute_query(query)
+        # No rows: a user without goals, or no such user
+        if not goals and not self._row_exists("user_profile", user_uuid):
+            raise Exception("User not found")
+        return goals
 
     def get_goal_by_uuid(self, goal_uuid):
         """Get a goal by its UUID"""
@@ -139,81 +227,93 @@ class Database:
             return result[0]
         return None
 
+    # Columns declared NOT NULL, which can be compared with <> to skip no-op writes
+    NOT_NULL_COLUMNS = {"title", "status"}
+
+    def _update_row(self, table, row_uuid, values):
+        """Update one row by UUID and return the number of rows changed (None if the result does not say).
+
+        When only NOT NULL columns change, the UPDATE is conditional on a value
+        being different, so setting a row to the values it already has writes nothing.
+        """
+        values = {column: value for column, value in values.items() if value is not None}
+        if not values:
+            return 0
+        update_str = ", ".join(f"`{column}` = {self.escape_sql(value)}" for column, value in values.items())
+        condition = ""
+        if set(values) <= self.NOT_NULL_COLUMNS:
+            differences = " OR ".join(f"`{column}` <> {self.escape_sql(value)}" for column, value in values.items())
+            condition = f"AND ({differences})"
+        query = f"""
+        UPDATE `{table}` 
+        SET {update_str}
+        WHERE `uuid` = {self.escape_sql(row_uuid)} {condition}
+        """
+        return self.affected_rows(self.execute_query(query))
+
     def update_goal(self, goal_uuid, title=None, description=None, status=None):
-        """Update a goal's details"""
-        updates = []
-        if title is not None:
-            updates.append(f"`title` = {self.escape_sql(title)}")
-        if description is not None:
-            updates.append(f"`description` = {self.escape_sql(description)}")
-        if status is not None:
-            updates.append(f"`status` = {self.escape_sql(status)}")
-            
+        """Update a goal's details; returns the number of rows changed (0 for a no-op), or None if unknown"""
+        return self._update_row("goal", goal_uuid, {"title": title, "description": description, "status": status})
+
+    def update_rows(self, table, updates):
+        """Apply per-row column updates ({uuid: {column: value}}) to a table in one UPDATE statement"""
         if not updates:
-            return
-            
-        update_str = ", ".join(updates)
+            return 0
+        columns = sorted({column for values in updates.values() for column in values})
+        new_values = {}
+        for column in columns:
+            cases = " ".join(
+                f"WHEN {self.escape_sql(row_uuid)} THEN {self.escape_sql(values[column])}"
+                for row_uuid, values in updates.items() if column in values
+            )
+            new_values[column] = f"CASE `uuid` {cases} ELSE `{column}` END"
+        assignments = ", ".join(f"`{column}` = {value}" for column, value in new_values.items())
+        uuids = ", ".join(self.escape_sql(row_uuid) for row_uuid in updates)
+        # Skip rows that already have the new values (see _update_row)
+        condition = ""
+        if set(columns) <= self.NOT_NULL_COLUMNS:
+            condition = "AND (" + " OR ".join(f"`{column}` <> {value}" for column, value in new_values.items()) + ")"
         query = f"""
-        UPDATE `goal` 
-        SET {update_str}
-        WHERE `uuid` = {self.escape_sql(goal_uuid)}
+        UPDATE `{table}`
+        SET {assignments}
+        WHERE `uuid` IN ({uuids}) {condition}
         """
-        self.execute_query(query)
+        return self.affected_rows(self.execute_query(query))
 
     # Monthly Breakdown operations
     def create_monthly_breakdown(self, goal_uuid, month, description):
         """Create a monthly breakdown for a goal"""
         breakdown_uuid = str(uuid.uuid4())
         
-        # First get the goal ID from UUID
-        goal = self.get_goal_by_uuid(goal_uuid)
-        if not goal:
-            raise Exception("Goal not found")
-            
-        goal_id = goal['id']
-        
+        # Resolve the goal ID from its UUID in the same statement
         query = f"""
         INSERT INTO `goal_monthly_breakdown` 
         (`uuid`, `goal_id`, `month`, `description`, `status`)
-        VALUES ({self.escape_sql(breakdown_uuid)}, {goal_id}, {month}, {self.escape_sql(description)}, 'not_started')
+        SELECT {self.escape_sql(breakdown_uuid)}, g.`id`, {int(month)}, {self.escape_sql(description)}, 'not_started'
+        FROM `goal` g
+        WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
         """
-        self.execute_query(query)
+        self._insert_from_parent(query, "goal_monthly_breakdown", breakdown_uuid, "Goal")
         return breakdown_uuid
 
     def get_monthly_breakdowns(self, goal_uuid):
         """Get all monthly breakdowns for a goal"""
-        # First get the goal ID from UUID
-        goal = self.get_goal_by_uuid(goal_uuid)
-        if not goal:
-            raise Exception("Goal not found")
-            
-        goal_id = goal['id']
-        
+        # Resolve the goal ID from its UUID in the same statement
         query = f"""
-        SELECT * FROM `goal_monthly_breakdown` 
-        WHERE `goal_id` = {goal_id}
-        ORDER BY `month` ASC
+        SELECT b.* FROM `goal` g
+        JOIN `goal_monthly_breakdown` b ON b.`goal_id` = g.`id`
+        WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
+        ORDER BY b.`month` ASC
         """
-        return self.execute_query(query)
+        breakdowns = self.execute_query(query)
+        if not breakdowns and not self._row_exists("goal", goal_uuid):
+            raise Exception("Goal not found")
+        return breakdowns
 
     def update_monthly_breakdown(self, breakdown_uuid, description=None, status=None):
-        """Update a monthly breakdown"""
-        updates = []
-        if description is not None:
-            updates.append(f"`description` = {self.escape_sql(description)}")
-        if status is not None:
-            updates.append(f"`status` = {self.escape_sql(status)}")
-            
-        if not updates:
-            return
-            
-        update_str = ", ".join(updates)
-        query = f"""
-        UPDATE `goal_monthly_breakdown` 
-        SET {update_str}
-        WHERE `uuid` = {self.escape_sql(breakdown_uuid)}
-        """
-        self.execute_query(query)
+        """Update a monthly breakdown; returns the number of rows changed (0 for a no-op), or None if unknown"""
+        return self._update_row("goal_monthly_breakdown", breakdown_uuid,
+                                {"description": description, "status": status})
 
     def get_monthly_breakdown_by_uuid(self, breakdown_uuid):
         """Get a monthly breakdown by its UUID"""
@@ -227,37 +327,194 @@ class Database:
         return None
 
     # Feedback operations
-    def create_feedback(self, goal_uuid, feedback_text, feedback_type):
-        """Create feedback for a goal"""
-        feedback_uuid = str(uuid.uuid4())
+    def create_feedback(self, goal_uuid, feedback_text, feedback_type, fingerprint=None, feedback_uuid=None):
+        """Create feedback for a goal, optionally tagged with the fingerprint of the progress it analyses.
+
+        With a feedback_uuid the insert is idempotent: replaying it after a
+        successful first attempt does not add a second row. The fingerprint is
+        left out while the database has no fingerprint column.
+        """
+        columns, fingerprint_value = "", ""
+        if self._has_fingerprint_column():
+            columns, fingerprint_value = ", `fingerprint`", f", {self.escape_sql(fingerprint)}"
+        if feedback_uuid is not None:
+            query = f"""
+            INSERT INTO `goal_feedback`
+            (`uuid`, `goal_id`, `feedback_text`, `feedback_type`{columns})
+            SELECT {self.escape_sql(feedback_uuid)}, g.`id`, {self.escape_sql(feedback_text)}, {self.escape_sql(feedback_type)}{fingerprint_value}
+            FROM `goal` g
+            WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
+            AND NOT EXISTS (SELECT 1 FROM `goal_feedback` f WHERE f.`uuid` = {self.escape_sql(feedback_uuid)})
+            """
+            self.execute_query(query)
+            return feedback_uuid
         
-        # First get the goal ID from UUID
-        goal = self.get_goal_by_uuid(goal_uuid)
-        if not goal:
-            raise Exception("Goal not found")
-            
-        goal_id = goal['id']
+        feedback_uuid = str(uuid.uuid4())
         
+        # Resolve the goal ID from its UUID in the same statement
         query = f"""
         INSERT INTO `goal_feedback` 
-        (`uuid`, `goal_id`, `feedback_text`, `feedback_type`)
-        VALUES ({self.escape_sql(feedback_uuid)}, {goal_id}, {self.escape_sql(feedback_text)}, {self.escape_sql(feedback_type)})
+        (`uuid`, `goal_id`, `feedback_text`, `feedback_type`{columns})
+        SELECT {self.escape_sql(feedback_uuid)}, g.`id`, {self.escape_sql(feedback_text)}, {self.escape_sql(feedback_type)}{fingerprint_value}
+        FROM `goal` g
+        WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
         """
-        self.execute_query(query)
+        self._insert_from_parent(query, "goal_feedback", feedback_uuid, "Goal")
         return feedback_uuid
 
+    def get_feedback_by_fingerprint(self, goal_uuid, fingerprint):
+        """Get the latest feedback for a goal that was generated for the given fingerprint"""
+        if not self._has_fingerprint_column():
+            return None
+        query = f"""
+        SELECT f.* FROM `goal_feedback` f
+        JOIN `goal` g ON g.`id` = f.`goal_id`
+        WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
+        AND f.`fingerprint` = {self.escape_sql(fingerprint)}
+        ORDER BY f.`feedback_timestamp` DESC
+        LIMIT 1
+        """
+        result = self.execute_query(query)
+        if result and len(result) > 0:
+            return result[0]
+        return None
+
     def get_feedback_for_goal(self, goal_uuid):
         """Get all feedback for a goal"""
-        # First get the goal ID from UUID
-        goal = self.get_goal_by_uuid(goal_uuid)
-        if not goal:
+        # Resolve the goal ID from its UUID in the same statement
+        query = f"""
+        SELECT f.* FROM `goal` g
+        JOIN `goal_feedback` f ON f.`goal_id` = g.`id`
+        WHERE g.`uuid` = {self.escape_sql(goal_uuid)}
+        ORDER BY f.`feedback_timestamp` DESC
+        """
+        feedback = self.execute_query(query)
+        if not feedback and not self._row_exists("goal", goal_uuid):
             raise Exception("Goal not found")
-            
-        goal_id = goal['id']
-        
+        return feedback
+
+    # Bulk operations, used by bulk_io for import and export and by GoalManager to avoid a query per row
+    def _ids_by_uuid(self, table, row_uuids):
+        """Map the UUIDs of rows in table to their ids with one query"""
+        if not row_uuids:
+            return {}
+        query = f"""
+        SELECT `id`, `uuid` FROM `{table}`
+        WHERE `uuid` IN ({", ".join(self.escape_sql(row_uuid) for row_uuid in row_uuids)})
+        """
+        return {row['uuid']: row['id'] for row in self.execute_query(query) or []}
+
+    def get_existing_uuids(self, table, row_uuids):
+        """Get which of row_uuids already exist in table, with one query"""
+        return set(self._ids_by_uuid(table, sorted(set(row_uuids))))
+
+    def _insert_rows(self, table, columns, rows):
+        """Insert rows (lists of SQL literals) in one multi-row INSERT; returns the number of rows inserted"""
+        if not rows:
+            return 0
+        values = ",\n        ".join("(" + ", ".join(row) + ")" for row in rows)
         query = f"""
-        SELECT * FROM `goal_feedback` 
-        WHERE `goal_id` = {goal_id}
-        ORDER BY `feedback_timestamp` DESC
+        INSERT INTO `{table}` ({", ".join(f"`{column}`" for column in columns)})
+        VALUES {values}
+        """
+        affected = self.affected_rows(self.execute_query(query))
+        return len(rows) if affected is None else affected
+
+    def get_users_by_usernames(self, usernames):
+        """Get the id, UUID and username (no password hash) of the users with the given usernames"""
+        if not usernames:
+            return []
+        query = f"""
+        SELECT `id`, `uuid`, `username` FROM `user_profile`
+        WHERE `username` IN ({", ".join(self.escape_sql(username) for username in usernames)})
+        """
+        return self.execute_query(query) or []
+
+    def get_goals_page(self, after_id=0, limit=500):
+        """Get up to limit goals with an id above after_id, in id order, with their owner's UUID and username.
+
+        Keyset pagination: pass the id of the last goal of a page to get the
+        next one; every page costs the same however far into the table it is.
+        """
+        query = f"""
+        SELECT g.*, u.`uuid` AS `user_uuid`, u.`username` FROM `goal` g
+        JOIN `user_profile` u ON u.`id` = g.`user_id`
+        WHERE g.`id` > {int(after_id)}
+        ORDER BY g.`id` ASC
+        LIMIT {int(limit)}
+        """
+        return self.execute_query(query) or []
+
+    def get_monthly_breakdowns_for_goals(self, goal_uuids):
+        """Get the monthly breakdowns of several goals in one query, each row with its `goal_uuid` (in no particular order)"""
+        if not goal_uuids:
+            return []
+        query = f"""
+        SELECT b.*, g.`uuid` AS `goal_uuid` FROM `goal` g
+        JOIN `goal_monthly_breakdown` b ON b.`goal_id` = g.`id`
+        WHERE g.`uuid` IN ({", ".join(self.escape_sql(goal_uuid) for goal_uuid in goal_uuids)})
+        """
+        return self.execute_query(query) or []
+
+    def get_feedback_for_goals(self, goal_uuids):
+        """Get the feedback of several goals in one query, each row with its `goal_uuid` (in no particular order)"""
+        if not goal_uuids:
+            return []
+        query = f"""
+        SELECT f.*, g.`uuid` AS `goal_uuid` FROM `goal` g
+        JOIN `goal_feedback` f ON f.`goal_id` = g.`id`
+        WHERE g.`uuid` IN ({", ".join(self.escape_sql(goal_uuid) for goal_uuid in goal_uuids)})
+        """
+        return self.execute_query(query) or []
+
+    def create_goals(self, goals):
+        """Create several goals ({"user_uuid", "title", "description", "year", "status"}) in one INSERT.
+
+        A goal's "uuid" is used when given. Returns the new goal UUIDs in the
+        order of goals, with None for goals whose user was not found.
+        """
+        user_ids = self._ids_by_uuid("user_profile", sorted({goal['user_uuid'] for goal in goals}))
+        goal_uuids = []
+        rows = []
+        for goal in goals:
+            user_id = user_ids.get(goal['user_uuid'])
+            if user_id is None:
+                goal_uuids.append(None)
+                continue
+            goal_uuid = goal.get('uuid') or str(uuid.uuid4())
+            goal_uuids.append(goal_uuid)
+            rows.append([self.escape_sql(goal_uuid), str(int(user_id)), self.escape_sql(goal['title']),
+                         self.escape_sql(goal.get('description')), str(int(goal['year'])),
+                         self.escape_sql(goal.get('status') or 'on_track')])
+        self._insert_rows("goal", ["uuid", "user_id", "title", "description", "year", "status"], rows)
+        return goal_uuids
+
+    def create_monthly_breakdowns(self, breakdowns):
+        """Create several monthly breakdowns ({"goal_uuid", "month", "description", "status"}) in one INSERT.
+
+        Breakdowns of goals that do not exist are skipped; returns the number created.
+        """
+        goal_ids = self._ids_by_uuid("goal", sorted({breakdown['goal_uuid'] for breakdown in breakdowns}))
+        rows = [[self.escape_sql(str(uuid.uuid4())), str(int(goal_ids[breakdown['goal_uuid']])),
+                 str(int(breakdown['month'])), self.escape_sql(breakdown['description']),
+                 self.escape_sql(breakdown.get('status') or 'not_started')]
+                for breakdown in breakdowns if breakdown['goal_uuid'] in goal_ids]
+        return self._insert_rows("goal_monthly_breakdown",
+                                 ["uuid", "goal_id", "month", "description", "status"], rows)
+
+    def create_feedbacks(self, feedbacks):
+        """Create several feedback rows ({"goal_uuid", "feedback_text", "feedback_type", "fingerprint",
+        "feedback_timestamp"}) in one INSERT; the timestamp defaults to now.
+
+        Feedback for goals that do not exist is skipped; returns the number created.
         """
-        return self.execute_query(query)
+        goal_ids = self._ids_by_uuid("goal", sorted({feedback['goal_uuid'] for feedback in feedbacks}))
+        fingerprints = self._has_fingerprint_column()
+        rows = [[self.escape_sql(str(uuid.uuid4())), str(int(goal_ids[feedback['goal_uuid']])),
+                 self.escape_sql(feedback.get('feedback_text')), self.escape_sql(feedback.get('feedback_type'))]
+                + ([self.escape_sql(feedback.get('fingerprint'))] if fingerprints else [])
+                + [self.escape_sql(feedback['feedback_timestamp']) if feedback.get('feedback_timestamp')
+                   else "CURRENT_TIMESTAMP"]
+                for feedback in feedbacks if feedback['goal_uuid'] in goal_ids]
+        return self._insert_rows("goal_feedback", ["uuid", "goal_id", "feedback_text", "feedback_type"]
+                                 + (["fingerprint"] if fingerprints else []) + ["feedback_timestamp"], rows)
@@ -0,0 +1,82 @@
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+import metrics
+
+# Deadlines for user actions.
+# A UI callback sets a deadline with deadline(seconds); every Gibson AI query
+# and OpenAI call made inside it (through GoalManager, the rate limiters and
+# the transports) uses the remaining budget as its timeout, and fails fast
+# with DeadlineExceeded once the budget is gone. Nested deadlines can only
+# shorten the budget. Calls made outside any deadline use their own default
+# timeout, so no upstream call waits forever.
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the deadline of the current action has passed"""
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds: float):
+    """Run the enclosed calls with at most seconds of budget"""
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires = min(expires, current)
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+@contextmanager
+def reserve(seconds: float):
+    """Run the enclosed calls with seconds of the current budget held back for the work after them"""
+    current = _deadline.get()
+    if current is None:
+        yield
+        return
+    token = _deadline.set(current - seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def with_deadline(seconds: float):
+    """Decorator running a function inside deadline(seconds)"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current deadline (negative once passed), or None without a deadline"""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+def expired() -> bool:
+    """Whether the current deadline has passed"""
+    left = remaining()
+    return left is not None and left <= 0
+
+def exceeded(upstream: str, message: str) -> DeadlineExceeded:
+    """Count a deadline miss on upstream and build the exception to raise"""
+    metrics.DEADLINE_EXCEEDED.inc(upstream=upstream)
+    return DeadlineExceeded(message)
+
+def timeout(default: float, upstream: str) -> float:
+    """Timeout for the next call to upstream: the remaining budget, capped at default.
+
+    Raises DeadlineExceeded instead of starting a call that has no time left.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise exceeded(upstream, f"Deadline exceeded before {upstream} call")
+    return min(default, left)
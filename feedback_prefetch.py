@@ -0,0 +1,123 @@
+import time
+import threading
+from collections import deque
+import rate_limiter
+import tracing
+
+class FeedbackPrefetcher:
+    """Speculatively pre-generate goal feedback in the background after status changes.
+
+    Jobs are debounced per goal: every status change pushes the goal's job back
+    by delay_seconds. One worker thread runs the jobs that are due, one at a
+    time, and saves each result through Database.create_feedback with the
+    fingerprint of the progress it was generated for, so the stored-feedback
+    lookup finds it in every process.
+    """
+
+    def __init__(self, goal_manager, delay_seconds: float = 5.0, max_calls_per_hour: int = 30):
+        self.goal_manager = goal_manager
+        self.delay_seconds = delay_seconds
+        self.max_calls_per_hour = max_calls_per_hour
+
+        self._condition = threading.Condition()
+        # goal_uuid -> (time the job is due, job traced with a link to the change that queued it)
+        self._queued = {}
+        self._call_times = deque()
+        self._worker = None
+        self._stopped = False
+
+    def schedule(self, goal_uuid: str) -> None:
+        """Queue (or push back) a background feedback job for a goal"""
+        with self._condition:
+            if self._stopped:
+                return
+            self._queued[goal_uuid] = (time.monotonic() + self.delay_seconds,
+                                       tracing.wrap(self._run, detached=True))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="feedback-prefetch", daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+    def cancel(self, goal_uuid: str) -> None:
+        """Drop the queued job for a goal"""
+        with self._condition:
+            self._queued.pop(goal_uuid, None)
+
+    def shutdown(self) -> None:
+        """Drop every queued job and stop the worker once its current job is done"""
+        with self._condition:
+            self._stopped = True
+            self._queued.clear()
+            self._condition.notify()
+
+    def _next_job(self):
+        """Wait for the job due first and remove it from the queue; None after shutdown"""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                due = min(self._queued.items(), key=lambda item: item[1][0], default=None)
+                if due is not None and due[1][0] <= now:
+                    del self._queued[due[0]]
+                    return due[0], due[1][1]
+                self._condition.wait(due[1][0] - now if due is not None else None)
+            return None
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            goal_uuid, run = job
+            run(goal_uuid)
+
+    def _take_budget(self) -> bool:
+        """Reserve one background LLM call if the hourly cap allows it"""
+        now = time.time()
+        with self._condition:
+            while self._call_times and now - self._call_times[0] > 3600:
+                self._call_times.popleft()
+            if len(self._call_times) >= self.max_calls_per_hour:
+                return False
+            self._call_times.append(now)
+            return True
+
+    def _run(self, goal_uuid: str) -> None:
+        """Run a background job as its own trace"""
+        try:
+            with tracing.span("feedback_prefetch", goal_uuid=goal_uuid):
+                self._generate(goal_uuid)
+        finally:
+            tracing.finish_rerun("feedback_prefetch")
+
+    def _generate(self, goal_uuid: str) -> None:
+        """Generate and save feedback for a goal's current progress unless it is already stored"""
+        # Background jobs yield to interactive reads and writes at the rate limiters
+        with rate_limiter.priority(rate_limiter.BACKGROUND):
+            try:
+                inputs = self.goal_manager.prepare_feedback_inputs(goal_uuid)
+                if not inputs:
+                    return
+                # Feedback for this exact progress is already stored
+                if self.goal_manager.get_stored_feedback(goal_uuid, inputs['fingerprint']):
+                    return
+                if not self._take_budget():
+                    print("Background feedback budget exhausted, skipping pre-generation")
+                    return
+
+                feedback = self.goal_manager.ai_service.generate_goal_feedback(
+                    inputs['goal']['title'],
+                    inputs['goal']['description'],
+                    inputs['monthly_breakdowns'],
+                    inputs['current_month']
+                )
+                if not feedback or feedback.get('fallback'):
+                    return
+                # Saved even if the progress changed meanwhile: it matches the fingerprint it was made for
+                self.goal_manager.db.create_feedback(
+                    goal_uuid,
+                    feedback['feedback_text'],
+                    feedback['feedback_type'],
+                    fingerprint=inputs['fingerprint']
+                )
+            except Exception as e:
+                print(f"Error pre-generating feedback: {str(e)}")
@@ -1,45 +1,202 @@
 import datetime
+import json
+import hashlib
 from typing import List, Dict, Any
 from database import Database
-from ai_service import AIService
+from ai_service import AIService, FALLBACK_FEEDBACK
+from feedback_prefetch import FeedbackPrefetcher
+import config
+import metrics
+import tracing
+import profiler
+import deadlines
+import bulk_io
+
+def compute_feedback_fingerprint(title: str, description: str,
+                                 monthly_breakdowns: List[Dict[str, Any]],
+                                 current_month: int) -> str:
+    """Fingerprint everything that feedback depends on: the goal text, the month-by-month statuses and the current month"""
+    status_vector = sorted((b.get('month'), b.get('status')) for b in monthly_breakdowns)
+    payload = json.dumps([title, description, status_vector, current_month], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
 class GoalManager:
-    def __init__(self, openai_api_key):
-        self.db = Database()
-        self.ai_service = AIService(openai_api_key)
+    def __init__(self, openai_api_key, db=None, ai_service=None, prefetch_feedback=None, ai_cache=None,
+                 template_index=None):
+        self.db = db if db is not None else Database()
+        self.openai_api_key = openai_api_key
+        # SharedCache for AI results, handed to the AI service when it is built
+        self.ai_cache = ai_cache
+        # TemplateIndex of earlier breakdowns reused for similar goals (None disables reuse)
+        self.template_index = template_index
+        # Built on first use so that pages without AI features never import openai
+        self._ai_service = ai_service
+        
+        if prefetch_feedback is None:
+            prefetch_feedback = config.FEEDBACK_PREFETCH_ENABLED
+        self.feedback_prefetcher = None
+        if prefetch_feedback:
+            self.feedback_prefetcher = FeedbackPrefetcher(
+                self,
+                delay_seconds=config.FEEDBACK_PREFETCH_DELAY_SECONDS,
+                max_calls_per_hour=config.FEEDBACK_PREFETCH_MAX_CALLS_PER_HOUR
+            )
+    
+    @property
+    def ai_service(self) -> AIService:
+        """The AI service, constructed on first access.
         
+        Without an openai_api_key the key is read from config.OPENAI_KEY_FILE
+        here; a missing file raises, and a key added later is picked up on the
+        next access.
+        """
+        if self._ai_service is None:
+            api_key = self.openai_api_key if self.openai_api_key is not None else config.load_openai_api_key()
+            self._ai_service = AIService(api_key, cache=self.ai_cache)
+        return self._ai_service
+    
+    @ai_service.setter
+    def ai_service(self, value: AIService):
+        self._ai_service = value
+        
+    @profiler.profiled("goals.create_goal")
+    @tracing.traced("goals.create_goal")
     def create_goal(self, user_uuid: str, title: str, description: str, year: int) -> str:
-        """Create a new goal and generate monthly breakdowns using AI"""
-        # Create the goal in the database
-        goal_uuid = self.db.create_goal(user_uuid, title, description, year)
+        """Create a new goal and generate monthly breakdowns using AI.
         
-        # Generate monthly breakdowns using AI
-        monthly_breakdowns = self.ai_service.generate_monthly_breakdowns(title, description, year)
+        Raises RateLimitExceeded, before anything is saved, when the AI call is
+        shed by the rate limiter.
+        """
+        # Reuse the breakdowns of a near-identical earlier goal, or generate them using AI
+        monthly_breakdowns = None
+        if self.template_index is not None:
+            monthly_breakdowns = self.template_index.lookup(title, description, year, user_uuid)
+        if monthly_breakdowns is None:
+            # Keep budget for saving the breakdowns; placeholders come back if the AI runs out of time
+            with deadlines.reserve(config.DEADLINE_RESERVE_SECONDS):
+                monthly_breakdowns = self.ai_service.generate_monthly_breakdowns(title, description, year)
+            # Only plans the AI completed become templates
+            if self.template_index is not None and not any(b.get('placeholder') for b in monthly_breakdowns):
+                self.template_index.add(title, description, year, monthly_breakdowns, user_uuid)
         
-        # Save each monthly breakdown
+        # Create the goal in the database once its breakdowns are ready
+        goal_uuid = self.db.create_goal(user_uuid, title, description, year)
+        self._save_breakdowns(goal_uuid, monthly_breakdowns)
+        return goal_uuid
+    
+    def _save_breakdowns(self, goal_uuid: str, monthly_breakdowns: List[Dict[str, Any]]) -> int:
+        """Save each valid monthly breakdown of a goal; returns how many were saved"""
+        rows = []
         for breakdown in monthly_breakdowns:
             month = breakdown.get('month', 0)
             description = breakdown.get('description', '')
             
             if 1 <= month <= 12 and description:
-                self.db.create_monthly_breakdown(goal_uuid, month, description)
+                rows.append({'goal_uuid': goal_uuid, 'month': month, 'description': description})
+        # All months in one INSERT
+        self.db.create_monthly_breakdowns(rows)
+        return len(rows)
+    
+    @profiler.profiled("goals.generate_missing_breakdowns")
+    @tracing.traced("goals.generate_missing_breakdowns")
+    def generate_missing_breakdowns(self, goal_uuids: List[str]) -> Dict[str, int]:
+        """Generate and save breakdowns for the goals that have none, asking the AI about them in shared requests.
         
-        return goal_uuid
+        Returns the number of months saved per goal; goals that are missing or
+        already have breakdowns are left out.
+        """
+        needed = []
+        for goal_uuid in goal_uuids:
+            goal = self.db.get_goal_by_uuid(goal_uuid)
+            if goal and not self.db.get_monthly_breakdowns(goal_uuid):
+                needed.append(goal)
+        return {goal['uuid']: self._save_breakdowns(goal['uuid'], monthly_breakdowns)
+                for goal, monthly_breakdowns in zip(needed, self.plan_breakdowns(needed))}
+    
+    def plan_breakdowns(self, goals: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Monthly breakdowns for goals ({"title", "description", "year"}), in the order of goals, without saving them.
+        
+        Near-identical earlier goals are reused from the template index; the
+        rest go to the AI in shared requests. Templates are scoped to the
+        goal's "user_uuid" when it has one.
+        """
+        plans = [None] * len(goals)
+        if self.template_index is not None:
+            for index, goal in enumerate(goals):
+                plans[index] = self.template_index.lookup(goal['title'], goal['description'], goal['year'],
+                                                          goal.get('user_uuid'))
+        needed = [index for index, plan in enumerate(plans) if plan is None]
+        generated = self.ai_service.generate_monthly_breakdowns_batch([
+            {'title': goals[index]['title'], 'description': goals[index]['description'], 'year': goals[index]['year']}
+            for index in needed
+        ]) if needed else []
+        for index, monthly_breakdowns in zip(needed, generated):
+            goal = goals[index]
+            if self.template_index is not None and not any(b.get('placeholder') for b in monthly_breakdowns):
+                self.template_index.add(goal['title'], goal['description'], goal['year'], monthly_breakdowns,
+                                        goal.get('user_uuid'))
+            plans[index] = monthly_breakdowns
+        return plans
     
+    @profiler.profiled("goals.export_goals")
+    def export_goals(self, stream, fmt: str = "jsonl", page_size: int = None) -> int:
+        """Write every goal with its breakdowns and feedback to a text stream (JSON Lines or CSV); returns the number written"""
+        return bulk_io.write_records(bulk_io.iter_goals(self.db, page_size or config.BULK_PAGE_SIZE), stream, fmt)
+    
+    @profiler.profiled("goals.import_goals")
+    def import_goals(self, stream, fmt: str = "jsonl", breakdowns: str = "none", queue=None,
+                     progress=None) -> Dict[str, int]:
+        """Create goals, with their breakdowns and feedback, from a text stream (JSON Lines or CSV).
+        
+        Records name their owner by username; records of unknown users are
+        skipped. Goals keep the uuid of their record and goals that already
+        exist are not created again, so an interrupted import can be rerun.
+        Goals without breakdowns are left as they are, get them generated
+        (breakdowns="generate") or are queued on the BatchQueue queue
+        (breakdowns="queue"). progress is called with the counts after every
+        batch. Returns the counts of bulk_io.Importer.run.
+        """
+        importer = bulk_io.Importer(
+            self,
+            batch_size=config.BULK_BATCH_SIZE,
+            insert_max_rows=config.BULK_INSERT_MAX_ROWS,
+            breakdowns=breakdowns,
+            ai_concurrency=config.BULK_AI_CONCURRENCY,
+            queue=queue,
+            progress=progress
+        )
+        return importer.run(bulk_io.read_records(stream, fmt))
+    
+    @profiler.profiled("goals.get_user_goals")
+    @tracing.traced("goals.get_user_goals")
     def get_user_goals(self, user_uuid: str) -> List[Dict[str, Any]]:
         """Get all goals for a user with their monthly breakdowns"""
         goals = self.db.get_goals_by_user_uuid(user_uuid)
+        if not goals:
+            return []
         
-        # Enhance each goal with its monthly breakdowns
+        # Load the breakdowns and feedback of every goal in one query each
+        goal_uuids = [goal['uuid'] for goal in goals]
+        breakdowns = {}
+        for row in self.db.get_monthly_breakdowns_for_goals(goal_uuids):
+            breakdowns.setdefault(row['goal_uuid'], []).append(row)
+        feedback = {}
+        for row in self.db.get_feedback_for_goals(goal_uuids):
+            feedback.setdefault(row['goal_uuid'], []).append(row)
+        
+        # Enhance each goal with its monthly breakdowns (by month) and feedback (newest first)
         enhanced_goals = []
         for goal in goals:
             goal_data = dict(goal)
-            goal_data['monthly_breakdowns'] = self.db.get_monthly_breakdowns(goal['uuid'])
-            goal_data['feedback'] = self.db.get_feedback_for_goal(goal['uuid'])
+            goal_data['monthly_breakdowns'] = sorted(breakdowns.get(goal['uuid'], []), key=lambda row: row['month'])
+            goal_data['feedback'] = sorted(feedback.get(goal['uuid'], []),
+                                           key=lambda row: str(row['feedback_timestamp']), reverse=True)
             enhanced_goals.append(goal_data)
             
         return enhanced_goals
     
+    @profiler.profiled("goals.update_goal")
+    @tracing.traced("goals.update_goal")
     def update_goal(self, goal_uuid: str, title: str = None, description: str = None, status: str = None) -> bool:
         """Update a goal's details"""
         try:
@@ -49,17 +206,25 @@ class GoalManager:
             print(f"Error updating goal: {str(e)}")
             return False
     
-    def update_monthly_breakdown(self, breakdown_uuid: str, description: str = None, status: str = None) -> bool:
-        """Update a monthly breakdown"""
+    @profiler.profiled("goals.update_monthly_breakdown")
+    @tracing.traced("goals.update_monthly_breakdown")
+    def update_monthly_breakdown(self, breakdown_uuid: str, description: str = None, status: str = None,
+                                 goal_uuid: str = None) -> bool:
+        """Update a monthly breakdown and, after a status change, queue background feedback for its goal"""
         try:
-            self.db.update_monthly_breakdown(breakdown_uuid, description, status)
-            return True
+            changed = self.db.update_monthly_breakdown(breakdown_uuid, description, status)
         except Exception as e:
             print(f"Error updating monthly breakdown: {str(e)}")
             return False
+        
+        # changed is 0 when the breakdown already had these values (None when unknown)
+        if status is not None and goal_uuid and self.feedback_prefetcher and changed != 0:
+            self.feedback_prefetcher.schedule(goal_uuid)
+        return True
     
-    def generate_feedback(self, goal_uuid: str) -> Dict[str, Any]:
-        """Generate AI feedback for a goal based on its current progress"""
+    @tracing.traced("goals.prepare_feedback_inputs")
+    def prepare_feedback_inputs(self, goal_uuid: str) -> Dict[str, Any]:
+        """Load everything feedback for a goal depends on, together with its fingerprint"""
         # Get the goal details
         goal = self.db.get_goal_by_uuid(goal_uuid)
         if not goal:
@@ -71,24 +236,142 @@ class GoalManager:
         # Get current month
         current_month = datetime.datetime.now().month
         
-        # Generate AI feedback
-        feedback = self.ai_service.generate_goal_feedback(
+        fingerprint = compute_feedback_fingerprint(
             goal['title'],
             goal['description'],
             monthly_breakdowns,
             current_month
         )
+        return {
+            'goal': goal,
+            'monthly_breakdowns': monthly_breakdowns,
+            'current_month': current_month,
+            'fingerprint': fingerprint
+        }
+    
+    def get_stored_feedback(self, goal_uuid: str, fingerprint: str) -> Dict[str, Any]:
+        """Get previously generated feedback for a goal's progress fingerprint, if any.
         
-        # Save the feedback to the database
+        Only a missing row returns None; database and rate limit errors are raised.
+        """
+        stored = self.db.get_feedback_by_fingerprint(goal_uuid, fingerprint)
+        if not stored:
+            return None
+        return {
+            'feedback_text': stored['feedback_text'],
+            'feedback_type': stored['feedback_type']
+        }
+    
+    def get_latest_feedback(self, goal_uuid: str) -> Dict[str, Any]:
+        """Get the most recent stored feedback for a goal, marked stale, if any"""
+        try:
+            stored = self.db.get_feedback_for_goal(goal_uuid)
+        except Exception as e:
+            print(f"Error looking up earlier feedback: {str(e)}")
+            return None
+        if not stored:
+            return None
+        return {
+            'feedback_text': stored[0]['feedback_text'],
+            'feedback_type': stored[0]['feedback_type'],
+            'stale': True
+        }
+    
+    @profiler.profiled("goals.generate_feedback")
+    @tracing.traced("goals.generate_feedback")
+    def generate_feedback(self, goal_uuid: str) -> Dict[str, Any]:
+        """Generate AI feedback for a goal based on its current progress"""
+        inputs = self.prepare_feedback_inputs(goal_uuid)
+        if not inputs:
+            if self.feedback_prefetcher:
+                self.feedback_prefetcher.cancel(goal_uuid)
+            return None
+        goal = inputs['goal']
+        monthly_breakdowns = inputs['monthly_breakdowns']
+        current_month = inputs['current_month']
+        fingerprint = inputs['fingerprint']
+        
+        # Reuse the stored feedback when nothing it depends on has changed, including feedback
+        # pre-generated in the background by any process; a lookup that
+        # fails means an unhealthy database, not a reason to pay for a new AI call
+        try:
+            stored = self.get_stored_feedback(goal_uuid, fingerprint)
+        except Exception as e:
+            print(f"Error looking up stored feedback: {str(e)}")
+            metrics.DEGRADED_RESPONSES.inc(operation="goal_feedback")
+            return self.get_latest_feedback(goal_uuid) or dict(FALLBACK_FEEDBACK)
+        metrics.record_cache("feedback_fingerprint", stored is not None)
+        if stored:
+            return stored
+        
+        # Generate AI feedback, keeping budget for a degraded answer if it runs out of time
+        feedback = None
+        with deadlines.reserve(config.DEADLINE_RESERVE_SECONDS):
+            if not deadlines.expired():
+                feedback = self.ai_service.generate_goal_feedback(
+                    goal['title'],
+                    goal['description'],
+                    monthly_breakdowns,
+                    current_month
+                )
+            out_of_time = deadlines.expired()
+        if out_of_time and (feedback is None or feedback.get('fallback')):
+            metrics.DEGRADED_RESPONSES.inc(operation="goal_feedback")
+            return self.get_latest_feedback(goal_uuid) or dict(FALLBACK_FEEDBACK)
+        
+        # Save the feedback to the database; placeholder feedback is not
+        # fingerprinted so that the next request tries the AI again
         if feedback:
             self.db.create_feedback(
                 goal_uuid,
                 feedback['feedback_text'],
-                feedback['feedback_type']
+                feedback['feedback_type'],
+                fingerprint=None if feedback.get('fallback') else fingerprint
             )
         
         return feedback
             
+    @profiler.profiled("goals.generate_feedback_batch")
+    @tracing.traced("goals.generate_feedback_batch")
+    def generate_feedback_batch(self, goal_uuids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Generate feedback for several goals, asking the AI about all that need it in shared requests.
+        
+        Meant for non-interactive work: stored feedback for unchanged progress is
+        reused, new feedback is saved, and missing goals are left out.
+        """
+        results = {}
+        needed = []
+        for goal_uuid in goal_uuids:
+            inputs = self.prepare_feedback_inputs(goal_uuid)
+            if not inputs:
+                continue
+            stored = self.get_stored_feedback(goal_uuid, inputs['fingerprint'])
+            metrics.record_cache("feedback_fingerprint", stored is not None)
+            if stored:
+                results[goal_uuid] = stored
+            else:
+                needed.append((goal_uuid, inputs))
+        
+        feedbacks = self.ai_service.generate_goal_feedback_batch([
+            {
+                'title': inputs['goal']['title'],
+                'description': inputs['goal']['description'],
+                'monthly_breakdowns': inputs['monthly_breakdowns'],
+                'current_month': inputs['current_month']
+            }
+            for _, inputs in needed
+        ]) if needed else []
+        for (goal_uuid, inputs), feedback in zip(needed, feedbacks):
+            self.db.create_feedback(
+                goal_uuid,
+                feedback['feedback_text'],
+                feedback['feedback_type'],
+                fingerprint=None if feedback.get('fallback') else inputs['fingerprint']
+            )
+            results[goal_uuid] = feedback
+        return results
+    
+    @tracing.traced("goals.get_goal_status_summary")
     def get_goal_status_summary(self, goal_uuid: str) -> Dict[str, Any]:
         """Get a summary of the goal status including progress percentage"""
         # Get the goal
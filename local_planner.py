@@ -0,0 +1,44 @@
+import re
+from typing import Dict, List
+
+# Rule-based monthly plan for a goal, built without any network call.
+# Used when the AI cannot answer within its latency budget: the goal's
+# description is split into steps and spread over the year as ramp-up
+# (months 1-2), milestones (3-10, with a mid-year review in 6) and
+# consolidation and review (11-12). The same goal always gets the same plan.
+
+MILESTONE_MONTHS = range(3, 11)
+
+_SPLIT = re.compile(r"(?:[.;!?\n]+|,\s*(?:and|then)\s+|\s+(?:and then|then)\s+)", re.IGNORECASE)
+
+def split_steps(description: str) -> List[str]:
+    """Split a goal description into its steps: sentences and clauses, in order"""
+    steps = []
+    for part in _SPLIT.split(description or ""):
+        step = " ".join(part.split()).strip(" ,-")
+        if len(step) >= 3 and step.lower() not in (s.lower() for s in steps):
+            steps.append(step[0].lower() + step[1:] if not step[:2].isupper() else step)
+    return steps
+
+def plan_year(goal_title: str, goal_description: str, year: int) -> Dict[int, str]:
+    """Milestone descriptions for months 1-12 of a goal"""
+    title = " ".join((goal_title or "the goal").split())
+    steps = split_steps(goal_description) or [f"work on {title}"]
+    # Each milestone month takes the next share of the steps, so every step is covered once
+    # when there are at most eight of them, and the steps are sampled evenly when there are more
+    milestones = {month: steps[(month - MILESTONE_MONTHS.start) * len(steps) // len(MILESTONE_MONTHS)]
+                  for month in MILESTONE_MONTHS}
+    plan = {
+        1: f"Ramp-up: define what success for {title} looks like by the end of {year}, "
+           f"measure your starting point and plan the first steps.",
+        2: f"Ramp-up: build a weekly routine for {title} and start on the first step: {milestones[3]}.",
+    }
+    for month in MILESTONE_MONTHS:
+        progress = (month - 2) * 10
+        plan[month] = f"Milestone ({progress}% of the year's plan): {milestones[month]}."
+    plan[6] = f"Mid-year review: compare your progress on {title} with the plan and adjust it; " \
+              f"then continue with: {milestones[6]}."
+    plan[11] = f"Consolidate: close the remaining gaps for {title}, including: {steps[-1]}."
+    plan[12] = f"Year-end review: assess {title} against the success criteria set in January " \
+               f"and decide what to carry into {year + 1}."
+    return plan
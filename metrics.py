@@ -0,0 +1,396 @@
+import time
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+# Minimal Prometheus-style metrics registry.
+# Metrics are process-wide and rendered in the text exposition format
+# (version 0.0.4) by render() and by the side HTTP server.
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """A value that only goes up"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be computed when scraped"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Compute the value with function every time the gauge is read"""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            function = self._functions.get(key)
+            if function is None:
+                return self._values.get(key, 0)
+        return function()
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                print(f"Error computing gauge {self.name}: {str(e)}")
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series["count"] if series else 0
+
+    def _samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+class Registry:
+    """A named collection of metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+REGISTRY = Registry()
+
+# Application metrics
+DB_QUERIES = REGISTRY.counter(
+    "goal_tracker_db_queries_total", "Gibson AI queries by kind and outcome", ("kind", "outcome"))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "goal_tracker_db_query_seconds", "Gibson AI query latency", ("kind",))
+QUERIES_PER_RERUN = REGISTRY.histogram(
+    "goal_tracker_queries_per_rerun", "Gibson AI queries issued during one Streamlit rerun", (), COUNT_BUCKETS)
+LLM_REQUESTS = REGISTRY.counter(
+    "goal_tracker_llm_requests_total", "OpenAI requests by operation and outcome", ("operation", "outcome"))
+LLM_SECONDS = REGISTRY.histogram(
+    "goal_tracker_llm_latency_seconds", "OpenAI request latency by operation", ("operation",))
+PASSWORD_HASH_SECONDS = REGISTRY.histogram(
+    "goal_tracker_password_hash_seconds", "bcrypt hashing and verification time", ("operation",))
+CALLBACKS = REGISTRY.counter(
+    "goal_tracker_callbacks_total", "UI callback invocations by outcome", ("callback", "outcome"))
+CALLBACK_SECONDS = REGISTRY.histogram(
+    "goal_tracker_callback_seconds", "UI callback duration", ("callback",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "goal_tracker_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "goal_tracker_cache_hit_ratio", "Share of cache lookups that were hits", ("cache",))
+RATE_LIMITED = REGISTRY.counter(
+    "goal_tracker_rate_limited_total", "Calls rejected by the upstream rate limiters", ("upstream", "priority"))
+ACTIVE_SESSIONS = REGISTRY.gauge(
+    "goal_tracker_active_sessions", "Browser sessions that reran within the activity window")
+AI_OUTPUT = REGISTRY.counter(
+    "goal_tracker_ai_output_total",
+    "AI responses by validation result (valid, repaired, rerequested, placeholder months, invalid)",
+    ("operation", "result"))
+AI_ROUTES = REGISTRY.counter(
+    "goal_tracker_ai_routes_total",
+    "AI requests by operation and the model chosen for them (local: planned without a request)",
+    ("operation", "model"))
+OUTBOX_PENDING = REGISTRY.gauge(
+    "goal_tracker_outbox_pending", "Journaled writes not yet replayed to Gibson AI")
+OUTBOX_REPLAYED = REGISTRY.counter(
+    "goal_tracker_outbox_replayed_total", "Journaled writes replayed to Gibson AI", ("operation", "outcome"))
+OUTBOX_APPEND_SECONDS = REGISTRY.histogram(
+    "goal_tracker_outbox_append_seconds", "Time to append and sync one write to the outbox journal")
+DEADLINE_EXCEEDED = REGISTRY.counter(
+    "goal_tracker_deadline_exceeded_total", "Upstream calls cut short by the deadline of a user action", ("upstream",))
+DEGRADED_RESPONSES = REGISTRY.counter(
+    "goal_tracker_degraded_responses_total", "Degraded answers given when a user action ran out of time", ("operation",))
+BATCH_JOBS = REGISTRY.counter(
+    "goal_tracker_batch_jobs_total", "Offline AI jobs by kind and outcome (queued, ok, error)", ("kind", "outcome"))
+BULK_GOALS = REGISTRY.counter(
+    "goal_tracker_bulk_goals_total", "Goals exported or imported in bulk, by outcome", ("operation", "outcome"))
+SCHEDULER_RUNS = REGISTRY.counter(
+    "goal_tracker_scheduler_runs_total", "Scheduled runs by job and outcome (ok, partial, error, not_leader)",
+    ("job", "outcome"))
+SCHEDULER_GOALS = REGISTRY.counter(
+    "goal_tracker_scheduler_goals_total", "Goals processed by scheduled runs, by job and outcome", ("job", "outcome"))
+WARMUP_READY = REGISTRY.gauge(
+    "goal_tracker_warmup_ready", "1 once the start-up warm-up has finished, 0 while it runs")
+WARMUP_SECONDS = REGISTRY.gauge(
+    "goal_tracker_warmup_seconds", "Time each warm-up step took (step=\"total\": time to warm)", ("step", "outcome"))
+SESSION_STORE_BYTES = REGISTRY.gauge(
+    "goal_tracker_session_store_bytes", "Approximate memory held by the per-session data store")
+SESSION_STORE_SESSIONS = REGISTRY.gauge(
+    "goal_tracker_session_store_sessions", "Sessions with data in the per-session data store")
+SESSION_STORE_EVICTIONS = REGISTRY.counter(
+    "goal_tracker_session_store_evictions_total", "Sessions evicted from the per-session data store", ("reason",))
+TEMPLATE_SIMILARITY = REGISTRY.histogram(
+    "goal_tracker_template_similarity", "Cosine similarity of a new goal to the closest stored breakdown template",
+    (), SIMILARITY_BUCKETS)
+
+_ratio_caches = set()
+_ratio_lock = threading.Lock()
+
+def record_cache(cache, hit):
+    """Count a cache lookup and keep the hit ratio gauge of that cache current"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    with _ratio_lock:
+        if cache in _ratio_caches:
+            return
+        _ratio_caches.add(cache)
+    def ratio():
+        hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+        total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+        return hits / total if total else 0.0
+    CACHE_HIT_RATIO.set_function(ratio, cache=cache)
+
+# Queries per rerun: Streamlit runs a session's callbacks and script on the same
+# thread, so a thread-local count covers exactly one rerun between resets.
+_rerun = threading.local()
+
+def count_query():
+    """Count one query towards the current rerun"""
+    _rerun.queries = getattr(_rerun, "queries", 0) + 1
+
+def finish_rerun():
+    """Record and reset the number of queries issued by the current rerun"""
+    QUERIES_PER_RERUN.observe(getattr(_rerun, "queries", 0))
+    _rerun.queries = 0
+
+# Active sessions: sessions seen within the activity window
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def touch_session(session_id):
+    """Mark a session as active now"""
+    with _sessions_lock:
+        _sessions[session_id] = time.time()
+
+def _active_session_count():
+    cutoff = time.time() - config.METRICS_SESSION_WINDOW_SECONDS
+    with _sessions_lock:
+        for session_id in [sid for sid, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        return len(_sessions)
+
+ACTIVE_SESSIONS.set_function(_active_session_count)
+
+def track_callback(name):
+    """Decorator counting calls and measuring the duration of a UI callback"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                # st.rerun() raises a BaseException, which still counts as ok
+                CALLBACKS.inc(callback=name, outcome=outcome)
+                CALLBACK_SECONDS.observe(time.perf_counter() - start, callback=name)
+        return wrapper
+    return decorator
+
+# Check behind /ready; None means the process is always ready
+_readiness_check = None
+
+def set_readiness_check(check):
+    """Serve /ready from the metrics server: 200 once check() returns true, 503 before"""
+    global _readiness_check
+    _readiness_check = check
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/ready":
+            ready = _readiness_check is None or _readiness_check()
+            self._send(200 if ready else 503, b"ready\n" if ready else b"warming up\n")
+            return
+        if path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        self._send(200, REGISTRY.render().encode("utf-8"))
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the Streamlit log
+        pass
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+def _bind(host, port, tries=1):
+    """Bind the first free port of port .. port + tries - 1 (port 0 picks any free port)"""
+    error = None
+    for offset in range(max(1, tries) if port else 1):
+        try:
+            return ThreadingHTTPServer((host, port + offset if port else 0), _MetricsHandler)
+        except OSError as e:
+            error = e
+    raise error
+
+def start_metrics_server(port, host="127.0.0.1", tries=1):
+    """Serve /metrics from a daemon thread; only the first call per process starts a server.
+
+    With tries > 1 the next ports are tried in turn, so several replicas on
+    one host each get their own port; the bound port is printed.
+    """
+    global _server, _server_started
+    with _server_lock:
+        if _server_started:
+            return _server
+        _server_started = True
+        try:
+            _server = _bind(host, port, tries)
+        except OSError as e:
+            last = f"-{port + tries - 1}" if port and tries > 1 else ""
+            print(f"Failed to start metrics server on port {port}{last}: {str(e)}")
+            return None
+        _server.daemon_threads = True
+        thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        print(f"Metrics server listening on {host}:{_server.server_address[1]}")
+        return _server
@@ -0,0 +1,307 @@
+"""Versioned schema migrations for the Goal Tracker database.
+
+Each migration has DDL for SQLite (the local stand-in) and MySQL (Gibson AI).
+Applied versions are recorded in `schema_migrations`.
+
+Usage:
+  python migrations.py migrate [--sqlite PATH]    apply pending migrations (to Gibson AI without --sqlite)
+  python migrations.py baseline VERSION           mark migrations up to VERSION as applied on Gibson AI
+  python migrations.py sql [--dialect mysql]      print the DDL of every migration
+  python migrations.py verify                     EXPLAIN every Database query on SQLite, fail on full scans
+"""
+import sys
+import argparse
+from typing import Callable, Dict, Any, List
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "Create user, goal, monthly breakdown and feedback tables",
+        "sqlite": [
+            """
+            CREATE TABLE `user_profile` (
+                `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `username` VARCHAR(255) NOT NULL UNIQUE,
+                `password` VARCHAR(255) NOT NULL,
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE `goal` (
+                `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `user_id` INTEGER NOT NULL REFERENCES `user_profile` (`id`),
+                `title` VARCHAR(255) NOT NULL,
+                `description` TEXT,
+                `year` INTEGER NOT NULL,
+                `status` VARCHAR(32) NOT NULL DEFAULT 'on_track',
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE `goal_monthly_breakdown` (
+                `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `goal_id` INTEGER NOT NULL REFERENCES `goal` (`id`),
+                `month` INTEGER NOT NULL,
+                `description` TEXT,
+                `status` VARCHAR(32) NOT NULL DEFAULT 'not_started',
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE `goal_feedback` (
+                `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `goal_id` INTEGER NOT NULL REFERENCES `goal` (`id`),
+                `feedback_text` TEXT,
+                `feedback_type` VARCHAR(32),
+                `feedback_timestamp` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        ],
+        "mysql": [
+            """
+            CREATE TABLE `user_profile` (
+                `id` BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `username` VARCHAR(255) NOT NULL UNIQUE,
+                `password` VARCHAR(255) NOT NULL,
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE `goal` (
+                `id` BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `user_id` BIGINT NOT NULL,
+                `title` VARCHAR(255) NOT NULL,
+                `description` TEXT,
+                `year` INT NOT NULL,
+                `status` VARCHAR(32) NOT NULL DEFAULT 'on_track',
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (`user_id`) REFERENCES `user_profile` (`id`)
+            )
+            """,
+            """
+            CREATE TABLE `goal_monthly_breakdown` (
+                `id` BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `goal_id` BIGINT NOT NULL,
+                `month` INT NOT NULL,
+                `description` TEXT,
+                `status` VARCHAR(32) NOT NULL DEFAULT 'not_started',
+                `date_created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (`goal_id`) REFERENCES `goal` (`id`)
+            )
+            """,
+            """
+            CREATE TABLE `goal_feedback` (
+                `id` BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                `uuid` VARCHAR(36) NOT NULL UNIQUE,
+                `goal_id` BIGINT NOT NULL,
+                `feedback_text` TEXT,
+                `feedback_type` VARCHAR(32),
+                `feedback_timestamp` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (`goal_id`) REFERENCES `goal` (`id`)
+            )
+            """
+        ]
+    },
+    {
+        "version": 2,
+        "description": "Add the progress fingerprint to feedback",
+        "sqlite": ["ALTER TABLE `goal_feedback` ADD COLUMN `fingerprint` VARCHAR(64)"],
+        "mysql": ["ALTER TABLE `goal_feedback` ADD COLUMN `fingerprint` VARCHAR(64)"]
+    },
+    {
+        "version": 3,
+        "description": "Add composite indexes matching the filter and sort columns of every query",
+        # get_goals_by_user_uuid: WHERE user_id ORDER BY year DESC, date_created DESC
+        # get_monthly_breakdowns: WHERE goal_id ORDER BY month
+        # get_feedback_for_goal: WHERE goal_id ORDER BY feedback_timestamp DESC
+        # get_feedback_by_fingerprint: WHERE goal_id AND fingerprint ORDER BY feedback_timestamp DESC LIMIT 1
+        "sqlite": [
+            "CREATE INDEX `idx_goal_user_year_created` ON `goal` (`user_id`, `year`, `date_created`)",
+            "CREATE INDEX `idx_breakdown_goal_month` ON `goal_monthly_breakdown` (`goal_id`, `month`)",
+            "CREATE INDEX `idx_feedback_goal_timestamp` ON `goal_feedback` (`goal_id`, `feedback_timestamp`)",
+            "CREATE INDEX `idx_feedback_goal_fingerprint` ON `goal_feedback` (`goal_id`, `fingerprint`, `feedback_timestamp`)"
+        ],
+        "mysql": [
+            "CREATE INDEX `idx_goal_user_year_created` ON `goal` (`user_id`, `year`, `date_created`)",
+            "CREATE INDEX `idx_breakdown_goal_month` ON `goal_monthly_breakdown` (`goal_id`, `month`)",
+            "CREATE INDEX `idx_feedback_goal_timestamp` ON `goal_feedback` (`goal_id`, `feedback_timestamp`)",
+            "CREATE INDEX `idx_feedback_goal_fingerprint` ON `goal_feedback` (`goal_id`, `fingerprint`, `feedback_timestamp`)"
+        ]
+    }
+]
+
+LATEST_VERSION = MIGRATIONS[-1]["version"]
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+    `version` INTEGER NOT NULL PRIMARY KEY,
+    `description` VARCHAR(255) NOT NULL,
+    `applied_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def _record_version(execute: Callable[[str], Any], migration: Dict[str, Any]) -> None:
+    description = migration["description"].replace("'", "''")
+    execute(f"INSERT INTO `schema_migrations` (`version`, `description`) "
+            f"VALUES ({migration['version']}, '{description}')")
+
+def applied_versions(execute: Callable[[str], Any]) -> List[int]:
+    """Get the migration versions recorded as applied"""
+    execute(CREATE_MIGRATIONS_TABLE)
+    rows = execute("SELECT `version` FROM `schema_migrations` ORDER BY `version`")
+    return [int(row["version"]) for row in rows or []]
+
+def migrate(execute: Callable[[str], Any], dialect: str = "sqlite", target: int = LATEST_VERSION) -> List[int]:
+    """Apply every migration up to target that is not applied yet; returns the versions applied.
+
+    execute runs one SQL statement, e.g. SQLiteBackend.execute or Database.execute_query.
+    """
+    applied = set(applied_versions(execute))
+    newly_applied = []
+    for migration in MIGRATIONS:
+        if migration["version"] > target or migration["version"] in applied:
+            continue
+        for statement in migration[dialect]:
+            execute(statement)
+        _record_version(execute, migration)
+        newly_applied.append(migration["version"])
+    return newly_applied
+
+def baseline(execute: Callable[[str], Any], version: int) -> List[int]:
+    """Record migrations up to version as applied without running them (for a database created by hand)"""
+    applied = set(applied_versions(execute))
+    recorded = []
+    for migration in MIGRATIONS:
+        if migration["version"] <= version and migration["version"] not in applied:
+            _record_version(execute, migration)
+            recorded.append(migration["version"])
+    return recorded
+
+# Calls covering every query template of Database, in an order where each
+# call's rows exist. Values in braces are filled in from earlier results.
+VERIFY_CALLS = [
+    ("create_user", ("verify_user", "hashed"), "user_uuid"),
+    ("get_user_by_username", ("verify_user",), None),
+    ("get_user_by_uuid", ("{user_uuid}",), None),
+    ("create_goal", ("{user_uuid}", "Verify goal", "Description", 2025), "goal_uuid"),
+    ("get_goals_by_user_uuid", ("{user_uuid}",), None),
+    ("get_goal_by_uuid", ("{goal_uuid}",), None),
+    ("update_goal", ("{goal_uuid}", "Title", "Description", "behind"), None),
+    ("update_goal", ("{goal_uuid}", None, None, "ahead"), None),
+    ("create_monthly_breakdown", ("{goal_uuid}", 1, "January"), "breakdown_uuid"),
+    ("get_monthly_breakdowns", ("{goal_uuid}",), None),
+    ("get_monthly_breakdown_by_uuid", ("{breakdown_uuid}",), None),
+    ("update_monthly_breakdown", ("{breakdown_uuid}", "January", "ahead"), None),
+    ("update_rows", ("goal_monthly_breakdown", {"{breakdown_uuid}": {"status": "on_track"}}), None),
+    ("update_rows", ("goal_monthly_breakdown", {"{breakdown_uuid}": {"description": "Plan", "status": "behind"}}), None),
+    ("create_feedback", ("{goal_uuid}", "Feedback", "affirm", "fingerprint"), None),
+    ("create_feedback", ("{goal_uuid}", "Feedback", "affirm", "fingerprint", "feedback-uuid"), None),
+    ("get_feedback_by_fingerprint", ("{goal_uuid}", "fingerprint"), None),
+    ("get_feedback_for_goal", ("{goal_uuid}",), None),
+    ("get_users_by_usernames", (["verify_user", "other_user"],), None),
+    ("get_existing_uuids", ("goal", ["{goal_uuid}", "other-goal"]), None),
+    ("create_goals", ([{"user_uuid": "{user_uuid}", "title": "Bulk goal", "description": "Imported", "year": 2025}],), None),
+    ("create_monthly_breakdowns", ([{"goal_uuid": "{goal_uuid}", "month": 2, "description": "February"}],), None),
+    ("create_feedbacks", ([{"goal_uuid": "{goal_uuid}", "feedback_text": "Imported", "feedback_type": "affirm"}],), None),
+    ("get_goals_page", (0, 100), None),
+    ("get_monthly_breakdowns_for_goals", (["{goal_uuid}", "other-goal"],), None),
+    ("get_feedback_for_goals", (["{goal_uuid}", "other-goal"],), None),
+]
+
+# Database methods that do not build queries of their own
+NON_QUERY_METHODS = {"escape_sql", "execute_query", "affected_rows"}
+
+def _fill(value, names):
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+        return names[value[1:-1]]
+    if isinstance(value, dict):
+        return {_fill(key, names): _fill(item, names) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, names) for item in value]
+    return value
+
+def _plan_problems(plan: List[Dict[str, Any]]) -> List[str]:
+    """Steps of a SQLite query plan that read a whole table or index, or sort in a temporary B-tree"""
+    return [row["detail"] for row in plan
+            if row["detail"].startswith("SCAN") or "TEMP B-TREE" in row["detail"]]
+
+def verify(target: int = LATEST_VERSION) -> List[str]:
+    """EXPLAIN every query Database issues on a SQLite database migrated to target; returns the problems found"""
+    from database import Database
+    from sqlite_backend import SQLiteBackend, SQLiteDatabase
+
+    backend = SQLiteBackend(create_schema=False)
+    migrate(backend.execute, "sqlite", target)
+    db = SQLiteDatabase(backend)
+    names = {}
+    problems = []
+    covered = set()
+    for method, args, result_name in VERIFY_CALLS:
+        covered.add(method)
+        start = len(db.queries)
+        result = getattr(db, method)(*[_fill(arg, names) for arg in args])
+        if result_name:
+            names[result_name] = result
+        for query in db.queries[start:]:
+            plan = db.backend.execute(f"EXPLAIN QUERY PLAN {query}")
+            for detail in _plan_problems(plan):
+                problems.append(f"{method}: {detail}\n    {' '.join(query.split())}")
+
+    public_methods = {name for name in vars(Database) if not name.startswith("_") and callable(getattr(Database, name))}
+    for method in sorted(public_methods - NON_QUERY_METHODS - covered):
+        problems.append(f"{method}: not covered by VERIFY_CALLS in migrations.py")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="apply pending migrations")
+    migrate_parser.add_argument("--sqlite", metavar="PATH", help="migrate a SQLite database instead of Gibson AI")
+    baseline_parser = commands.add_parser("baseline", help="mark migrations as applied on Gibson AI")
+    baseline_parser.add_argument("version", type=int)
+    sql_parser = commands.add_parser("sql", help="print the DDL of every migration")
+    sql_parser.add_argument("--dialect", choices=("sqlite", "mysql"), default="mysql")
+    commands.add_parser("verify", help="EXPLAIN every Database query and fail on full scans")
+    args = parser.parse_args()
+
+    if args.command == "sql":
+        for migration in MIGRATIONS:
+            print(f"-- {migration['version']}: {migration['description']}")
+            for statement in migration[args.dialect]:
+                print(f"{statement.strip()};")
+        return 0
+
+    if args.command == "verify":
+        problems = verify()
+        for problem in problems:
+            print(f"FAIL {problem}")
+        if problems:
+            return 1
+        print(f"OK: every Database query uses an index (schema version {LATEST_VERSION})")
+        return 0
+
+    if args.command == "migrate" and args.sqlite:
+        from sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend(args.sqlite, create_schema=False)
+        execute, dialect = backend.execute, "sqlite"
+    else:
+        from database import Database
+        execute, dialect = Database().execute_query, "mysql"
+
+    if args.command == "baseline":
+        versions = baseline(execute, args.version)
+        print(f"Recorded as applied: {versions or 'nothing'}")
+    else:
+        versions = migrate(execute, dialect)
+        print(f"Applied migrations: {versions or 'none, schema is up to date'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+import deadlines
+
+# Latency-aware choice of the OpenAI model for each request.
+# Every kind of request (a route: breakdowns or feedback) has a list of models
+# in order of preference and an optional latency SLO. The router keeps the
+# recent latencies of each model per operation and picks the first model whose
+# observed latency (a high quantile of the recent requests) fits the budget:
+# the SLO, or less if the current action's deadline leaves less. When no model
+# fits, choose() returns None and the caller falls back without a request.
+# A model's history expires after probe_seconds, so a model that was slow
+# gets tried again later.
+
+ROUTES = {
+    "monthly_breakdowns": "breakdowns",
+    "missing_months": "breakdowns",
+    "batch_monthly_breakdowns": "breakdowns",
+    "goal_feedback": "feedback",
+    "batch_goal_feedback": "feedback",
+}
+
+class ModelRouter:
+    """Per-route model preferences and SLOs, with latency history per model and operation"""
+
+    def __init__(self, default_model: str, models: Dict[str, List[str]] = None, slos: Dict[str, float] = None,
+                 window: int = 20, min_samples: int = 3, quantile: float = 0.9, probe_seconds: float = 300.0):
+        self.default_model = default_model
+        self.models = {route: list(candidates) for route, candidates in (models or {}).items() if candidates}
+        # SLOs of 0 or less are turned off
+        self.slos = {route: slo for route, slo in (slos or {}).items() if slo and slo > 0}
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.quantile = quantile
+        self.probe_seconds = probe_seconds
+        self._lock = threading.Lock()
+        self._history = {}
+
+    def candidates(self, operation: str) -> List[str]:
+        """Models for an operation, in order of preference"""
+        return self.models.get(ROUTES.get(operation, operation), [self.default_model])
+
+    @contextmanager
+    def slo(self, route: str):
+        """Run the enclosed requests within the route's latency SLO (nested in any deadline already set)"""
+        seconds = self.slos.get(route)
+        with deadlines.deadline(seconds) if seconds is not None else nullcontext():
+            yield
+
+    def estimate(self, model: str, operation: str) -> Optional[float]:
+        """Observed latency of model for operation, or None while there is too little recent history"""
+        with self._lock:
+            history = self._history.get((model, operation))
+            if not history or len(history) < self.min_samples:
+                return None
+            if time.monotonic() - history[-1][0] > self.probe_seconds:
+                return None
+            latencies = sorted(seconds for _, seconds in history)
+        return latencies[min(len(latencies) - 1, int(self.quantile * len(latencies)))]
+
+    def choose(self, operation: str) -> Optional[str]:
+        """The preferred model expected to answer within the remaining budget, or None if none is"""
+        budget = deadlines.remaining()
+        for model in self.candidates(operation):
+            estimate = self.estimate(model, operation)
+            if budget is None or estimate is None or estimate <= budget:
+                return model
+        return None
+
+    def record(self, model: str, operation: str, seconds: float) -> None:
+        """Add the latency of a finished or timed-out request to the model's history"""
+        with self._lock:
+            history = self._history.get((model, operation))
+            if history is None:
+                history = self._history[(model, operation)] = deque(maxlen=self.window)
+            history.append((time.monotonic(), seconds))
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Current latency estimate of each model, per operation"""
+        with self._lock:
+            keys = list(self._history)
+        stats = {}
+        for model, operation in keys:
+            stats.setdefault(operation, {})[model] = self.estimate(model, operation)
+        return stats
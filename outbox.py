@@ -0,0 +1,487 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import shutil
+import threading
+from typing import Dict, Any, List
+from database import QueryError
+import metrics
+import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # No lock files on Windows; run a single process per outbox directory there
+    fcntl = None
+
+# Write-ahead outbox for writes to Gibson AI.
+# Goal updates, status changes and feedback inserts are appended to a local
+# journal (one JSON line per write, fsynced) and acknowledged at once. A
+# background flusher replays them to Gibson in journal order: each batch is
+# coalesced into one UPDATE per table plus idempotent feedback inserts, then a
+# checkpoint with the last applied sequence number is written atomically. On
+# restart, journal entries after the checkpoint are replayed again, so a crash
+# at any point loses no acknowledged write and applies none twice.
+#
+# Files in the outbox directory:
+#   journal.jsonl     pending (and recently applied) writes
+#   checkpoint.json   {"applied_seq": n}
+#   failed.jsonl      writes Gibson rejected OUTBOX_MAX_ATTEMPTS times
+#   outbox.lock       flocked by the process that owns the directory
+#   pid-<pid>/        outbox of another process on the host, which found the
+#                     directory locked; the owner replays what such a process
+#                     left behind once it has exited
+
+OPERATIONS = ("update_goal", "update_monthly_breakdown", "create_feedback")
+# Rewrite the journal once this many applied entries precede the pending ones
+COMPACT_AFTER = 1000
+# Spans that made the writes of a batch, recorded on the span of its replay
+MAX_LINKS = 10
+# Seconds between looks for outboxes left behind by exited processes
+ADOPT_INTERVAL = 60.0
+
+def _lock_directory(directory: str):
+    """Take the directory's lock without waiting; returns the open lock file, or None if another process holds it"""
+    os.makedirs(directory, exist_ok=True)
+    lock_file = open(os.path.join(directory, "outbox.lock"), "a")
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def _is_permanent(error: Exception) -> bool:
+    """Whether Gibson rejected the write itself, as opposed to being unreachable or overloaded"""
+    status = getattr(error, "status", None)
+    return isinstance(error, QueryError) and status is not None and 400 <= status < 500 and status not in (408, 429)
+
+class Outbox:
+    """Durable journal of writes, replayed to the database by a background thread"""
+
+    def __init__(self, db, directory: str, flush_interval: float = 0.2, batch_size: int = 50,
+                 max_attempts: int = 3, max_backoff: float = 30.0, fsync: bool = True, fallback: bool = True):
+        self.db = db
+        # Two processes appending to one journal would reuse sequence numbers and
+        # overwrite each other's checkpoint, so a process that finds the directory
+        # locked keeps its own journal in a subdirectory
+        self.root = directory
+        self._lock_file = _lock_directory(directory)
+        if self._lock_file is None and not fallback:
+            raise RuntimeError(f"Outbox directory {directory} is in use by another process")
+        if self._lock_file is None:
+            directory = os.path.join(directory, f"pid-{os.getpid()}")
+            self._lock_file = _lock_directory(directory)
+            if self._lock_file is None:
+                raise RuntimeError(f"Outbox directory {directory} is already in use by this process")
+            print(f"Outbox: {self.root} is in use by another process, journaling to {directory}")
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.max_backoff = max_backoff
+        self.fsync = fsync
+
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.checkpoint_path = os.path.join(directory, "checkpoint.json")
+        self.failed_path = os.path.join(directory, "failed.jsonl")
+
+        self._lock = threading.RLock()
+        # Serializes replays (the flusher thread, flush() and close())
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = []
+        self._applied_in_journal = 0
+        self._attempts = {}
+        self._backoff = 0.0
+        self._adopted_at = None
+
+        self.applied_seq = self._read_checkpoint()
+        self._seq = self.applied_seq
+        self._recover()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    # Recovery
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["applied_seq"])
+        except FileNotFoundError:
+            return 0
+
+    def _recover(self) -> None:
+        """Load the journal entries written after the checkpoint; drop a torn last line"""
+        if not os.path.exists(self.journal_path):
+            return
+        valid_bytes = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash during the append
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                self._seq = max(self._seq, entry["seq"])
+                if entry["seq"] > self.applied_seq:
+                    self._pending.append(entry)
+                else:
+                    self._applied_in_journal += 1
+        if valid_bytes < os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        if self._pending:
+            print(f"Outbox: recovered {len(self._pending)} unreplayed writes")
+
+    # Recording writes
+
+    def record(self, operation: str, **args) -> Dict[str, Any]:
+        """Durably journal one write and queue it for replay"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown outbox operation: {operation}")
+        start = time.perf_counter()
+        with self._lock:
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "key": str(uuid.uuid4()),
+                "op": operation,
+                "args": args,
+                "ts": time.time()
+            }
+            # The span that made the write, for the trace of its replay
+            origin = tracing.link()
+            if origin is not None:
+                entry["span"] = origin
+            self._journal.write(json.dumps(entry) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.append(entry)
+        metrics.OUTBOX_APPEND_SECONDS.observe(time.perf_counter() - start)
+        self._wake.set()
+        return entry
+
+    def update_goal(self, goal_uuid, title=None, description=None, status=None) -> None:
+        self.record("update_goal", goal_uuid=goal_uuid, title=title, description=description, status=status)
+
+    def update_monthly_breakdown(self, breakdown_uuid, description=None, status=None) -> None:
+        self.record("update_monthly_breakdown", breakdown_uuid=breakdown_uuid, description=description, status=status)
+
+    def create_feedback(self, goal_uuid, feedback_text, feedback_type, fingerprint=None) -> str:
+        """Journal a feedback insert; the idempotency key becomes the feedback's uuid"""
+        entry = self.record("create_feedback", goal_uuid=goal_uuid, feedback_text=feedback_text,
+                            feedback_type=feedback_type, fingerprint=fingerprint)
+        return entry["key"]
+
+    # Pending writes, for overlaying on reads
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def pending_entries(self) -> List[Dict[str, Any]]:
+        """Get the writes not yet applied, in journal order"""
+        with self._lock:
+            return list(self._pending)
+
+    def pending_updates(self, operation: str, key_field: str) -> Dict[str, Dict[str, Any]]:
+        """Get the net column changes of pending updates, per row uuid"""
+        updates = {}
+        for entry in self.pending_entries():
+            if entry["op"] != operation:
+                continue
+            args = entry["args"]
+            changes = updates.setdefault(args[key_field], {})
+            changes.update({column: value for column, value in args.items()
+                            if column != key_field and value is not None})
+        return updates
+
+    def pending_feedback(self, goal_uuid: str) -> List[Dict[str, Any]]:
+        """Get pending feedback rows of a goal, newest first"""
+        rows = []
+        for entry in self.pending_entries():
+            args = entry["args"]
+            if entry["op"] == "create_feedback" and args["goal_uuid"] == goal_uuid:
+                rows.append({
+                    "uuid": entry["key"],
+                    "feedback_text": args["feedback_text"],
+                    "feedback_type": args["feedback_type"],
+                    "fingerprint": args["fingerprint"],
+                    "feedback_timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+                })
+        rows.reverse()
+        return rows
+
+    # Replay
+
+    def _apply(self, batch: List[Dict[str, Any]]) -> None:
+        """Apply a batch: one UPDATE per table with the net changes, then the feedback inserts in order"""
+        goal_updates = {}
+        breakdown_updates = {}
+        for entry in batch:
+            args = entry["args"]
+            if entry["op"] == "update_goal":
+                changes = goal_updates.setdefault(args["goal_uuid"], {})
+                changes.update({column: args[column] for column in ("title", "description", "status")
+                                if args.get(column) is not None})
+            elif entry["op"] == "update_monthly_breakdown":
+                changes = breakdown_updates.setdefault(args["breakdown_uuid"], {})
+                changes.update({column: args[column] for column in ("description", "status")
+                                if args.get(column) is not None})
+        self.db.update_rows("goal", {row: changes for row, changes in goal_updates.items() if changes})
+        self.db.update_rows("goal_monthly_breakdown",
+                            {row: changes for row, changes in breakdown_updates.items() if changes})
+        for entry in batch:
+            if entry["op"] == "create_feedback":
+                args = entry["args"]
+                self.db.create_feedback(args["goal_uuid"], args["feedback_text"], args["feedback_type"],
+                                        fingerprint=args["fingerprint"], feedback_uuid=entry["key"])
+
+    def _mark_applied(self, batch: List[Dict[str, Any]], outcome: str = "ok") -> None:
+        with self._lock:
+            self.applied_seq = batch[-1]["seq"]
+            self._write_checkpoint()
+            applied = {entry["seq"] for entry in batch}
+            self._pending = [entry for entry in self._pending if entry["seq"] not in applied]
+            self._applied_in_journal += len(batch)
+            for entry in batch:
+                self._attempts.pop(entry["seq"], None)
+            self._compact()
+        for entry in batch:
+            metrics.OUTBOX_REPLAYED.inc(operation=entry["op"], outcome=outcome)
+
+    def _write_checkpoint(self) -> None:
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"applied_seq": self.applied_seq}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temporary, self.checkpoint_path)
+
+    def _compact(self) -> None:
+        """Drop applied entries from the journal once it is empty of pending ones or has grown large"""
+        if self._pending and self._applied_in_journal < COMPACT_AFTER:
+            return
+        if not self._pending and self._applied_in_journal == 0:
+            return
+        temporary = self.journal_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._journal.close()
+        os.replace(temporary, self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._applied_in_journal = 0
+
+    def _dead_letter(self, entry: Dict[str, Any], error: Exception) -> None:
+        print(f"Outbox: giving up on {entry['op']} #{entry['seq']}: {str(error)}")
+        with open(self.failed_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(entry, error=str(error))) + "\n")
+        self._mark_applied([entry], outcome="failed")
+
+    def _apply_singly(self, batch: List[Dict[str, Any]]) -> bool:
+        """Apply a rejected batch one write at a time to isolate the write Gibson rejects"""
+        for entry in batch:
+            try:
+                self._apply([entry])
+            except Exception as e:
+                if not _is_permanent(e):
+                    raise
+                attempts = self._attempts.get(entry["seq"], 0) + 1
+                self._attempts[entry["seq"]] = attempts
+                if attempts >= self.max_attempts:
+                    self._dead_letter(entry, e)
+                    continue
+                print(f"Outbox: {entry['op']} #{entry['seq']} rejected (attempt {attempts}): {str(e)}")
+                return False
+            self._mark_applied([entry])
+        return True
+
+    def flush(self) -> bool:
+        """Replay pending writes until none are left; returns False if a replay failed"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    self._backoff = 0.0
+                    return True
+                try:
+                    origins = [entry["span"] for entry in batch if entry.get("span")]
+                    with tracing.span("outbox.flush", writes=len(batch),
+                                      follows_from=list({o["span_id"]: o for o in origins}.values())[:MAX_LINKS]):
+                        try:
+                            self._apply(batch)
+                        except Exception as e:
+                            if not _is_permanent(e) or not self._apply_singly(batch):
+                                raise
+                            continue
+                except Exception as e:
+                    self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+                    print(f"Outbox: replay failed, retrying in {self._backoff:.1f}s: {str(e)}")
+                    return False
+                finally:
+                    tracing.finish_rerun("outbox_flush")
+                self._mark_applied(batch)
+
+    # Background flusher
+
+    def start(self) -> "Outbox":
+        """Start the background flusher (and a final flush at interpreter exit)"""
+        if self._thread is None:
+            metrics.OUTBOX_PENDING.set_function(self.pending_count)
+            self._thread = threading.Thread(target=self._run, name="outbox-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._backoff or self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.pending_count():
+                self.flush()
+            elif self._adopted_at is None or time.monotonic() - self._adopted_at >= ADOPT_INTERVAL:
+                self.adopt_orphans()
+
+    def adopt_orphans(self) -> int:
+        """Replay the writes left in the pid-<pid> outboxes of processes that have exited; returns how many"""
+        self._adopted_at = time.monotonic()
+        if self.directory != self.root:
+            return 0
+        replayed = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or not entry.name.startswith("pid-"):
+                continue
+            try:
+                orphan = Outbox(self.db, entry.path, batch_size=self.batch_size, max_attempts=self.max_attempts,
+                                max_backoff=self.max_backoff, fsync=self.fsync, fallback=False)
+            except RuntimeError:
+                # Its process is still running
+                continue
+            count = orphan.pending_count()
+            flushed = orphan.flush()
+            orphan.close()
+            replayed += count - orphan.pending_count()
+            if flushed and not os.path.exists(orphan.failed_path):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        if replayed:
+            print(f"Outbox: replayed {replayed} writes left by exited processes")
+        return replayed
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and try once more to replay what is pending; the rest is replayed on restart"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if self.pending_count():
+            self.flush()
+        with self._lock:
+            if not self._journal.closed:
+                self._journal.close()
+            if not self._lock_file.closed:
+                self._lock_file.close()
+
+class OutboxDatabase:
+    """Database whose goal, status and feedback writes go through an Outbox.
+
+    Reads are passed through with the pending writes overlaid, so a session sees
+    its own writes before they reach Gibson AI. Everything else is delegated to
+    the wrapped Database.
+    """
+
+    def __init__(self, db, outbox: Outbox):
+        self.db = db
+        self.outbox = outbox
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    # Writes
+
+    def update_goal(self, goal_uuid, title=None, description=None, status=None):
+        if title is None and description is None and status is None:
+            return
+        self.outbox.update_goal(goal_uuid, title, description, status)
+
+    def update_monthly_breakdown(self, breakdown_uuid, description=None, status=None):
+        if description is None and status is None:
+            return
+        self.outbox.update_monthly_breakdown(breakdown_uuid, description, status)
+
+    def create_feedback(self, goal_uuid, feedback_text, feedback_type, fingerprint=None):
+        return self.outbox.create_feedback(goal_uuid, feedback_text, feedback_type, fingerprint)
+
+    # Reads
+
+    def _overlay(self, rows, operation, key_field):
+        if not rows:
+            return rows
+        updates = self.outbox.pending_updates(operation, key_field)
+        if not updates:
+            return rows
+        return [dict(row, **updates[row['uuid']]) if row.get('uuid') in updates else row for row in rows]
+
+    def _overlay_one(self, row, operation, key_field):
+        if row is None:
+            return None
+        return self._overlay([row], operation, key_field)[0]
+
+    def get_goal_by_uuid(self, goal_uuid):
+        return self._overlay_one(self.db.get_goal_by_uuid(goal_uuid), "update_goal", "goal_uuid")
+
+    def get_goals_by_user_uuid(self, user_uuid):
+        return self._overlay(self.db.get_goals_by_user_uuid(user_uuid), "update_goal", "goal_uuid")
+
+    def get_monthly_breakdowns(self, goal_uuid):
+        return self._overlay(self.db.get_monthly_breakdowns(goal_uuid),
+                             "update_monthly_breakdown", "breakdown_uuid")
+
+    def get_monthly_breakdown_by_uuid(self, breakdown_uuid):
+        return self._overlay_one(self.db.get_monthly_breakdown_by_uuid(breakdown_uuid),
+                                 "update_monthly_breakdown", "breakdown_uuid")
+
+    def get_feedback_for_goal(self, goal_uuid):
+        pending = self.outbox.pending_feedback(goal_uuid)
+        stored = self.db.get_feedback_for_goal(goal_uuid)
+        if not pending:
+            return stored
+        # A write replayed between the two reads shows up in both
+        pending_uuids = {row['uuid'] for row in pending}
+        return pending + [row for row in stored or [] if row.get('uuid') not in pending_uuids]
+
+    def get_monthly_breakdowns_for_goals(self, goal_uuids):
+        return self._overlay(self.db.get_monthly_breakdowns_for_goals(goal_uuids),
+                             "update_monthly_breakdown", "breakdown_uuid")
+
+    def get_feedback_for_goals(self, goal_uuids):
+        pending = [dict(row, goal_uuid=goal_uuid) for goal_uuid in goal_uuids
+                   for row in self.outbox.pending_feedback(goal_uuid)]
+        stored = self.db.get_feedback_for_goals(goal_uuids)
+        if not pending:
+            return stored
+        pending_uuids = {row['uuid'] for row in pending}
+        return pending + [row for row in stored or [] if row.get('uuid') not in pending_uuids]
+
+    def get_feedback_by_fingerprint(self, goal_uuid, fingerprint):
+        for row in self.outbox.pending_feedback(goal_uuid):
+            if row['fingerprint'] == fingerprint:
+                return row
+        return self.db.get_feedback_by_fingerprint(goal_uuid, fingerprint)
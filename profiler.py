@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import threading
+import functools
+import contextvars
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+import config
+
+# Opt-in sampling profiler.
+# While a profiled block runs, a daemon thread samples the stack of the thread
+# running it every PROFILE_INTERVAL_SECONDS. Each profiled block writes one
+# collapsed-stack file ("root;caller;leaf count" lines, the input format of
+# flamegraph.pl and speedscope) and feeds the hot function summary of the
+# session it ran for. Profiling is enabled for the whole process with
+# GOAL_TRACKER_PROFILE=1, for one context with set_session_profiling(), or for
+# the sessions the lookup given to set_session_lookup() names.
+
+# Summaries kept for this many sessions; the least recently profiled is dropped
+MAX_SESSIONS = 100
+
+# Session key of the current context, "" for an unnamed session, None when not profiling
+_session = contextvars.ContextVar("profiling_session", default=None)
+_session_lookup: Optional[Callable[[], Optional[str]]] = None
+_active = threading.local()
+# Hot function counters and sample totals per session key ("" for the process)
+_summaries: "OrderedDict[str, Tuple[Counter, List[int]]]" = OrderedDict()
+_summary_lock = threading.Lock()
+_files_lock = threading.Lock()
+
+def set_session_profiling(enabled: bool, session: str = "") -> None:
+    """Enable or disable profiling for the current context, attributing its samples to session"""
+    _session.set(session if enabled else None)
+
+def set_session_lookup(lookup: Optional[Callable[[], Optional[str]]]) -> None:
+    """Set a function returning the key of the current session if it has opted in to profiling, else None.
+
+    Streamlit runs on_click callbacks before the script body, outside any
+    context the body sets up, so app.py looks the flag up in session_state.
+    """
+    global _session_lookup
+    _session_lookup = lookup
+
+def current_session() -> Optional[str]:
+    """Key of the session profiled in the current context, None if it has not opted in"""
+    session = _session.get()
+    if session is None and _session_lookup is not None:
+        try:
+            session = _session_lookup()
+        except Exception:
+            session = None
+    return session
+
+def is_enabled() -> bool:
+    """Check whether profiled blocks should be sampled in the current context"""
+    return config.PROFILE_ENABLED or current_session() is not None
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """Sample the call stack of one thread at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.stacks
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+
+def collapse(stacks: Counter) -> str:
+    """Format sampled stacks in the collapsed-stack format"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def _write_profile(name: str, stacks: Counter) -> None:
+    directory = config.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-{name}.folded"
+    with _files_lock:
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+            f.write(collapse(stacks))
+
+        # Keep only the newest files
+        files = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith(".folded")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(0, len(files) - config.PROFILE_KEEP_FILES)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def _record_summary(session: str, stacks: Counter) -> None:
+    with _summary_lock:
+        if session not in _summaries:
+            _summaries[session] = (Counter(), [0])
+            while len(_summaries) > MAX_SESSIONS:
+                _summaries.popitem(last=False)
+        _summaries.move_to_end(session)
+        hot, total = _summaries[session]
+        for stack, count in stacks.items():
+            # Self time: the innermost frame of each sample
+            hot[stack.rsplit(";", 1)[-1]] += count
+            total[0] += count
+
+def hot_functions(limit: int = 10, session: str = None) -> List[Tuple[str, int, float]]:
+    """Get the functions with the most self samples as (function, samples, percent of the session's samples).
+
+    Only the blocks profiled for session count, by default the session of the
+    current context; blocks profiled without one (GOAL_TRACKER_PROFILE=1) count as "".
+    """
+    if session is None:
+        session = current_session() or ""
+    with _summary_lock:
+        if session not in _summaries:
+            return []
+        hot, total = _summaries[session]
+        return [(function, count, round(count / (total[0] or 1) * 100, 1))
+                for function, count in hot.most_common(limit)]
+
+@contextmanager
+def profile(name: str):
+    """Sample the enclosed block when profiling is enabled; nested blocks on one thread share the outer profile"""
+    if not is_enabled() or getattr(_active, "profiling", False):
+        yield
+        return
+
+    session = current_session() or ""
+    _active.profiling = True
+    sampler = SamplingProfiler(threading.get_ident(), config.PROFILE_INTERVAL_SECONDS)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stacks = sampler.stop()
+        _active.profiling = False
+        if stacks:
+            _record_summary(session, stacks)
+            try:
+                _write_profile(name, stacks)
+            except OSError as e:
+                print(f"Error writing profile: {str(e)}")
+
+def profiled(name: str):
+    """Decorator running the function inside profile()"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with profile(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+import re
+import math
+import textwrap
+from typing import List, Dict, Any
+
+# Words, runs of digits and single punctuation marks; long words are split into
+# ~4 character pieces, which tracks the OpenAI BPE tokenizers closely enough for
+# budgeting without pulling in a tokenizer dependency.
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+TRUNCATION_MARKER = " …"
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so that it fits within max_tokens"""
+    if text is None:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # Keep whole words until the budget (minus the marker) is used up
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER)
+    kept = []
+    used = 0
+    for word in text.split():
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept) + TRUNCATION_MARKER
+
+def dedent_template(template: str) -> str:
+    """Strip the indentation a triple-quoted template picks up from the source code"""
+    return textwrap.dedent(template).strip()
+
+def summarize_progress(monthly_breakdowns: List[Dict[str, Any]], current_month: int,
+                       max_tokens: int, recent_months: int = 3) -> str:
+    """Describe progress up to the current month within max_tokens.
+
+    Every month is listed in full when that fits. Otherwise the older months are
+    compacted to their status only, and if the recent months alone are still too
+    long their descriptions are truncated evenly. Lines that still do not fit
+    are shortened one at a time, keeping one month per line.
+    """
+    past = sorted((b for b in monthly_breakdowns if b["month"] <= current_month),
+                  key=lambda b: b["month"])
+
+    def full_line(breakdown, description=None):
+        if description is None:
+            description = breakdown['description']
+        return f"Month {breakdown['month']}: {description} - Status: {breakdown.get('status', 'unknown')}"
+
+    full = "\n".join(full_line(b) for b in past)
+    if count_tokens(full) <= max_tokens:
+        return full
+
+    older = past[:-recent_months] if recent_months else past
+    recent = past[-recent_months:] if recent_months else []
+    lines = []
+    if older:
+        lines.append("Earlier months (status only): " +
+                     ", ".join(f"Month {b['month']} {b.get('status', 'unknown')}" for b in older))
+
+    fixed_tokens = count_tokens("\n".join(lines) + "\n" + "\n".join(full_line(b, "") for b in recent))
+    if recent:
+        per_month = max(0, (max_tokens - fixed_tokens) // len(recent))
+        for breakdown in recent:
+            lines.append(full_line(breakdown, truncate_to_tokens(breakdown['description'], per_month)))
+
+    # Still too long: shorten one line at a time, the status-only line first, so the line breaks are kept
+    for index in range(len(lines)):
+        overflow = count_tokens("\n".join(lines)) - max_tokens
+        if overflow <= 0:
+            break
+        lines[index] = truncate_to_tokens(lines[index], count_tokens(lines[index]) - overflow)
+    return "\n".join(line for line in lines if line)
+
+class PromptBuilder:
+    """Fill a prompt template while keeping every variable section within a token budget"""
+
+    def __init__(self, template: str):
+        self.template = dedent_template(template)
+        self.sections = {}
+        self.usage = {}
+
+    def add(self, name: str, text: Any, max_tokens: int = None) -> "PromptBuilder":
+        """Add a section value, truncated to max_tokens when a budget is given"""
+        text = "" if text is None else str(text)
+        if max_tokens is not None:
+            text = truncate_to_tokens(text, max_tokens)
+        self.sections[name] = text
+        self.usage[name] = count_tokens(text)
+        return self
+
+    def build(self) -> str:
+        """Render the template and record the total prompt size in usage"""
+        prompt = self.template.format(**self.sections)
+        self.usage["total"] = count_tokens(prompt)
+        return prompt
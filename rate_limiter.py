@@ -0,0 +1,159 @@
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+import config
+import metrics
+import deadlines
+
+# Priority classes, most important first
+INTERACTIVE = 0
+WRITE = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", WRITE: "write", BACKGROUND: "background"}
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is shed because the upstream budget is exhausted"""
+
+_current_priority = contextvars.ContextVar("rate_limit_priority", default=None)
+
+@contextmanager
+def priority(value):
+    """Run the enclosed calls with the given priority class"""
+    token = _current_priority.set(value)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def current_priority(default=INTERACTIVE):
+    """Get the priority class set by the innermost priority() block"""
+    value = _current_priority.get()
+    return default if value is None else value
+
+class RateLimiter:
+    """Token bucket with a concurrency cap and a priority-ordered wait queue.
+
+    Waiting calls are admitted strictly by priority class (then arrival order).
+    A call that cannot be admitted within the maximum wait of its class, or that
+    arrives when the queue is full, is rejected with RateLimitExceeded.
+    """
+
+    def __init__(self, name, rate_per_second, burst, max_concurrent, max_waits, max_queue):
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_waits = max_waits
+        self.max_queue = max_queue
+
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._active = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """Wait for a token and a concurrency slot; call release() when the work is done"""
+        if timeout is None:
+            timeout = self.max_waits.get(priority, self.max_waits[BACKGROUND])
+        # Never wait past the deadline of the current action
+        budget = deadlines.remaining()
+        deadline_bound = budget is not None and budget < timeout
+        if deadline_bound:
+            timeout = max(budget, 0.0)
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            if len(self._waiters) >= self.max_queue:
+                metrics.RATE_LIMITED.inc(upstream=self.name, priority=PRIORITY_NAMES.get(priority, priority))
+                raise RateLimitExceeded(
+                    f"{self.name} is overloaded: {len(self._waiters)} calls already queued, "
+                    f"rejecting {PRIORITY_NAMES.get(priority, priority)} call"
+                )
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if (self._waiters[0] == entry and self._tokens >= 1
+                            and self._active < self.max_concurrent):
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self._active += 1
+                        # The next waiter may be admissible as well
+                        self._condition.notify_all()
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 and deadline_bound:
+                        raise deadlines.exceeded(self.name, f"Deadline exceeded waiting for the {self.name} rate limiter")
+                    if remaining <= 0:
+                        metrics.RATE_LIMITED.inc(upstream=self.name, priority=PRIORITY_NAMES.get(priority, priority))
+                        raise RateLimitExceeded(
+                            f"{self.name} rate limit: {PRIORITY_NAMES.get(priority, priority)} call "
+                            f"waited {timeout:.1f}s without being admitted"
+                        )
+                    wait = remaining
+                    if self._tokens < 1 and self.rate_per_second > 0:
+                        wait = min(wait, (1 - self._tokens) / self.rate_per_second)
+                    self._condition.wait(wait)
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._condition.notify_all()
+                raise
+
+    def release(self):
+        """Give back the concurrency slot taken by acquire()"""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def limit(self, priority=None, timeout=None):
+        """Hold a rate-limited slot for the enclosed call"""
+        if priority is None:
+            priority = current_priority()
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _build_limiter(name):
+    max_waits = {
+        INTERACTIVE: config.RATE_LIMIT_MAX_WAIT_INTERACTIVE,
+        WRITE: config.RATE_LIMIT_MAX_WAIT_WRITE,
+        BACKGROUND: config.RATE_LIMIT_MAX_WAIT_BACKGROUND
+    }
+    if name == "gibson":
+        return RateLimiter("Gibson AI", config.GIBSON_RATE_PER_SECOND, config.GIBSON_RATE_BURST,
+                           config.GIBSON_MAX_CONCURRENT, max_waits, config.RATE_LIMIT_MAX_QUEUE)
+    if name == "openai":
+        return RateLimiter("OpenAI", config.OPENAI_RATE_PER_SECOND, config.OPENAI_RATE_BURST,
+                           config.OPENAI_MAX_CONCURRENT, max_waits, config.RATE_LIMIT_MAX_QUEUE)
+    raise ValueError(f"Unknown rate limiter: {name}")
+
+def get_limiter(name):
+    """Get the process-wide limiter for an upstream ("gibson" or "openai")"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _build_limiter(name)
+                _limiters[name] = limiter
+    return limiter
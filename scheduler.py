@@ -0,0 +1,273 @@
+"""Scheduled feedback runs over every active goal, outside peak hours.
+
+At each scheduled time (GOAL_TRACKER_FEEDBACK_SCHEDULE, e.g. "monthly 1 03:00"
+for the first of every month, after the previous month has ended) the
+scheduler pages through all goals of the year of the slot and of the month
+(or day) that just ended, so the run on January 1 still reviews the goals of
+the year before, and generates feedback
+for each through GoalManager.generate_feedback, a few goals at a time and at
+background priority. The feedback is saved like feedback a user asked for, so
+"Get AI Feedback & Analysis" finds it already waiting; goals whose progress has
+not changed since their last feedback cost no AI call.
+
+Every replica on a host runs a scheduler, but only the one holding the lock
+file runs a given slot; the state file records the last slot run, so a slot
+runs once even when replicas check at different times or restart.
+
+Usage: python scheduler.py status
+       python scheduler.py run [--force]
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import calendar
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set, Tuple
+import metrics
+import rate_limiter
+import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # No lock files on Windows; run a single replica there
+    fcntl = None
+
+JOB = "feedback"
+
+def parse_schedule(spec: str) -> Optional[Tuple[str, int, int, int]]:
+    """Parse "daily HH:MM" or "monthly DAY HH:MM" into (kind, day, hour, minute); None for "" or "off" """
+    parts = (spec or "").split()
+    if not parts or parts[0].lower() == "off":
+        return None
+    kind = parts[0].lower()
+    try:
+        if kind == "daily" and len(parts) == 2:
+            day, clock = 0, parts[1]
+        elif kind == "monthly" and len(parts) == 3:
+            day, clock = int(parts[1]), parts[2]
+            if not 1 <= day <= 31:
+                raise ValueError(f"day {day} out of range")
+        else:
+            raise ValueError("expected 'daily HH:MM' or 'monthly DAY HH:MM'")
+        hour, minute = (int(value) for value in clock.split(":"))
+        datetime.time(hour, minute)
+    except ValueError as e:
+        raise ValueError(f"Invalid schedule {spec!r}: {str(e)}")
+    return kind, day, hour, minute
+
+def _slot_in_month(year: int, month: int, day: int, hour: int, minute: int) -> datetime.datetime:
+    # Day 31 means the last day of shorter months
+    day = min(day, calendar.monthrange(year, month)[1])
+    return datetime.datetime(year, month, day, hour, minute)
+
+def last_slot(schedule: Tuple[str, int, int, int], now: datetime.datetime) -> datetime.datetime:
+    """The most recent scheduled time at or before now (local time)"""
+    kind, day, hour, minute = schedule
+    if kind == "daily":
+        slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return slot if slot <= now else slot - datetime.timedelta(days=1)
+    slot = _slot_in_month(now.year, now.month, day, hour, minute)
+    if slot <= now:
+        return slot
+    year, month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+    return _slot_in_month(year, month, day, hour, minute)
+
+def next_slot(schedule: Tuple[str, int, int, int], now: datetime.datetime) -> datetime.datetime:
+    """The first scheduled time after now (local time)"""
+    kind, day, hour, minute = schedule
+    if kind == "daily":
+        return last_slot(schedule, now) + datetime.timedelta(days=1)
+    year, month = now.year, now.month
+    while True:
+        slot = _slot_in_month(year, month, day, hour, minute)
+        if slot > now:
+            return slot
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+
+def covered_years(schedule: Tuple[str, int, int, int], slot: datetime.datetime) -> Set[int]:
+    """Years whose goals the run of slot covers: the slot's own and that of the month (or day) just ended"""
+    kind = schedule[0] if schedule is not None else "daily"
+    ended = slot - datetime.timedelta(days=1) if kind == "daily" else slot.replace(day=1) - datetime.timedelta(days=1)
+    return {slot.year, ended.year}
+
+class FeedbackScheduler:
+    """Runs feedback for every active goal at the scheduled times, on one replica per host.
+
+    Files in the scheduler directory:
+      leader.lock   held by the replica running a slot
+      state.json    {"last_slot": ISO time of the last slot run, "last_run": summary of that run}
+    """
+
+    def __init__(self, goal_manager, directory: str, schedule: str, concurrency: int = 2,
+                 page_size: int = 200, poll_interval: float = 60.0, catch_up_seconds: float = 86400.0):
+        self.goal_manager = goal_manager
+        self.directory = directory
+        self.schedule = parse_schedule(schedule)
+        self.concurrency = max(1, concurrency)
+        self.page_size = max(1, page_size)
+        self.poll_interval = poll_interval
+        self.catch_up_seconds = catch_up_seconds
+        self.lock_path = os.path.join(directory, "leader.lock")
+        self.state_path = os.path.join(directory, "state.json")
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _leadership(self):
+        """Yield True while holding the lock file, False if another replica holds it"""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        temporary = self.state_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temporary, self.state_path)
+
+    def due_slot(self, now: datetime.datetime = None) -> Optional[datetime.datetime]:
+        """The slot to run now: the latest scheduled time, unless it already ran or is too old to catch up on"""
+        if self.schedule is None:
+            return None
+        now = now or datetime.datetime.now()
+        slot = last_slot(self.schedule, now)
+        if (now - slot).total_seconds() > self.catch_up_seconds:
+            return None
+        last = self.state().get("last_slot")
+        if last is not None and datetime.datetime.fromisoformat(last) >= slot:
+            return None
+        return slot
+
+    def run_due(self, now: datetime.datetime = None) -> Optional[Dict[str, int]]:
+        """Run the due slot if this replica gets the lock; returns the run's counts, or None if nothing ran"""
+        if self.due_slot(now) is None:
+            return None
+        with self._leadership() as leader:
+            if not leader:
+                metrics.SCHEDULER_RUNS.inc(job=JOB, outcome="not_leader")
+                return None
+            # Another replica may have finished the slot while this one waited for its turn
+            slot = self.due_slot(now)
+            if slot is None:
+                return None
+            counts = self.run(slot)
+            # A run cut short by close() is not recorded, so the slot runs again
+            if not self._stop.is_set():
+                self._write_state({"last_slot": slot.isoformat(), "last_run": counts})
+            return counts
+
+    def _feedback(self, goal_uuid: str) -> bool:
+        try:
+            with rate_limiter.priority(rate_limiter.BACKGROUND):
+                feedback = self.goal_manager.generate_feedback(goal_uuid)
+        finally:
+            tracing.finish_rerun("scheduler", goal_uuid=goal_uuid)
+        return bool(feedback) and not feedback.get('fallback')
+
+    def run(self, slot: datetime.datetime = None) -> Dict[str, int]:
+        """Generate feedback for every goal of the years slot (default now) covers; returns counts of goals by outcome"""
+        counts = {"ok": 0, "fallback": 0, "error": 0}
+        years = covered_years(self.schedule, slot or datetime.datetime.now())
+        start = time.monotonic()
+        after_id = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="scheduler") as executor, \
+                tracing.span("scheduler.run", job=JOB):
+            # Each goal is its own trace, linked to this run
+            feedback = tracing.wrap(self._feedback, detached=True)
+            while not self._stop.is_set():
+                page = self.goal_manager.db.get_goals_page(after_id, self.page_size)
+                if not page:
+                    break
+                active = [goal['uuid'] for goal in page if int(goal['year']) in years]
+                # One page in flight at a time keeps memory flat however many goals there are
+                futures = [executor.submit(feedback, goal_uuid) for goal_uuid in active]
+                for future in futures:
+                    try:
+                        outcome = "ok" if future.result() else "fallback"
+                    except Exception as e:
+                        print(f"Scheduled feedback failed: {str(e)}")
+                        outcome = "error"
+                    counts[outcome] += 1
+                    metrics.SCHEDULER_GOALS.inc(job=JOB, outcome=outcome)
+                if len(page) < self.page_size:
+                    break
+                after_id = page[-1]['id']
+        tracing.finish_rerun("scheduler.run")
+        metrics.SCHEDULER_RUNS.inc(job=JOB, outcome="ok" if not counts["error"] else "partial")
+        print(f"Scheduled feedback run: {counts} in {time.monotonic() - start:.1f}s")
+        return counts
+
+    def start(self) -> "FeedbackScheduler":
+        """Check for a due slot every poll_interval seconds in a background thread"""
+        if self._thread is None and self.schedule is not None:
+            self._thread = threading.Thread(target=self._loop, name="feedback-scheduler", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Feedback scheduler: run failed: {str(e)}")
+                metrics.SCHEDULER_RUNS.inc(job=JOB, outcome="error")
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="show the schedule, the last run and the next slot")
+    run_parser = commands.add_parser("run", help="run the due slot now (or any time with --force)")
+    run_parser.add_argument("--force", action="store_true", help="run even if no slot is due, without recording it")
+    args = parser.parse_args()
+
+    import services
+    scheduler = services.get_scheduler(start=False)
+    if args.command == "status":
+        state = scheduler.state()
+        print(f"Schedule: {scheduler.schedule or 'off'}")
+        print(f"Last slot run: {state.get('last_slot', 'never')} {state.get('last_run', '')}")
+        if scheduler.schedule is not None:
+            print(f"Next slot: {next_slot(scheduler.schedule, datetime.datetime.now()).isoformat()}")
+    elif args.force:
+        with scheduler._leadership() as leader:
+            if not leader:
+                sys.exit("Another replica is running the scheduler")
+            print(scheduler.run())
+    else:
+        counts = scheduler.run_due()
+        print(counts if counts is not None else "No slot due (or another replica holds the lock)")
+    services.reset()
+
+if __name__ == "__main__":
+    main()
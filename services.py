@@ -0,0 +1,185 @@
+import threading
+import config
+import metrics
+
+# Process-wide service container.
+# Streamlit re-executes app.py on every rerun, but imported modules stay in
+# sys.modules, so the instances kept here are built once per process and shared
+# by every session and rerun. Each service is constructed lazily on first use.
+
+_lock = threading.RLock()
+_instances = {}
+
+def _get_or_create(name, factory):
+    """Return the shared instance called name, building it with factory on first use"""
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+def get_database():
+    """Get the shared Database (one pooled HTTP session per process)"""
+    from database import Database
+    return _get_or_create("database", Database)
+
+def get_shared_cache():
+    """Get the SharedCache (None when disabled); its file is shared with the other app processes on the host"""
+    if not config.SHARED_CACHE_ENABLED:
+        return None
+    def build():
+        from shared_cache import SharedCache
+        return SharedCache(config.SHARED_CACHE_PATH, default_ttl=config.SHARED_CACHE_DB_TTL_SECONDS)
+    return _get_or_create("shared_cache", build)
+
+def get_goal_database():
+    """Get the Database used for goals, breakdowns and feedback: reads go through the shared cache when enabled"""
+    def build():
+        cache = get_shared_cache()
+        if cache is None:
+            return get_database()
+        from shared_cache import CachedDatabase
+        return CachedDatabase(get_database(), cache, ttl=config.SHARED_CACHE_DB_TTL_SECONDS)
+    return _get_or_create("goal_database", build)
+
+def get_template_index():
+    """Get the TemplateIndex of earlier breakdowns (None when reuse is disabled)"""
+    if not config.TEMPLATE_REUSE_ENABLED:
+        return None
+    def build():
+        from template_index import TemplateIndex
+        return TemplateIndex(
+            config.TEMPLATE_INDEX_PATH,
+            threshold=config.TEMPLATE_REUSE_THRESHOLD,
+            max_entries=config.TEMPLATE_INDEX_MAX_ENTRIES,
+            shared=config.TEMPLATE_REUSE_SHARED
+        )
+    return _get_or_create("template_index", build)
+
+def get_session_store():
+    """Get the process-wide store of per-session data"""
+    def build():
+        from session_store import SessionStore
+        return SessionStore(
+            int(config.SESSION_STORE_MAX_MB * 1024 * 1024),
+            max_sessions=config.SESSION_STORE_MAX_SESSIONS,
+            idle_seconds=config.SESSION_STORE_IDLE_SECONDS
+        ).export_metrics()
+    return _get_or_create("session_store", build)
+
+def get_outbox():
+    """Get the shared write-ahead Outbox, with its background flusher running"""
+    def build():
+        from outbox import Outbox
+        return Outbox(
+            get_goal_database(),
+            config.OUTBOX_DIR,
+            flush_interval=config.OUTBOX_FLUSH_INTERVAL_SECONDS,
+            batch_size=config.OUTBOX_BATCH_SIZE,
+            max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+            max_backoff=config.OUTBOX_MAX_BACKOFF_SECONDS,
+            fsync=config.OUTBOX_FSYNC
+        ).start()
+    return _get_or_create("outbox", build)
+
+def get_batch_queue(start=None):
+    """Get the offline AI job queue; its background worker runs when GOAL_TRACKER_BATCH_QUEUE_WORKER is on"""
+    def build():
+        from batch_queue import BatchQueue
+        queue = BatchQueue(
+            get_goal_manager(),
+            config.BATCH_QUEUE_DIR,
+            batch_size=config.BATCH_QUEUE_BATCH_SIZE,
+            interval=config.BATCH_QUEUE_INTERVAL_SECONDS
+        )
+        if config.BATCH_QUEUE_WORKER if start is None else start:
+            queue.start()
+        return queue
+    return _get_or_create("batch_queue", build)
+
+def get_scheduler(start=None):
+    """Get the feedback scheduler; its thread runs unless GOAL_TRACKER_FEEDBACK_SCHEDULE is off"""
+    def build():
+        from scheduler import FeedbackScheduler
+        scheduler = FeedbackScheduler(
+            get_goal_manager(),
+            config.SCHEDULER_DIR,
+            config.FEEDBACK_SCHEDULE,
+            concurrency=config.SCHEDULER_CONCURRENCY,
+            page_size=config.SCHEDULER_PAGE_SIZE,
+            poll_interval=config.SCHEDULER_POLL_SECONDS,
+            catch_up_seconds=config.SCHEDULER_CATCH_UP_SECONDS
+        )
+        if start is None or start:
+            scheduler.start()
+        return scheduler
+    return _get_or_create("scheduler", build)
+
+def get_recent_users():
+    """Get the list of users who logged in most recently on this host"""
+    def build():
+        from warmup import RecentUsers
+        return RecentUsers(config.WARMUP_RECENT_USERS_PATH, max_users=config.WARMUP_RECENT_USERS)
+    return _get_or_create("recent_users", build)
+
+def get_warmup(start=None):
+    """Get the process's warm-up; its thread starts unless GOAL_TRACKER_WARMUP is off"""
+    def build():
+        from warmup import WarmUp
+        # Loading goals only warms something when their reads go through the shared cache
+        recent_users = get_recent_users() if get_shared_cache() is not None else None
+        warmup = WarmUp(
+            get_database(),
+            get_auth(),
+            get_goal_manager(),
+            recent_users=recent_users,
+            imports=config.WARMUP_IMPORTS,
+            timeout=config.WARMUP_TIMEOUT_SECONDS
+        )
+        if config.WARMUP_ENABLED if start is None else start:
+            # /ready answers 503 until the warm-up has finished
+            metrics.set_readiness_check(warmup.is_ready)
+            warmup.start()
+        return warmup
+    return _get_or_create("warmup", build)
+
+def get_ai_service():
+    """Get the shared AIService (owned by the shared GoalManager, built on first use)"""
+    return get_goal_manager().ai_service
+
+def get_auth():
+    """Get the shared Auth service"""
+    def build():
+        from auth import Auth
+        return Auth(db=get_database())
+    return _get_or_create("auth", build)
+
+def get_goal_manager():
+    """Get the shared GoalManager"""
+    def build():
+        from goals import GoalManager
+        db = get_goal_database()
+        if config.OUTBOX_ENABLED:
+            from outbox import OutboxDatabase
+            db = OutboxDatabase(db, get_outbox())
+        # The OpenAI key is read when the AI service is first needed, so a key added later is picked up
+        return GoalManager(None, db=db, ai_cache=get_shared_cache(), template_index=get_template_index())
+    return _get_or_create("goal_manager", build)
+
+def reset():
+    """Drop every shared instance so the next lookup builds fresh ones (used by tests)"""
+    with _lock:
+        outbox = _instances.get("outbox")
+        if outbox is not None:
+            outbox.close()
+        batch_queue = _instances.get("batch_queue")
+        if batch_queue is not None:
+            batch_queue.close()
+        scheduler = _instances.get("scheduler")
+        if scheduler is not None:
+            scheduler.close()
+        metrics.set_readiness_check(None)
+        _instances.clear()
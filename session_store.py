@@ -0,0 +1,143 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+import metrics
+
+# Process-wide store for the bulky per-session data of the app (goal graphs,
+# debug info). Streamlit keeps st.session_state alive for as long as a tab is
+# open, so data kept there is never released by idle tabs. Here every session's
+# data counts against one memory budget: sessions idle for longer than
+# idle_seconds are dropped, and while the store is over budget the least
+# recently used sessions are evicted. Evicted data is reloaded on demand by the
+# loader passed to get().
+
+def deep_size(value: Any, _seen: Optional[set] = None) -> int:
+    """Approximate memory held by value and everything it references, in bytes"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, _seen) + deep_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, _seen) for item in value)
+    return size
+
+class _Session:
+    __slots__ = ("data", "sizes", "last_access")
+
+    def __init__(self):
+        self.data = {}
+        self.sizes = {}
+        self.last_access = time.monotonic()
+
+class SessionStore:
+    """Per-session values with a process-wide memory budget and LRU eviction of idle sessions"""
+
+    def __init__(self, max_bytes: int, max_sessions: int = 10000, idle_seconds: float = 1800.0):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._bytes = 0
+
+    def _touch(self, session_key: str) -> _Session:
+        session = self._sessions.get(session_key)
+        if session is None:
+            session = self._sessions[session_key] = _Session()
+        else:
+            self._sessions.move_to_end(session_key)
+        session.last_access = time.monotonic()
+        return session
+
+    def _remove(self, session_key: str, reason: str) -> None:
+        session = self._sessions.pop(session_key)
+        self._bytes -= sum(session.sizes.values())
+        metrics.SESSION_STORE_EVICTIONS.inc(reason=reason)
+
+    def _evict(self, keep: str) -> None:
+        # Oldest first: idle sessions, then the least recently used until within budget
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_key in list(self._sessions):
+            if self._sessions[session_key].last_access >= cutoff:
+                break
+            if session_key != keep:
+                self._remove(session_key, "idle")
+        for session_key in list(self._sessions):
+            if self._bytes <= self.max_bytes and len(self._sessions) <= self.max_sessions:
+                break
+            if session_key != keep:
+                self._remove(session_key, "budget")
+
+    def get(self, session_key: str, name: str, loader: Callable[[], Any] = None, default: Any = None) -> Any:
+        """Get a session's value, reloading it with loader if it was evicted (or default without a loader)"""
+        with self._lock:
+            session = self._touch(session_key)
+            found = name in session.data
+            value = session.data.get(name)
+        metrics.record_cache("session_data", found)
+        if found:
+            return value
+        if loader is None:
+            return default
+        value = loader()
+        self.set(session_key, name, value)
+        return value
+
+    def set(self, session_key: str, name: str, value: Any) -> None:
+        """Store a session's value and evict other sessions if the store is over budget"""
+        size = deep_size(value)
+        with self._lock:
+            session = self._touch(session_key)
+            self._bytes += size - session.sizes.get(name, 0)
+            session.data[name] = value
+            session.sizes[name] = size
+            self._evict(keep=session_key)
+
+    def update(self, session_key: str, name: str, values: Dict[str, Any]) -> None:
+        """Merge values into a session's dict value (such as debug info)"""
+        with self._lock:
+            current = self._sessions[session_key].data.get(name, {}) if session_key in self._sessions else {}
+        self.set(session_key, name, {**current, **values})
+
+    def drop(self, session_key: str, name: str = None) -> None:
+        """Forget one value of a session, or all of its data"""
+        with self._lock:
+            session = self._sessions.get(session_key)
+            if session is None:
+                return
+            if name is None:
+                self._bytes -= sum(session.sizes.values())
+                del self._sessions[session_key]
+            elif name in session.data:
+                self._bytes -= session.sizes.pop(name)
+                del session.data[name]
+
+    def session_bytes(self, session_key: str) -> int:
+        """Memory held for one session"""
+        with self._lock:
+            session = self._sessions.get(session_key)
+            return sum(session.sizes.values()) if session else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals and the memory held per session, largest first"""
+        with self._lock:
+            sizes = {key: sum(session.sizes.values()) for key, session in self._sessions.items()}
+            total = self._bytes
+        return {
+            "sessions": len(sizes),
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "per_session": dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+        }
+
+    def export_metrics(self) -> "SessionStore":
+        """Report this store's totals through the session store gauges"""
+        metrics.SESSION_STORE_BYTES.set_function(lambda: self._bytes)
+        metrics.SESSION_STORE_SESSIONS.set_function(lambda: len(self._sessions))
+        return self
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+import functools
+from typing import Any, Callable, Iterable
+import metrics
+
+# Cache shared by every app process on a host.
+# Entries live in a SQLite file (WAL mode, so readers do not block the writer)
+# and expire after a TTL. Database reads are keyed on version counters stored
+# in the same file, one per entity read (see CachedDatabase): a write through
+# any process bumps the counters of what it changed, so every process stops
+# reading the entries built from the old data. Errors in the cache are logged and treated as misses; the
+# cache never fails a request.
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS `entries` (
+        `key` TEXT PRIMARY KEY,
+        `value` TEXT NOT NULL,
+        `expires_at` REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS `idx_entries_expires_at` ON `entries` (`expires_at`)",
+    """
+    CREATE TABLE IF NOT EXISTS `versions` (
+        `name` TEXT PRIMARY KEY,
+        `version` INTEGER NOT NULL
+    )
+    """
+]
+
+# Share of set() calls that also delete expired entries
+PURGE_PROBABILITY = 0.01
+
+class SharedCache:
+    """TTL key-value store and version counters in a SQLite file shared between processes"""
+
+    def __init__(self, path: str, default_ttl: float = 300.0):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite serializes writers across processes
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Any:
+        """Get a live entry, or None if it is missing or expired"""
+        try:
+            row = self._connection().execute(
+                "SELECT `value` FROM `entries` WHERE `key` = ? AND `expires_at` > ?",
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared cache read error: {str(e)}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        """Store an entry (atomically replacing any previous one) for ttl seconds"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO `entries` (`key`, `value`, `expires_at`) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl)
+            )
+            if random.random() < PURGE_PROBABILITY:
+                connection.execute("DELETE FROM `entries` WHERE `expires_at` <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"Shared cache write error: {str(e)}")
+
+    def set_many(self, items: dict, ttl: float = None) -> None:
+        """Store several entries in one transaction"""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl
+        try:
+            with self._connection() as connection:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO `entries` (`key`, `value`, `expires_at`) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value, default=str), expires_at) for key, value in items.items()]
+                )
+        except sqlite3.Error as e:
+            print(f"Shared cache write error: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._connection().execute("DELETE FROM `entries` WHERE `key` = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Shared cache write error: {str(e)}")
+
+    def versions(self, names: Iterable[str]) -> dict:
+        """Get the current version counter of each name (0 if never bumped)"""
+        names = list(names)
+        try:
+            rows = self._connection().execute(
+                f"SELECT `name`, `version` FROM `versions` WHERE `name` IN ({', '.join('?' for _ in names)})",
+                names
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Shared cache read error: {str(e)}")
+            return None
+        found = dict(rows)
+        return {name: found.get(name, 0) for name in names}
+
+    def bump(self, *names: str) -> None:
+        """Increment the version counters of names, invalidating entries keyed on them in every process"""
+        try:
+            connection = self._connection()
+            for name in names:
+                connection.execute(
+                    "INSERT INTO `versions` (`name`, `version`) VALUES (?, 1) "
+                    "ON CONFLICT (`name`) DO UPDATE SET `version` = `version` + 1",
+                    (name,)
+                )
+        except sqlite3.Error as e:
+            print(f"Shared cache version error: {str(e)}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float = None,
+                       depends_on: Iterable[str] = (), cache_name: str = "shared") -> Any:
+        """Get key from the cache, computing and storing it on a miss.
+
+        The versions of depends_on are read before compute runs and become part
+        of the key, so a result computed concurrently with a write is never
+        served after that write's bump.
+        """
+        depends_on = sorted(depends_on)
+        if depends_on:
+            versions = self.versions(depends_on)
+            if versions is None:
+                return compute()
+            key = key + "|" + ",".join(f"{name}:{version}" for name, version in versions.items())
+        value = self.get(key)
+        metrics.record_cache(cache_name, value is not None)
+        if value is not None:
+            return value
+        value = compute()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+# Seconds an owner entry (the goal of a breakdown, the user of a goal) is kept;
+# ownership never changes, so this only bounds the size of the file
+OWNER_TTL = 30 * 86400.0
+
+def _cached_read(table: str, family: str, owned: str = None):
+    """Decorator for CachedDatabase reads of one entity (or a list of entities) of family.
+
+    The first argument names the entity. The read depends on the version of
+    that entity and on the table-wide version, which is only bumped when a
+    write cannot tell which entity it changed. With owned set, the owner of
+    each row returned is remembered for later writes to that row.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            entities = args[0] if isinstance(args[0], (list, tuple)) else [args[0]]
+            key = f"db:{method.__name__}:{json.dumps(args, default=str)}"
+
+            def compute():
+                result = getattr(self.db, method.__name__)(*args)
+                if owned is not None and result:
+                    rows = result if isinstance(result, list) else [result]
+                    self._remember_owners(owned, {
+                        row['uuid']: row.get('goal_uuid') or args[0] for row in rows if row.get('uuid')
+                    })
+                return result
+
+            return self.cache.get_or_compute(
+                key, compute, ttl=self.ttl, cache_name="shared_db",
+                depends_on=[table] + [f"{family}:{entity}" for entity in entities]
+            )
+        return wrapper
+    return decorator
+
+class CachedDatabase:
+    """Database whose goal, breakdown and feedback reads go through a SharedCache.
+
+    Reads are keyed on the version of the entity they read: a user's goal list,
+    one goal, or the breakdowns or feedback of one goal. Writes go to the
+    wrapped Database and then bump the versions of the entities they change,
+    so a status change does not invalidate the cached reads of other goals.
+    Reads of user rows (which hold password hashes) are not cached.
+    """
+
+    def __init__(self, db, cache: SharedCache, ttl: float = None):
+        self.db = db
+        self.cache = cache
+        self.ttl = ttl
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    # Owners
+
+    def _remember_owners(self, kind: str, owners: dict) -> None:
+        entries = {f"owner:{kind}:{row_uuid}": owner for row_uuid, owner in owners.items() if row_uuid and owner}
+        if entries:
+            self.cache.set_many(entries, ttl=OWNER_TTL)
+
+    def _bump_rows(self, table: str, kind: str, row_family: str, owner_family: str, row_uuids) -> None:
+        """Bump the versions of rows and of their owners' lists; the whole table if an owner is unknown"""
+        names = []
+        for row_uuid in row_uuids:
+            owner = self.cache.get(f"owner:{kind}:{row_uuid}")
+            if owner is None:
+                self.cache.bump(table)
+                return
+            names += [f"{row_family}:{row_uuid}", f"{owner_family}:{owner}"]
+        self.cache.bump(*names)
+
+    # Reads
+
+    @_cached_read("goal", "user_goals", owned="goal")
+    def get_goals_by_user_uuid(self, user_uuid): pass
+
+    @_cached_read("goal", "goal")
+    def get_goal_by_uuid(self, goal_uuid): pass
+
+    @_cached_read("goal_monthly_breakdown", "goal_monthly_breakdown", owned="breakdown")
+    def get_monthly_breakdowns(self, goal_uuid): pass
+
+    @_cached_read("goal_monthly_breakdown", "breakdown")
+    def get_monthly_breakdown_by_uuid(self, breakdown_uuid): pass
+
+    @_cached_read("goal_feedback", "goal_feedback")
+    def get_feedback_for_goal(self, goal_uuid): pass
+
+    @_cached_read("goal_feedback", "goal_feedback")
+    def get_feedback_by_fingerprint(self, goal_uuid, fingerprint): pass
+
+    @_cached_read("goal_monthly_breakdown", "goal_monthly_breakdown", owned="breakdown")
+    def get_monthly_breakdowns_for_goals(self, goal_uuids): pass
+
+    @_cached_read("goal_feedback", "goal_feedback")
+    def get_feedback_for_goals(self, goal_uuids): pass
+
+    # Writes
+
+    def create_goal(self, user_uuid, *args, **kwargs):
+        try:
+            goal_uuid = self.db.create_goal(user_uuid, *args, **kwargs)
+        finally:
+            self.cache.bump(f"user_goals:{user_uuid}")
+        self._remember_owners("goal", {goal_uuid: user_uuid})
+        return goal_uuid
+
+    def create_goals(self, goals):
+        try:
+            goal_uuids = self.db.create_goals(goals)
+        finally:
+            self.cache.bump(*sorted({f"user_goals:{goal['user_uuid']}" for goal in goals}))
+        self._remember_owners("goal", {goal_uuid: goal['user_uuid'] for goal_uuid, goal in zip(goal_uuids, goals)})
+        return goal_uuids
+
+    def update_goal(self, goal_uuid, *args, **kwargs):
+        try:
+            return self.db.update_goal(goal_uuid, *args, **kwargs)
+        finally:
+            self._bump_rows("goal", "goal", "goal", "user_goals", [goal_uuid])
+
+    def create_monthly_breakdown(self, goal_uuid, *args, **kwargs):
+        try:
+            breakdown_uuid = self.db.create_monthly_breakdown(goal_uuid, *args, **kwargs)
+        finally:
+            self.cache.bump(f"goal_monthly_breakdown:{goal_uuid}")
+        self._remember_owners("breakdown", {breakdown_uuid: goal_uuid})
+        return breakdown_uuid
+
+    def create_monthly_breakdowns(self, breakdowns):
+        try:
+            return self.db.create_monthly_breakdowns(breakdowns)
+        finally:
+            self.cache.bump(*sorted({f"goal_monthly_breakdown:{b['goal_uuid']}" for b in breakdowns}))
+
+    def update_monthly_breakdown(self, breakdown_uuid, *args, **kwargs):
+        try:
+            return self.db.update_monthly_breakdown(breakdown_uuid, *args, **kwargs)
+        finally:
+            self._bump_rows("goal_monthly_breakdown", "breakdown", "breakdown", "goal_monthly_breakdown",
+                            [breakdown_uuid])
+
+    def create_feedback(self, goal_uuid, *args, **kwargs):
+        try:
+            return self.db.create_feedback(goal_uuid, *args, **kwargs)
+        finally:
+            self.cache.bump(f"goal_feedback:{goal_uuid}")
+
+    def create_feedbacks(self, feedbacks):
+        try:
+            return self.db.create_feedbacks(feedbacks)
+        finally:
+            self.cache.bump(*sorted({f"goal_feedback:{feedback['goal_uuid']}" for feedback in feedbacks}))
+
+    def update_rows(self, table, updates):
+        try:
+            return self.db.update_rows(table, updates)
+        finally:
+            if table == "goal":
+                self._bump_rows(table, "goal", "goal", "user_goals", list(updates))
+            elif table == "goal_monthly_breakdown":
+                self._bump_rows(table, "breakdown", "breakdown", "goal_monthly_breakdown", list(updates))
+            else:
+                self.cache.bump(table)
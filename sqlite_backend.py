@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+from typing import Any
+from database import Database
+import migrations
+
+# Local SQLite stand-in for the Gibson AI database.
+# It runs the same SQL that Database sends to Gibson (backtick-quoted MySQL is
+# accepted by SQLite) and returns results in the same shape: a list of row
+# dicts for queries that return rows, otherwise a dict with the number of
+# affected rows and the last inserted id. The schema comes from migrations.py.
+
+class SQLiteBackend:
+    """Execute Gibson-style SQL against a local SQLite database"""
+
+    def __init__(self, path: str = ":memory:", create_schema: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        if create_schema:
+            migrations.migrate(self.execute, "sqlite")
+
+    def execute(self, query: str) -> Any:
+        """Run one SQL statement and return Gibson-shaped results"""
+        with self._lock:
+            cursor = self.connection.execute(query)
+            if cursor.description is not None:
+                return [dict(row) for row in cursor.fetchall()]
+            return {"affected_rows": cursor.rowcount, "last_insert_id": cursor.lastrowid}
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+class SQLiteDatabase(Database):
+    """Database that runs its queries on a SQLiteBackend instead of Gibson AI and records them"""
+
+    def __init__(self, backend: SQLiteBackend = None):
+        self.project_uuid = None
+        self.api_key = None
+        self.endpoint = None
+        self.transport = None
+        self.backend = backend if backend is not None else SQLiteBackend()
+        self.queries = []
+        # A backend of its own is migrated to the latest version
+        if backend is None:
+            self._fingerprint_column = True
+
+    def execute_query(self, query, priority=None):
+        """Record the query and run it on the SQLite backend"""
+        self.queries.append(query)
+        return self.backend.execute(query)
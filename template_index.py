@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import zlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # No lock files on Windows; one process writes the template file there
+    fcntl = None
+
+# Reuse of monthly breakdowns for near-identical goals.
+# Every goal whose breakdowns were fully generated by the AI is added to a local
+# index of (title, description) vectors. Vectors come from a hashing vectorizer
+# (word unigrams and bigrams, sublinear term frequency, title words weighted
+# up), so no vocabulary has to be kept or fitted. A goal has a few dozen
+# non-zero features, so the index stores them sparsely in flat arrays and a
+# lookup is one gather and bincount over them. Entries are appended to a JSON
+# Lines file that every app process on the host reads, so a template learned
+# by one process is found by the others; the file is rewritten with the most
+# recent entries once it holds twice as many as the index keeps.
+#
+# Templates are only reused for the user who created them, since a
+# breakdown can repeat details of the goal it was written for. Sharing them
+# between users is opt-in (shared=True).
+
+N_FEATURES = 2 ** 12
+TITLE_WEIGHT = 2.0
+# Initial capacity, in non-zero features, of the index arrays
+INITIAL_CAPACITY = 1024
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from i in into is it my of on or our so that the this to want will with
+""".split())
+
+def _tokens(text: str) -> List[str]:
+    words = [word for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if word not in STOP_WORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def vectorize_sparse(title: str, description: str, n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash the words of a goal into the (indices, values) of an L2-normalized vector (empty if it has no words)"""
+    counts = {}
+    for weight, text in ((TITLE_WEIGHT, title), (1.0, description)):
+        for token in _tokens(text):
+            # crc32 is stable across processes, unlike hash()
+            digest = zlib.crc32(token.encode("utf-8"))
+            index = digest % n_features
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            counts[index] = counts.get(index, 0.0) + sign * weight
+    counts = {index: value for index, value in counts.items() if value}
+    indices = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+    # Sublinear term frequency, keeping the sign of the hashed feature
+    values = np.array([np.sign(counts[index]) * (1.0 + np.log(abs(counts[index]))) for index in indices],
+                      dtype=np.float32)
+    norm = np.linalg.norm(values)
+    return indices, (values / norm if norm else values)
+
+def vectorize(title: str, description: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """Hash the words of a goal into a dense L2-normalized vector (zero if it has no words)"""
+    indices, values = vectorize_sparse(title, description, n_features)
+    vector = np.zeros(n_features, dtype=np.float32)
+    vector[indices] = values
+    return vector
+
+def adapt(breakdowns: List[Dict[str, Any]], source: Dict[str, Any], title: str, year: int) -> List[Dict[str, Any]]:
+    """Copy a stored breakdown for a new goal, replacing the source goal's title and year"""
+    title_pattern = re.compile(re.escape(source["title"].strip()), re.IGNORECASE) if source["title"].strip() else None
+    adapted = []
+    for breakdown in breakdowns:
+        description = breakdown["description"]
+        if title_pattern is not None:
+            description = title_pattern.sub(title.strip(), description)
+        if source.get("year") and year and source["year"] != year:
+            description = description.replace(str(source["year"]), str(year))
+        adapted.append({"month": breakdown["month"], "description": description})
+    return adapted
+
+class TemplateIndex:
+    """Similarity index from goal text to monthly breakdowns, backed by a JSON Lines file.
+
+    lookup() returns adapted breakdowns when the most similar stored goal of
+    the same user (of any user with shared=True) has a cosine similarity of at
+    least threshold, otherwise None. The index keeps the max_entries most
+    recent templates.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, max_entries: int = 5000,
+                 n_features: int = N_FEATURES, shared: bool = False):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.n_features = n_features
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._reset()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _reset(self) -> None:
+        # Non-zero features of every entry, entry after entry: feature index, value
+        # and the entry's sequence number. Live features are [_start, _size).
+        self._indices = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._values = np.zeros(INITIAL_CAPACITY, dtype=np.float32)
+        self._rows = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._start = 0
+        self._size = 0
+        self._entries = []
+        # Sequence number of self._entries[0]
+        self._first = 0
+        # Sequence numbers of each user's entries (evicted ones are dropped on lookup)
+        self._by_user = {}
+        self._offset = 0
+        self._inode = None
+        self._lines = 0
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._entries)
+
+    def _reserve(self, count: int) -> None:
+        """Make room for count more features, dropping evicted ones before growing"""
+        if self._size + count <= len(self._indices):
+            return
+        live = self._size - self._start
+        capacity = len(self._indices)
+        while live + count > capacity:
+            capacity *= 2
+        for name in ("_indices", "_values", "_rows"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype) if capacity != len(old) else old
+            new[:live] = old[self._start:self._size]
+            setattr(self, name, new)
+        self._start, self._size = 0, live
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            indices, values = vectorize_sparse(entry["title"], entry["description"], self.n_features)
+            self._reserve(len(indices))
+            end = self._size + len(indices)
+            self._indices[self._size:end] = indices
+            self._values[self._size:end] = values
+            self._rows[self._size:end] = self._first + len(self._entries)
+            self._size = end
+            self._by_user.setdefault(entry.get("user_uuid"), []).append(self._first + len(self._entries))
+            self._entries.append(entry)
+        if len(self._entries) > self.max_entries:
+            excess = len(self._entries) - self.max_entries
+            self._entries = self._entries[excess:]
+            self._first += excess
+            # Entries are stored in order, so the evicted features are a prefix
+            self._start += int(np.searchsorted(self._rows[self._start:self._size], self._first))
+
+    def _sync(self) -> None:
+        """Load the templates other processes appended to the file since the last sync"""
+        if not self.path:
+            return
+        try:
+            stat = os.stat(self.path)
+            if stat.st_ino != self._inode:
+                # New or compacted file: load it from the start
+                self._reset()
+                self._inode = stat.st_ino
+            if stat.st_size <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Template index read error: {str(e)}")
+            return
+        # Only complete lines; a line being written is picked up next time
+        complete = data[:data.rfind(b"\n") + 1]
+        self._offset += len(complete)
+        entries = []
+        for line in complete.splitlines():
+            self._lines += 1
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        if entries:
+            self._append(entries)
+
+    def _file_lock(self, exclusive: bool):
+        """Lock the file's sidecar: shared for appends, exclusive for a compaction"""
+        lock_file = open(self.path + ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_file
+
+    def _compact(self) -> None:
+        """Rewrite the file with the entries the index keeps, once it holds twice as many"""
+        if self._lines < 2 * self.max_entries:
+            return
+        try:
+            with self._file_lock(exclusive=True):
+                # Another process may have compacted it or appended since the last sync
+                self._sync()
+                if self._lines < 2 * self.max_entries:
+                    return
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "w", encoding="utf-8") as f:
+                    for entry in self._entries:
+                        f.write(json.dumps(entry) + "\n")
+                os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"Template index compaction error: {str(e)}")
+        # Every process, this one included, reloads the rewritten file on its next sync
+
+    def add(self, title: str, description: str, year: int, breakdowns: List[Dict[str, Any]],
+            user_uuid: str = None) -> None:
+        """Store the breakdowns generated for a goal of user_uuid"""
+        if not self.shared and user_uuid is None:
+            return
+        entry = {
+            "title": title,
+            "description": description,
+            "year": year,
+            "user_uuid": user_uuid,
+            "breakdowns": [{"month": b["month"], "description": b["description"]} for b in breakdowns]
+        }
+        with self._lock:
+            if not self.path:
+                self._append([entry])
+                return
+            try:
+                with self._file_lock(exclusive=False):
+                    # One write per line with O_APPEND, so lines of concurrent processes do not interleave
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, (json.dumps(entry) + "\n").encode("utf-8"))
+                    finally:
+                        os.close(fd)
+            except OSError as e:
+                print(f"Template index write error: {str(e)}")
+                self._append([entry])
+                return
+            # Reads back this line together with any appended by other processes
+            self._sync()
+            self._compact()
+
+    def search(self, title: str, description: str, user_uuid: str = None):
+        """Get (similarity, entry) of the most similar stored goal, or (0.0, None) if there is none to compare"""
+        indices, values = vectorize_sparse(title, description, self.n_features)
+        if not self.shared and user_uuid is None:
+            return 0.0, None
+        with self._lock:
+            self._sync()
+            if not self._entries or not len(indices):
+                return 0.0, None
+            query = np.zeros(self.n_features, dtype=np.float32)
+            query[indices] = values
+            live = slice(self._start, self._size)
+            scores = np.bincount(self._rows[live] - self._first,
+                                 weights=query[self._indices[live]] * self._values[live],
+                                 minlength=len(self._entries))
+            if self.shared:
+                candidates = np.arange(len(self._entries))
+            else:
+                sequence = [number for number in self._by_user.get(user_uuid, []) if number >= self._first]
+                self._by_user[user_uuid] = sequence
+                if not sequence:
+                    return 0.0, None
+                candidates = np.array(sequence, dtype=np.int64) - self._first
+            candidate_scores = scores[candidates]
+            # Latest entry wins among equals
+            best = candidates[len(candidates) - 1 - int(np.argmax(candidate_scores[::-1]))]
+            return float(scores[best]), self._entries[best]
+
+    def lookup(self, title: str, description: str, year: int, user_uuid: str = None) -> Optional[List[Dict[str, Any]]]:
+        """Get breakdowns adapted from a stored goal similar enough to this one, or None"""
+        similarity, entry = self.search(title, description, user_uuid)
+        hit = entry is not None and similarity >= self.threshold
+        metrics.record_cache("goal_templates", hit)
+        if entry is not None:
+            metrics.TEMPLATE_SIMILARITY.observe(similarity)
+        if not hit:
+            return None
+        return adapt(entry["breakdowns"], entry, title, year)
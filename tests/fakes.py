@@ -0,0 +1,95 @@
+"""In-memory fakes for tests that would otherwise need Gibson AI or OpenAI.
+
+FakeDatabase runs the real Database SQL on an in-memory SQLite database (see
+sqlite_backend.py) and FakeAIService answers like AIService without sending
+a request; both record every query or call. openai_response() builds what
+the patched openai.chat.completions.create returns. budget() fails a test when the
+code inside it takes more database round trips or AI calls than allowed, so
+an N+1 query pattern fails as soon as it comes back:
+
+    with budget(db, queries=3, ai=ai_service, ai_calls=1):
+        goal_manager.create_goal(user_uuid, "Run", "Run a marathon", 2025)
+"""
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+from unittest.mock import MagicMock
+from local_planner import plan_year
+from sqlite_backend import SQLiteDatabase
+
+class FakeDatabase(SQLiteDatabase):
+    """Database on a private in-memory SQLite database; every query is recorded in self.queries"""
+
+class FakeAIService:
+    """AIService stand-in with deterministic answers; every call is recorded in self.calls.
+
+    Breakdowns come from the local planner; feedback counts the months on
+    track or ahead. A batch method counts as one call, like the one request
+    AIService sends for it.
+    """
+
+    def __init__(self):
+        self.calls: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._lock = threading.Lock()
+
+    def _record(self, method: str, *args) -> None:
+        with self._lock:
+            self.calls.append((method, args))
+
+    def call_count(self, method: str = None) -> int:
+        with self._lock:
+            return sum(1 for name, _ in self.calls if method is None or name == method)
+
+    @staticmethod
+    def _breakdowns(goal_title: str, goal_description: str, year: int) -> List[Dict[str, Any]]:
+        plan = plan_year(goal_title, goal_description or "", int(year))
+        return [{"month": month, "description": plan[month]} for month in range(1, 13)]
+
+    @staticmethod
+    def _feedback(goal_title: str, monthly_breakdowns: List[Dict], current_month: int) -> Dict[str, Any]:
+        past = [b for b in monthly_breakdowns if b.get('month', 0) <= current_month]
+        on_track = sum(1 for b in past if b.get('status') in ("on_track", "ahead"))
+        return {
+            "feedback_text": f"{goal_title}: {on_track} of {len(past)} months so far on track or ahead.",
+            "feedback_type": "affirm" if on_track == len(past) else "double_down"
+        }
+
+    def generate_monthly_breakdowns(self, goal_title: str, goal_description: str, year: int) -> List[Dict[str, Any]]:
+        self._record("generate_monthly_breakdowns", goal_title, goal_description, year)
+        return self._breakdowns(goal_title, goal_description, year)
+
+    def generate_goal_feedback(self, goal_title: str, goal_description: str,
+                               monthly_breakdowns: List[Dict], current_month: int) -> Dict[str, Any]:
+        self._record("generate_goal_feedback", goal_title, goal_description, monthly_breakdowns, current_month)
+        return self._feedback(goal_title, monthly_breakdowns, current_month)
+
+    def generate_monthly_breakdowns_batch(self, goals: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        self._record("generate_monthly_breakdowns_batch", goals)
+        return [self._breakdowns(goal['title'], goal.get('description'), goal['year']) for goal in goals]
+
+    def generate_goal_feedback_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._record("generate_goal_feedback_batch", items)
+        return [self._feedback(item['title'], item['monthly_breakdowns'], item['current_month']) for item in items]
+
+def openai_response(content: Any) -> MagicMock:
+    """A chat completion whose message is content (a string, or anything else as JSON), without usage"""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content if isinstance(content, str) else json.dumps(content)
+    response.usage = None
+    return response
+
+@contextmanager
+def budget(db: SQLiteDatabase, queries: int, ai: FakeAIService = None, ai_calls: int = 0):
+    """Fail with the offending queries or calls if the block takes more than the given round trips"""
+    query_start = len(db.queries)
+    call_start = len(ai.calls) if ai is not None else 0
+    yield
+    made = db.queries[query_start:]
+    if len(made) > queries:
+        listing = "\n".join(" ".join(query.split()) for query in made)
+        raise AssertionError(f"{len(made)} queries, budget {queries}:\n{listing}")
+    if ai is not None and len(ai.calls) - call_start > ai_calls:
+        names = ", ".join(name for name, _ in ai.calls[call_start:])
+        raise AssertionError(f"{len(ai.calls) - call_start} AI calls, budget {ai_calls}: {names}")
@@ -0,0 +1,113 @@
+import sys
+import os
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from ai_output import parse_months, parse_feedback, complete_objects, AIOutputError
+from ai_service import AIService
+from tests.fakes import openai_response
+
+def _months_json(months):
+    return json.dumps({"months": [{"month": month, "description": f"Milestone {month}"} for month in months]})
+
+class TestAIOutput(unittest.TestCase):
+    """Test validation and repair of model output"""
+
+    def test_parse_months_well_formed(self):
+        """Test that a complete response in a code fence parses as well-formed"""
+        months, well_formed = parse_months("```json\n" + _months_json(range(1, 13)) + "\n```")
+        self.assertTrue(well_formed)
+        self.assertEqual(sorted(months), list(range(1, 13)))
+
+    def test_parse_months_salvages_truncatedopenai_response(self):
+        """Test that the complete entries of a cut-off response are kept"""
+        text = _months_json(range(1, 6))[:-2] + ', {"month": 6, "descr'
+        months, well_formed = parse_months(text)
+        self.assertFalse(well_formed)
+        self.assertEqual(sorted(months), [1, 2, 3, 4, 5])
+
+    def test_parse_months_drops_invalid_entries(self):
+        """Test that entries with a bad month or empty description are dropped"""
+        text = json.dumps({"months": [
+            {"month": "March", "description": "Spring plan"},
+            {"month": 13, "description": "Not a month"},
+            {"month": 4, "description": "  "},
+            {"month": "5", "description": "May plan"}
+        ]})
+        months, well_formed = parse_months(text)
+        self.assertFalse(well_formed)
+        self.assertEqual(months, {3: "Spring plan", 5: "May plan"})
+
+    def test_complete_objects_keeps_outermost(self):
+        """Test that nested objects are not returned separately"""
+        objects = complete_objects('{"a": {"b": 1}} {"c": "}"} {"d":')
+        self.assertEqual(objects, [{"a": {"b": 1}}, {"c": "}"}])
+
+    def test_parse_feedback_normalizes_type(self):
+        """Test that feedback types are normalized to the known values"""
+        feedback = parse_feedback('{"feedback_text": "Keep going", "feedback_type": "Double Down"}')
+        self.assertEqual(feedback, {"feedback_text": "Keep going", "feedback_type": "double_down"})
+
+    def test_parse_feedback_repairs_truncatedopenai_response(self):
+        """Test that completed fields of a cut-off response are used"""
+        feedback = parse_feedback('{"feedback_type": "affirm", "feedback_text": "Nice \\"work\\"", "ext')
+        self.assertEqual(feedback["feedback_text"], 'Nice "work"')
+
+    def test_parse_feedback_rejects_unknown_type(self):
+        """Test that an unknown feedback type is an error"""
+        with self.assertRaises(AIOutputError):
+            parse_feedback('{"feedback_text": "Hmm", "feedback_type": "panic"}')
+
+class TestAIServiceRepair(unittest.TestCase):
+    """Test that AIService re-requests only what is missing"""
+
+    def setUp(self):
+        self.ai_service = AIService("test_api_key")
+
+    @patch('openai.chat.completions.create')
+    def test_missing_months_are_rerequested(self, mock_create):
+        """Test that a partial breakdown is completed with a request for the missing months only"""
+        mock_create.side_effect = [
+            openai_response(_months_json(range(1, 9))[:-2] + ', {"month": 9'),
+            openai_response(_months_json([9, 10, 11, 12, 1]))
+        ]
+        before = metrics.AI_OUTPUT.value(operation="monthly_breakdowns", result="rerequested")
+
+        breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+
+        self.assertEqual(mock_create.call_count, 2)
+        retry_prompt = mock_create.call_args_list[1].kwargs["messages"][-1]["content"]
+        self.assertIn("9, 10, 11, 12", retry_prompt)
+        self.assertIn("Month 8: Milestone 8", retry_prompt)
+        self.assertEqual([b["description"] for b in breakdowns], [f"Milestone {m}" for m in range(1, 13)])
+        self.assertEqual(metrics.AI_OUTPUT.value(operation="monthly_breakdowns", result="rerequested"), before + 1)
+
+    @patch('openai.chat.completions.create')
+    def test_api_error_is_not_retried(self, mock_create):
+        """Test that a failed API call falls back to the local plan without another call"""
+        mock_create.side_effect = RuntimeError("upstream down")
+
+        breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+
+        mock_create.assert_called_once()
+        self.assertTrue(all(breakdown["placeholder"] for breakdown in breakdowns))
+        self.assertIn("run a marathon", breakdowns[2]["description"])
+
+    @patch('openai.chat.completions.create')
+    def test_invalid_feedback_uses_fallback(self, mock_create):
+        """Test that unusable feedback output gives the fallback response"""
+        mock_create.return_value = openai_response('{"feedback_type": "panic"}')
+        before = metrics.AI_OUTPUT.value(operation="goal_feedback", result="invalid")
+
+        feedback = self.ai_service.generate_goal_feedback("Run", "Run a marathon", [], 3)
+
+        self.assertTrue(feedback["fallback"])
+        self.assertEqual(metrics.AI_OUTPUT.value(operation="goal_feedback", result="invalid"), before + 1)
+
+if __name__ == "__main__":
+    unittest.main()
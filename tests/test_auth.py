@@ -7,13 +7,14 @@ from unittest.mock import patch, MagicMock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from auth import Auth
+from tests.fakes import FakeDatabase
 
 class TestAuth(unittest.TestCase):
     """Test the authentication functionality"""
     
     def setUp(self):
         """Set up the test environment"""
-        self.auth = Auth()
+        self.auth = Auth(db=FakeDatabase())
     
     def test_password_hashing(self):
         """Test password hashing and verification"""
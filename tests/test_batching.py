@@ -0,0 +1,156 @@
+import sys
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import AIService
+from batch_queue import BatchQueue
+from goals import GoalManager
+from sqlite_backend import SQLiteDatabase
+from tests.fakes import openai_response
+
+def _months(label):
+    return [{"month": month, "description": f"{label} {month}"} for month in range(1, 13)]
+
+GOALS = [
+    {"title": "Learn Spanish", "description": "Conversational by December", "year": 2025},
+    {"title": "Run a marathon", "description": "Finish under four hours", "year": 2025}
+]
+
+class TestBatchedAIService(unittest.TestCase):
+    """Test batched multi-goal AI requests"""
+
+    def setUp(self):
+        self.ai_service = AIService("test_api_key")
+
+    def test_breakdowns_for_two_goals_in_one_request(self):
+        """Test that two goals share one request and the response is split per goal"""
+        content = {"goals": [{"id": "goal_2", "months": _months("Run")}, {"id": "goal_1", "months": _months("Spanish")}]}
+        with patch('openai.chat.completions.create', return_value=openai_response(content)) as mock_create:
+            results = self.ai_service.generate_monthly_breakdowns_batch(GOALS)
+
+        mock_create.assert_called_once()
+        prompt = mock_create.call_args.kwargs["messages"][-1]["content"]
+        self.assertIn("[goal_1] Year: 2025\nGoal: Learn Spanish", prompt)
+        self.assertEqual(results[0][0]["description"], "Spanish 1")
+        self.assertEqual(results[1][11]["description"], "Run 12")
+
+    def test_incomplete_goal_is_completed_alone(self):
+        """Test that months missing from one goal's entry are requested for that goal only"""
+        batched = {"goals": [{"id": "goal_1", "months": _months("Spanish")},
+                             {"id": "goal_2", "months": _months("Run")[:10]}]}
+        missing = {"months": [{"month": 11, "description": "Run 11"}, {"month": 12, "description": "Run 12"}]}
+        with patch('openai.chat.completions.create',
+                   side_effect=[openai_response(batched), openai_response(missing)]) as mock_create:
+            results = self.ai_service.generate_monthly_breakdowns_batch(GOALS)
+
+        self.assertEqual(mock_create.call_count, 2)
+        self.assertIn("Run a marathon", mock_create.call_args.kwargs["messages"][-1]["content"])
+        self.assertEqual([b["description"] for b in results[1]], [f"Run {m}" for m in range(1, 13)])
+
+    def test_feedback_batch_falls_back_per_goal(self):
+        """Test that a goal with an invalid batched entry gets its own request"""
+        items = [dict(goal, monthly_breakdowns=[], current_month=3) for goal in GOALS]
+        batched = {"goals": [{"id": "goal_1", "feedback_text": "Keep going", "feedback_type": "affirm"},
+                             {"id": "goal_2", "feedback_text": "", "feedback_type": "affirm"}]}
+        single = {"feedback_text": "Train more", "feedback_type": "double_down"}
+        with patch('openai.chat.completions.create',
+                   side_effect=[openai_response(batched), openai_response(single)]) as mock_create:
+            results = self.ai_service.generate_goal_feedback_batch(items)
+
+        self.assertEqual(mock_create.call_count, 2)
+        self.assertEqual(results[0]["feedback_text"], "Keep going")
+        self.assertEqual(results[1]["feedback_type"], "double_down")
+
+class TestBatchQueue(unittest.TestCase):
+    """Test the offline queue of AI jobs"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db = SQLiteDatabase()
+        user_uuid = self.db.create_user("batch_user", "hashed")
+        self.goal_uuids = [self.db.create_goal(user_uuid, goal["title"], goal["description"], goal["year"])
+                           for goal in GOALS]
+        self.ai_service = MagicMock()
+        self.ai_service.generate_monthly_breakdowns_batch.side_effect = lambda goals: [_months(g["title"]) for g in goals]
+        self.ai_service.generate_goal_feedback_batch.side_effect = lambda items: [
+            {"feedback_text": f"About {item['title']}", "feedback_type": "affirm"} for item in items
+        ]
+        self.manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service, prefetch_feedback=False)
+        self.queue = BatchQueue(self.manager, self.directory.name, batch_size=10)
+
+    def test_jobs_are_batched_and_deduplicated(self):
+        """Test that queued goals are processed in one batch per kind, each goal once"""
+        self.queue.enqueue("breakdowns", self.goal_uuids)
+        self.queue.enqueue("breakdowns", self.goal_uuids[:1])
+        self.queue.enqueue("feedback", self.goal_uuids)
+        self.assertEqual(len(self.queue.pending()), 5)
+
+        processed = self.queue.process()
+
+        self.assertEqual(processed, {"feedback": 2, "breakdowns": 2})
+        self.ai_service.generate_monthly_breakdowns_batch.assert_called_once()
+        self.ai_service.generate_goal_feedback_batch.assert_called_once()
+        self.assertEqual(len(self.db.get_monthly_breakdowns(self.goal_uuids[1])), 12)
+        self.assertEqual(self.db.get_feedback_for_goal(self.goal_uuids[0])[0]["feedback_text"], "About Learn Spanish")
+        self.assertEqual(self.queue.pending(), [])
+
+    def test_stored_feedback_is_not_regenerated(self):
+        """Test that a second feedback run for unchanged goals makes no AI request"""
+        self.queue.enqueue("feedback", self.goal_uuids)
+        self.queue.process()
+        self.queue.enqueue("feedback", self.goal_uuids)
+        self.queue.process()
+        self.ai_service.generate_goal_feedback_batch.assert_called_once()
+
+    def test_queue_is_not_locked_during_ai_requests(self):
+        """Test that jobs can be queued while a batch runs, and a second processor does not run the same jobs"""
+        during = {}
+        def generate(items):
+            enqueuer = threading.Thread(target=self.queue.enqueue, args=("feedback", self.goal_uuids[:1]))
+            enqueuer.start()
+            enqueuer.join(5)
+            during["enqueued"] = not enqueuer.is_alive()
+            during["second"] = self.queue.process()
+            return [{"feedback_text": "Later", "feedback_type": "affirm"} for _ in items]
+        self.ai_service.generate_goal_feedback_batch.side_effect = generate
+        self.queue.enqueue("feedback", self.goal_uuids)
+        self.assertEqual(self.queue.process(), {"feedback": 2, "breakdowns": 0})
+        self.assertTrue(during["enqueued"])
+        self.assertEqual(during["second"], {"feedback": 0, "breakdowns": 0})
+        # The job queued during the run is left for the next one
+        self.assertEqual([job["goal_uuid"] for job in self.queue.pending()], self.goal_uuids[:1])
+
+    def test_interrupted_run_resumes_after_last_batch(self):
+        """Test that each batch is checkpointed, so a run that stops part way does not redo finished batches"""
+        queue = BatchQueue(self.manager, self.directory.name, batch_size=1)
+        calls = []
+        def generate(goals):
+            calls.append([goal["title"] for goal in goals])
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return [_months(goal["title"]) for goal in goals]
+        self.ai_service.generate_monthly_breakdowns_batch.side_effect = generate
+        queue.enqueue("breakdowns", self.goal_uuids)
+        with self.assertRaises(KeyboardInterrupt):
+            queue.process()
+        self.assertEqual([job["goal_uuid"] for job in queue.pending()], self.goal_uuids[1:])
+
+        self.assertEqual(BatchQueue(self.manager, self.directory.name, batch_size=1).process(),
+                         {"feedback": 0, "breakdowns": 1})
+        self.assertEqual(calls, [[GOALS[0]["title"]], [GOALS[1]["title"]], [GOALS[1]["title"]]])
+        self.assertEqual(queue.pending(), [])
+
+    def test_unknown_kind(self):
+        """Test that unknown job kinds are rejected"""
+        with self.assertRaises(ValueError):
+            self.queue.enqueue("poems", self.goal_uuids)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import sys
+import os
+import io
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_io
+from batch_queue import BatchQueue
+from goals import GoalManager
+from sqlite_backend import SQLiteDatabase
+
+def _months(label):
+    return [{"month": month, "description": f"{label} {month}"} for month in range(1, 13)]
+
+class TestBulkIO(unittest.TestCase):
+    """Test streaming import and export of goals"""
+
+    def setUp(self):
+        self.source = SQLiteDatabase()
+        self.usernames = ["alice", "bob"]
+        for username in self.usernames:
+            user_uuid = self.source.create_user(username, "hashed")
+            for number in range(2):
+                goal_uuid = self.source.create_goal(user_uuid, f"{username} goal {number}", "It's a plan", 2025)
+                for month in (1, 2):
+                    self.source.create_monthly_breakdown(goal_uuid, month, f"Month {month} of {number}")
+                self.source.create_feedback(goal_uuid, "Keep going", "affirm")
+        self.source_manager = GoalManager("test_api_key", db=self.source, ai_service=MagicMock(),
+                                          prefetch_feedback=False)
+
+        self.target = SQLiteDatabase()
+        for username in self.usernames:
+            self.target.create_user(username, "hashed")
+        self.ai_service = MagicMock()
+        self.ai_service.generate_monthly_breakdowns_batch.side_effect = lambda goals: [_months(g["title"]) for g in goals]
+        self.target_manager = GoalManager("test_api_key", db=self.target, ai_service=self.ai_service,
+                                          prefetch_feedback=False)
+
+    def _goals(self, db, username):
+        user = db.get_user_by_username(username)
+        goals = sorted(db.get_goals_by_user_uuid(user['uuid']), key=lambda goal: goal['title'])
+        return [(goal['title'], [b['description'] for b in db.get_monthly_breakdowns(goal['uuid'])],
+                 [f['feedback_text'] for f in db.get_feedback_for_goal(goal['uuid'])]) for goal in goals]
+
+    def test_export_pages_with_constant_queries(self):
+        """Test that export reads one page of goals with three queries"""
+        out = io.StringIO()
+        start = len(self.source.queries)
+        count = bulk_io.write_records(bulk_io.iter_goals(self.source, page_size=3), out)
+        self.assertEqual(count, 4)
+        # Two pages (3 goals and 1 goal) of three queries each
+        self.assertEqual(len(self.source.queries) - start, 6)
+        record = json.loads(out.getvalue().splitlines()[0])
+        self.assertEqual(record["username"], "alice")
+        self.assertEqual([b["month"] for b in record["monthly_breakdowns"]], [1, 2])
+        self.assertEqual(record["feedback"][0]["feedback_text"], "Keep going")
+
+    def test_jsonl_and_csv_round_trip(self):
+        """Test that exported goals import with their breakdowns and feedback"""
+        for fmt in bulk_io.FORMATS:
+            with self.subTest(fmt=fmt):
+                self.setUp()
+                out = io.StringIO()
+                self.source_manager.export_goals(out, fmt)
+                start = len(self.target.queries)
+                counts = self.target_manager.import_goals(io.StringIO(out.getvalue()), fmt)
+                self.assertEqual(counts["goals"], 4)
+                self.assertEqual(counts["breakdowns"], 8)
+                self.assertEqual(counts["feedback"], 4)
+                # One batch: the users, the goals already there, then a parent lookup and an insert each
+                # for goals, breakdowns and feedback
+                self.assertEqual(len(self.target.queries) - start, 8)
+                for username in self.usernames:
+                    self.assertEqual(self._goals(self.target, username), self._goals(self.source, username))
+
+    def test_import_resumes_without_duplicates(self):
+        """Test that goals keep their uuid and a rerun import only adds what the first run did not write"""
+        out = io.StringIO()
+        self.source_manager.export_goals(out)
+        lines = out.getvalue().splitlines()
+        # A first run that stopped after two of the four goals
+        self.target_manager.import_goals(io.StringIO("\n".join(lines[:2])))
+        progress = []
+        counts = self.target_manager.import_goals(io.StringIO(out.getvalue()), progress=progress.append)
+        self.assertEqual((counts["goals"], counts["existing"], counts["breakdowns"], counts["feedback"]), (2, 2, 4, 2))
+        self.assertEqual(progress[-1]["existing"], 2)
+        for username in self.usernames:
+            self.assertEqual(self._goals(self.target, username), self._goals(self.source, username))
+        self.assertEqual({goal['uuid'] for goal in bulk_io.iter_goals(self.target)},
+                         {goal['uuid'] for goal in bulk_io.iter_goals(self.source)})
+
+        counts = self.source_manager.import_goals(io.StringIO(out.getvalue()))
+        self.assertEqual((counts["goals"], counts["existing"], counts["breakdowns"], counts["feedback"]), (0, 4, 0, 0))
+
+    def test_resumed_goals_are_not_generated_again(self):
+        """Test that breakdowns generated by the first run are not requested again on a rerun"""
+        records = "\n".join(json.dumps({"uuid": f"00000000-0000-0000-0000-00000000000{n}", "username": "bob",
+                                         "title": f"Goal {n}", "year": 2025}) for n in range(3))
+        self.target_manager.import_goals(io.StringIO(records), breakdowns="generate")
+        counts = self.target_manager.import_goals(io.StringIO(records), breakdowns="generate")
+        self.assertEqual((counts["existing"], counts["generated"], counts["breakdowns"]), (3, 0, 0))
+        self.assertEqual(self.ai_service.generate_monthly_breakdowns_batch.call_count, 1)
+        self.assertEqual(len(self._goals(self.target, "bob")[0][1]), 12)
+
+    def test_unknown_users_are_skipped(self):
+        """Test that records of users that do not exist are counted and skipped"""
+        records = "\n".join(json.dumps({"username": name, "title": "Read", "year": 2025}) for name in ("alice", "carol"))
+        counts = self.target_manager.import_goals(io.StringIO(records))
+        self.assertEqual((counts["goals"], counts["skipped"]), (1, 1))
+
+    def test_missing_breakdowns_are_generated(self):
+        """Test that goals imported without breakdowns get them from batched AI requests"""
+        records = "\n".join(json.dumps({"username": "bob", "title": f"Goal {n}", "year": 2025}) for n in range(7))
+        counts = self.target_manager.import_goals(io.StringIO(records), breakdowns="generate")
+        self.assertEqual((counts["goals"], counts["generated"], counts["breakdowns"]), (7, 7, 84))
+        # Seven goals in requests of up to five goals
+        self.assertEqual(self.ai_service.generate_monthly_breakdowns_batch.call_count, 2)
+        self.assertEqual(self._goals(self.target, "bob")[6][1], [f"Goal 6 {m}" for m in range(1, 13)])
+
+    def test_missing_breakdowns_are_queued(self):
+        """Test that goals imported without breakdowns can be left to the batch queue"""
+        with tempfile.TemporaryDirectory() as directory:
+            queue = BatchQueue(self.target_manager, directory)
+            records = json.dumps({"username": "bob", "title": "Swim", "year": 2025})
+            counts = self.target_manager.import_goals(io.StringIO(records), breakdowns="queue", queue=queue)
+            self.assertEqual(counts["queued"], 1)
+            self.assertEqual([job["kind"] for job in queue.pending()], ["breakdowns"])
+        self.ai_service.generate_monthly_breakdowns_batch.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
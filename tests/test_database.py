@@ -8,13 +8,17 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import Database
+from tests.fakes import FakeDatabase
+
+# Set GOAL_TRACKER_LIVE_TESTS=1 to run against the Gibson AI project instead of in memory
+LIVE = os.environ.get("GOAL_TRACKER_LIVE_TESTS") == "1"
 
 class TestDatabase(unittest.TestCase):
     """Test the database operations"""
     
     def setUp(self):
         """Set up the test environment"""
-        self.db = Database()
+        self.db = Database() if LIVE else FakeDatabase()
         self.test_username = f"test_user_{uuid.uuid4().hex[:8]}"
         self.test_password = "securepassword123"
         
@@ -0,0 +1,69 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_backend import SQLiteDatabase
+
+class TestDatabaseWrites(unittest.TestCase):
+    """Test single-statement inserts and conditional updates against the SQLite stand-in"""
+    
+    def setUp(self):
+        self.db = SQLiteDatabase()
+        self.user_uuid = self.db.create_user("writer", "hashed")
+    
+    def test_inserts_take_one_round_trip(self):
+        """Test that child inserts resolve the parent id in the same statement"""
+        start = len(self.db.queries)
+        goal_uuid = self.db.create_goal(self.user_uuid, "Goal", "Description", 2025)
+        breakdown_uuid = self.db.create_monthly_breakdown(goal_uuid, 1, "January")
+        self.db.create_feedback(goal_uuid, "Feedback", "affirm")
+        self.assertEqual(len(self.db.queries) - start, 3)
+        
+        self.assertEqual(self.db.get_goal_by_uuid(goal_uuid)['user_id'],
+                         self.db.get_user_by_uuid(self.user_uuid)['id'])
+        self.assertEqual(self.db.get_monthly_breakdown_by_uuid(breakdown_uuid)['month'], 1)
+        print("Single round trip insert test passed!")
+    
+    def test_missing_parent_raises(self):
+        """Test that an insert matching no parent row raises the not found error"""
+        with self.assertRaisesRegex(Exception, "User not found"):
+            self.db.create_goal("missing-user", "Goal", "Description", 2025)
+        with self.assertRaisesRegex(Exception, "Goal not found"):
+            self.db.create_monthly_breakdown("missing-goal", 1, "January")
+        with self.assertRaisesRegex(Exception, "Goal not found"):
+            self.db.create_feedback("missing-goal", "Feedback", "affirm")
+        print("Missing parent test passed!")
+    
+    def test_unreported_affected_rows_are_looked_up(self):
+        """Test that the insert is checked with a lookup when the result has no affected row count"""
+        execute = self.db.backend.execute
+        def execute_without_counts(query):
+            result = execute(query)
+            return {} if isinstance(result, dict) else result
+        self.db.backend.execute = execute_without_counts
+        goal_uuid = self.db.create_goal(self.user_uuid, "Goal", "Description", 2025)
+        self.assertIsNotNone(self.db.get_goal_by_uuid(goal_uuid))
+        with self.assertRaisesRegex(Exception, "Goal not found"):
+            self.db.create_monthly_breakdown("missing-goal", 1, "January")
+        print("Unreported affected rows test passed!")
+    
+    def test_status_updates_skip_no_ops(self):
+        """Test that setting a status a row already has changes no rows"""
+        goal_uuid = self.db.create_goal(self.user_uuid, "Goal", "Description", 2025)
+        breakdown_uuid = self.db.create_monthly_breakdown(goal_uuid, 1, "January")
+        
+        self.assertEqual(self.db.update_monthly_breakdown(breakdown_uuid, status="ahead"), 1)
+        self.assertEqual(self.db.update_monthly_breakdown(breakdown_uuid, status="ahead"), 0)
+        self.assertEqual(self.db.update_goal(goal_uuid, status="on_track"), 0)
+        self.assertEqual(self.db.update_goal(goal_uuid, status="behind"), 1)
+        self.assertEqual(self.db.update_rows("goal_monthly_breakdown", {breakdown_uuid: {"status": "ahead"}}), 0)
+        self.assertEqual(self.db.update_rows("goal_monthly_breakdown", {breakdown_uuid: {"status": "behind"}}), 1)
+        # Descriptions may be NULL, so they are always written
+        self.assertEqual(self.db.update_monthly_breakdown(breakdown_uuid, description="January"), 1)
+        print("No-op status update test passed!")
+
+if __name__ == '__main__':
+    unittest.main()
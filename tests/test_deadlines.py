@@ -0,0 +1,144 @@
+import sys
+import os
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+import config
+import deadlines
+import metrics
+from ai_service import AIService
+from database import Database
+from goals import GoalManager
+from mock_servers import MockGibsonServer
+from rate_limiter import RateLimiter, INTERACTIVE, BACKGROUND
+from sqlite_backend import SQLiteDatabase
+
+class TestDeadlines(unittest.TestCase):
+    """Test deadline propagation to upstream calls"""
+
+    def test_budget_and_nesting(self):
+        """Test that timeouts use the remaining budget and nested deadlines only shorten it"""
+        self.assertIsNone(deadlines.remaining())
+        self.assertEqual(deadlines.timeout(10.0, "gibson"), 10.0)
+        with deadlines.deadline(2.0):
+            self.assertLessEqual(deadlines.timeout(10.0, "gibson"), 2.0)
+            with deadlines.deadline(60.0):
+                self.assertLessEqual(deadlines.remaining(), 2.0)
+            with deadlines.reserve(1.5):
+                self.assertLessEqual(deadlines.remaining(), 0.5)
+        self.assertIsNone(deadlines.remaining())
+
+    def test_expired_deadline_fails_fast(self):
+        """Test that no call is started once the budget is gone"""
+        before = metrics.DEADLINE_EXCEEDED.value(upstream="gibson")
+        with deadlines.deadline(0.0):
+            with self.assertRaises(deadlines.DeadlineExceeded):
+                deadlines.timeout(10.0, "gibson")
+        self.assertEqual(metrics.DEADLINE_EXCEEDED.value(upstream="gibson"), before + 1)
+
+    def test_rate_limiter_wait_is_bounded(self):
+        """Test that a call queued behind the rate limiter gives up at the deadline"""
+        limiter = RateLimiter("test", rate_per_second=0.01, burst=1, max_concurrent=1,
+                              max_waits={INTERACTIVE: 30.0, BACKGROUND: 30.0}, max_queue=10)
+        limiter.acquire()
+        start = time.monotonic()
+        with deadlines.deadline(0.2):
+            with self.assertRaises(deadlines.DeadlineExceeded):
+                limiter.acquire()
+        self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_query_timeout_follows_deadline(self):
+        """Test that a slow Gibson AI query is cut off at the deadline"""
+        gibson = MockGibsonServer(latency=2.0).start()
+        self.addCleanup(gibson.stop)
+        db = Database()
+        db.endpoint = gibson.endpoint
+        start = time.monotonic()
+        with deadlines.deadline(0.3):
+            with self.assertRaises(deadlines.DeadlineExceeded):
+                db.execute_query("SELECT 1")
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_openai_call_gets_remaining_budget(self):
+        """Test that the OpenAI request timeout is the remaining budget"""
+        ai_service = AIService("test_api_key")
+        with patch('openai.chat.completions.create', side_effect=RuntimeError("no network in tests")) as mock_create:
+            with deadlines.deadline(5.0):
+                ai_service.generate_goal_feedback("Run", "Run a marathon", [], 3)
+        self.assertLessEqual(mock_create.call_args.kwargs["timeout"], 5.0)
+
+    @patch("ai_service.OPENAI_RETRY_BACKOFF_SECONDS", 0.05)
+    def test_openai_retries_stay_within_budget(self):
+        """Test that the SDK does not retry, failed connections are retried, and timeouts or a spent budget are not"""
+        import httpx
+        import openai
+        ai_service = AIService("test_api_key")
+        self.assertEqual(openai.max_retries, 0)
+        # Whatever latencies earlier tests recorded, always send the request
+        ai_service.router.choose = MagicMock(return_value=config.OPENAI_MODEL)
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = '{"feedback_text": "Good", "feedback_type": "affirm"}'
+
+        with patch('openai.chat.completions.create',
+                   side_effect=[openai.APIConnectionError(request=request), response]) as mock_create:
+            with deadlines.deadline(5.0):
+                feedback = ai_service.generate_goal_feedback("Run", "Run a marathon", [], 3)
+        self.assertEqual(feedback["feedback_text"], "Good")
+        self.assertEqual(mock_create.call_count, 2)
+
+        with patch('openai.chat.completions.create', side_effect=openai.APITimeoutError(request=request)) as mock_create:
+            with deadlines.deadline(5.0):
+                self.assertTrue(ai_service.generate_goal_feedback("Swim", "Swim a mile", [], 3)["fallback"])
+        self.assertEqual(mock_create.call_count, 1)
+
+        with patch('openai.chat.completions.create', side_effect=openai.APIConnectionError(request=request)) as mock_create, \
+                patch("ai_service.OPENAI_RETRY_BACKOFF_SECONDS", 5.0):
+            # Less budget left than the backoff before a retry
+            with deadlines.deadline(2.0):
+                self.assertTrue(ai_service.generate_goal_feedback("Bike", "Ride 100 km", [], 3)["fallback"])
+        self.assertEqual(mock_create.call_count, 1)
+
+class TestDegradedFeedback(unittest.TestCase):
+    """Test the degraded feedback given when a feedback request runs out of time"""
+
+    def setUp(self):
+        self.db = SQLiteDatabase()
+        user_uuid = self.db.create_user("deadline_user", "hashed")
+        self.goal_uuid = self.db.create_goal(user_uuid, "Run", "Run a marathon", 2025)
+        self.ai_service = MagicMock()
+        self.manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service, prefetch_feedback=False)
+
+    def _slow_feedback(self, *args):
+        time.sleep(0.3)
+        return {"feedback_text": "Unable", "feedback_type": "affirm", "fallback": True}
+
+    @patch.object(config, "DEADLINE_RESERVE_SECONDS", 1.0)
+    def test_stale_feedback_when_out_of_time(self):
+        """Test that the latest stored feedback is returned when the AI runs out of time"""
+        self.db.create_feedback(self.goal_uuid, "Earlier advice", "double_down")
+        self.ai_service.generate_goal_feedback.side_effect = self._slow_feedback
+        before = metrics.DEGRADED_RESPONSES.value(operation="goal_feedback")
+
+        with deadlines.deadline(1.2):
+            feedback = self.manager.generate_feedback(self.goal_uuid)
+
+        self.assertEqual(feedback, {"feedback_text": "Earlier advice", "feedback_type": "double_down", "stale": True})
+        self.assertEqual(metrics.DEGRADED_RESPONSES.value(operation="goal_feedback"), before + 1)
+
+    @patch.object(config, "DEADLINE_RESERVE_SECONDS", 1.0)
+    def test_no_ai_call_without_budget(self):
+        """Test that the AI is not called when only the reserve is left"""
+        with deadlines.deadline(0.5):
+            feedback = self.manager.generate_feedback(self.goal_uuid)
+        self.ai_service.generate_goal_feedback.assert_not_called()
+        self.assertTrue(feedback["fallback"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goals import GoalManager
+
+class TestFeedbackPrefetch(unittest.TestCase):
+    """Test background pre-generation of goal feedback"""
+    
+    def setUp(self):
+        """Set up a GoalManager with mocked dependencies and a short debounce delay"""
+        self.db = MagicMock()
+        self.ai_service = MagicMock()
+        self.goal_manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service,
+                                        prefetch_feedback=True)
+        self.prefetcher = self.goal_manager.feedback_prefetcher
+        self.prefetcher.delay_seconds = 0.05
+        
+        self.db.get_goal_by_uuid.return_value = {
+            "id": 1, "uuid": "goal_uuid", "title": "Test Goal", "description": "Test goal description"
+        }
+        self.db.get_monthly_breakdowns.return_value = [
+            {"month": 1, "description": "January milestone", "status": "ahead"}
+        ]
+        self.db.get_feedback_by_fingerprint.return_value = None
+        self.ai_service.generate_goal_feedback.return_value = {
+            "feedback_text": "Precomputed", "feedback_type": "affirm"
+        }
+    
+    def tearDown(self):
+        self.prefetcher.shutdown()
+    
+    def wait_for_saved(self, timeout=2.0):
+        """Wait until the background job has saved its result"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.db.create_feedback.called:
+                return self.db.create_feedback.call_args
+            time.sleep(0.01)
+        self.fail("Background feedback was not generated")
+    
+    def test_status_change_pregenerates_feedback(self):
+        """Test that feedback is saved with its fingerprint and then served by the stored-feedback lookup"""
+        self.assertTrue(self.goal_manager.update_monthly_breakdown("bd_uuid", status="ahead", goal_uuid="goal_uuid"))
+        args, kwargs = self.wait_for_saved()
+        self.assertEqual(args, ("goal_uuid", "Precomputed", "affirm"))
+        self.assertIsNotNone(kwargs["fingerprint"])
+        self.ai_service.generate_goal_feedback.assert_called_once()
+        
+        self.db.get_feedback_by_fingerprint.return_value = {"feedback_text": "Precomputed", "feedback_type": "affirm"}
+        feedback = self.goal_manager.generate_feedback("goal_uuid")
+        self.assertEqual(feedback["feedback_text"], "Precomputed")
+        self.db.get_feedback_by_fingerprint.assert_called_with("goal_uuid", kwargs["fingerprint"])
+        # No new LLM call and no second row
+        self.ai_service.generate_goal_feedback.assert_called_once()
+        self.db.create_feedback.assert_called_once()
+        
+        print("Background feedback pre-generation test passed!")
+    
+    def test_rapid_changes_are_debounced(self):
+        """Test that several quick status changes produce a single background job"""
+        for status in ("ahead", "behind", "on_track"):
+            self.goal_manager.update_monthly_breakdown("bd_uuid", status=status, goal_uuid="goal_uuid")
+        self.wait_for_saved()
+        time.sleep(0.1)
+        self.ai_service.generate_goal_feedback.assert_called_once()
+        self.assertEqual(self.prefetcher._queued, {})
+        
+        print("Background feedback debounce test passed!")
+    
+    def test_one_worker_for_many_goals(self):
+        """Test that a burst of changes to many goals is run by one worker thread, each goal once"""
+        self.prefetcher.max_calls_per_hour = 100
+        for number in range(50):
+            self.goal_manager.update_monthly_breakdown("bd_uuid", status="ahead", goal_uuid=f"goal_{number}")
+        workers = [thread for thread in threading.enumerate() if thread.name == "feedback-prefetch"]
+        self.assertEqual(len(workers), 1)
+        deadline = time.time() + 5
+        while self.db.create_feedback.call_count < 50 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sorted(call.args[0] for call in self.db.create_feedback.call_args_list),
+                         sorted(f"goal_{number}" for number in range(50)))
+        self.assertEqual(self.prefetcher._queued, {})
+        
+        print("Background feedback worker test passed!")
+    
+    def test_cancelled_job_does_not_run(self):
+        """Test that a goal deleted before its job is due gets no background call"""
+        self.goal_manager.update_monthly_breakdown("bd_uuid", status="ahead", goal_uuid="goal_uuid")
+        self.prefetcher.cancel("goal_uuid")
+        time.sleep(0.2)
+        self.ai_service.generate_goal_feedback.assert_not_called()
+        
+        print("Cancelled background feedback test passed!")
+    
+    def test_budget_caps_background_calls(self):
+        """Test that no background calls are made once the hourly cap is used up"""
+        self.prefetcher.max_calls_per_hour = 0
+        self.goal_manager.update_monthly_breakdown("bd_uuid", status="ahead", goal_uuid="goal_uuid")
+        time.sleep(0.2)
+        self.ai_service.generate_goal_feedback.assert_not_called()
+        self.db.create_feedback.assert_not_called()
+        
+        print("Background feedback budget test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from goals import GoalManager, compute_feedback_fingerprint
+
+class TestGoalManager(unittest.TestCase):
+    """Test the goal management functionality"""
+    
+    def setUp(self):
+        """Set up a GoalManager with mocked database and AI service"""
+        self.db = MagicMock()
+        self.ai_service = MagicMock()
+        self.goal_manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service)
+        
+        self.db.get_goal_by_uuid.return_value = {
+            "id": 1, "uuid": "goal_uuid", "title": "Test Goal", "description": "Test goal description"
+        }
+        self.breakdowns = [
+            {"month": 1, "description": "January milestone", "status": "ahead"},
+            {"month": 2, "description": "February milestone", "status": "on_track"}
+        ]
+        self.db.get_monthly_breakdowns.return_value = self.breakdowns
+        self.ai_service.generate_goal_feedback.return_value = {
+            "feedback_text": "Keep going!", "feedback_type": "affirm"
+        }
+    
+    def test_fingerprint_tracks_status_changes(self):
+        """Test that the feedback fingerprint changes only with the inputs of the feedback"""
+        fingerprint = compute_feedback_fingerprint("Goal", "Desc", self.breakdowns, 2)
+        reordered = list(reversed(self.breakdowns))
+        self.assertEqual(fingerprint, compute_feedback_fingerprint("Goal", "Desc", reordered, 2))
+        
+        changed = [dict(self.breakdowns[0], status="behind"), self.breakdowns[1]]
+        self.assertNotEqual(fingerprint, compute_feedback_fingerprint("Goal", "Desc", changed, 2))
+        self.assertNotEqual(fingerprint, compute_feedback_fingerprint("Goal", "Desc", self.breakdowns, 3))
+        
+        print("Feedback fingerprint test passed!")
+    
+    def test_generate_feedback_reuses_stored_feedback(self):
+        """Test that unchanged progress returns the stored feedback without calling the AI"""
+        self.db.get_feedback_by_fingerprint.return_value = None
+        feedback = self.goal_manager.generate_feedback("goal_uuid")
+        self.assertEqual(feedback["feedback_text"], "Keep going!")
+        self.ai_service.generate_goal_feedback.assert_called_once()
+        args, kwargs = self.db.create_feedback.call_args
+        fingerprint = kwargs["fingerprint"]
+        self.assertIsNotNone(fingerprint)
+        
+        # Second request with the same fingerprint is served from goal_feedback
+        self.db.get_feedback_by_fingerprint.return_value = {
+            "feedback_text": "Keep going!", "feedback_type": "affirm", "fingerprint": fingerprint
+        }
+        feedback = self.goal_manager.generate_feedback("goal_uuid")
+        self.assertEqual(feedback, {"feedback_text": "Keep going!", "feedback_type": "affirm"})
+        self.ai_service.generate_goal_feedback.assert_called_once()
+        self.db.create_feedback.assert_called_once()
+        self.db.get_feedback_by_fingerprint.assert_called_with("goal_uuid", fingerprint)
+        
+        print("Feedback memoization test passed!")
+    
+    def test_fallback_feedback_is_not_fingerprinted(self):
+        """Test that placeholder feedback is saved without a fingerprint"""
+        self.db.get_feedback_by_fingerprint.return_value = None
+        self.ai_service.generate_goal_feedback.return_value = {
+            "feedback_text": "Unable to generate personalized feedback at this time.",
+            "feedback_type": "affirm",
+            "fallback": True
+        }
+        self.goal_manager.generate_feedback("goal_uuid")
+        args, kwargs = self.db.create_feedback.call_args
+        self.assertIsNone(kwargs["fingerprint"])
+        
+        print("Fallback feedback test passed!")
+    
+    def test_failed_lookup_does_not_call_the_ai(self):
+        """Test that a failing stored-feedback lookup degrades to the latest feedback instead of a new AI call"""
+        self.db.get_feedback_by_fingerprint.side_effect = Exception("Database query error: 503")
+        self.db.get_feedback_for_goal.return_value = [{"feedback_text": "Earlier", "feedback_type": "affirm"}]
+        feedback = self.goal_manager.generate_feedback("goal_uuid")
+        self.assertEqual(feedback, {"feedback_text": "Earlier", "feedback_type": "affirm", "stale": True})
+        self.ai_service.generate_goal_feedback.assert_not_called()
+        self.db.create_feedback.assert_not_called()
+        
+        print("Failed lookup test passed!")
+    
+    def test_openai_key_is_read_when_the_ai_is_first_needed(self):
+        """Test that a missing key file fails the AI access and a key written later is used without a new manager"""
+        goal_manager = GoalManager(None, db=self.db, prefetch_feedback=False)
+        with tempfile.TemporaryDirectory() as directory:
+            key_file = os.path.join(directory, "openaikey.txt")
+            with patch.object(config, "OPENAI_KEY_FILE", key_file):
+                config.load_openai_api_key.cache_clear()
+                self.addCleanup(config.load_openai_api_key.cache_clear)
+                with self.assertRaises(FileNotFoundError):
+                    goal_manager.ai_service
+                with open(key_file, "w") as f:
+                    f.write("sk-later\n")
+                self.assertEqual(goal_manager.ai_service.api_key, "sk-later")
+        
+        print("Lazy OpenAI key test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+import urllib.request
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from metrics import Registry
+
+class TestMetrics(unittest.TestCase):
+    """Test the metrics registry and exposition format"""
+    
+    def test_text_exposition_format(self):
+        """Test counters and histograms render in the Prometheus text format"""
+        registry = Registry()
+        counter = registry.counter("test_requests_total", "Requests", ("outcome",))
+        histogram = registry.histogram("test_latency_seconds", "Latency", ("operation",), buckets=(0.1, 1.0))
+        
+        counter.inc(outcome="ok")
+        counter.inc(2, outcome="ok")
+        histogram.observe(0.05, operation="feedback")
+        histogram.observe(0.5, operation="feedback")
+        
+        text = registry.render()
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertIn('test_requests_total{outcome="ok"} 3.0', text)
+        self.assertIn('test_latency_seconds_bucket{operation="feedback",le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{operation="feedback",le="+Inf"} 2', text)
+        self.assertIn('test_latency_seconds_count{operation="feedback"} 2', text)
+        
+        with self.assertRaises(ValueError):
+            counter.inc(status="ok")
+        
+        print("Metrics exposition format test passed!")
+    
+    def test_cache_hit_ratio(self):
+        """Test that cache lookups maintain a hit ratio gauge"""
+        metrics.record_cache("test_cache", True)
+        metrics.record_cache("test_cache", True)
+        metrics.record_cache("test_cache", False)
+        self.assertAlmostEqual(metrics.CACHE_HIT_RATIO.value(cache="test_cache"), 2 / 3)
+        
+        print("Cache hit ratio test passed!")
+    
+    def test_metrics_server(self):
+        """Test that the side server serves the registry and starts only once"""
+        server = metrics.start_metrics_server(0, "127.0.0.1")
+        self.assertIsNotNone(server)
+        self.assertIs(metrics.start_metrics_server(0, "127.0.0.1"), server)
+        
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+        self.assertIn("goal_tracker_db_queries_total", body)
+        
+        print("Metrics server test passed!")
+    
+    def test_replicas_take_the_next_free_port(self):
+        """Test that a busy metrics port makes the server bind one of the following ports"""
+        taken = metrics._bind("127.0.0.1", 0)
+        self.addCleanup(taken.server_close)
+        port = taken.server_address[1]
+        server = metrics._bind("127.0.0.1", port, tries=3)
+        self.addCleanup(server.server_close)
+        self.assertIn(server.server_address[1], (port + 1, port + 2))
+        self.assertEqual(server.server_address[0], "127.0.0.1")
+        with self.assertRaises(OSError):
+            metrics._bind("127.0.0.1", port)
+        
+        print("Metrics port range test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations
+from sqlite_backend import SQLiteBackend, SQLiteDatabase
+
+class TestMigrations(unittest.TestCase):
+    """Test the schema migrations and the EXPLAIN-based index verification"""
+    
+    def test_migrate_is_incremental(self):
+        """Test that migrations apply in order, once, and record their versions"""
+        backend = SQLiteBackend(create_schema=False)
+        self.assertEqual(migrations.migrate(backend.execute, "sqlite", target=2), [1, 2])
+        self.assertEqual(migrations.migrate(backend.execute, "sqlite"), [3])
+        self.assertEqual(migrations.migrate(backend.execute, "sqlite"), [])
+        self.assertEqual(migrations.applied_versions(backend.execute), [1, 2, 3])
+        
+        indexes = {row['name'] for row in backend.execute("SELECT `name` FROM sqlite_master WHERE `type` = 'index'")}
+        self.assertIn("idx_feedback_goal_fingerprint", indexes)
+        print("Incremental migration test passed!")
+    
+    def test_baseline_skips_existing_schema(self):
+        """Test that baselined versions are recorded without running their DDL"""
+        backend = SQLiteBackend(create_schema=False)
+        self.assertEqual(migrations.baseline(backend.execute, 2), [1, 2])
+        self.assertEqual(migrations.applied_versions(backend.execute), [1, 2])
+        tables = [row['name'] for row in backend.execute("SELECT `name` FROM sqlite_master WHERE `type` = 'table'")]
+        self.assertNotIn("goal", tables)
+        print("Baseline test passed!")
+    
+    def test_feedback_before_fingerprint_migration(self):
+        """Test that feedback is stored without a fingerprint until the migration adding the column is applied"""
+        backend = SQLiteBackend(create_schema=False)
+        migrations.migrate(backend.execute, "sqlite", target=1)
+        db = SQLiteDatabase(backend)
+        goal_uuid = db.create_goal(db.create_user("early_user", "hashed"), "Run", "Run a marathon", 2025)
+        db.create_feedback(goal_uuid, "Keep going", "affirm", fingerprint="abc")
+        db.create_feedbacks([{"goal_uuid": goal_uuid, "feedback_text": "Imported", "feedback_type": "affirm",
+                              "fingerprint": "abc"}])
+        self.assertIsNone(db.get_feedback_by_fingerprint(goal_uuid, "abc"))
+        self.assertEqual(len(db.get_feedback_for_goal(goal_uuid)), 2)
+        
+        migrations.migrate(backend.execute, "sqlite")
+        db._fingerprint_checked = 0.0
+        db.create_feedback(goal_uuid, "Keep going", "affirm", fingerprint="abc")
+        self.assertEqual(db.get_feedback_by_fingerprint(goal_uuid, "abc")["feedback_text"], "Keep going")
+        print("Fingerprint migration test passed!")
+    
+    def test_verify(self):
+        """Test that every Database query uses an index at the latest version and full scans are reported without the indexes"""
+        self.assertEqual(migrations.verify(), [])
+        problems = migrations.verify(target=2)
+        self.assertTrue(any(problem.startswith("get_monthly_breakdowns: SCAN") for problem in problems))
+        print("Query plan verification test passed!")
+
+if __name__ == '__main__':
+    unittest.main()
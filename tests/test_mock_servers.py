@@ -0,0 +1,53 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from database import Database
+from mock_servers import MockGibsonServer
+from loadtest import percentile, find_saturation
+
+class TestMockServers(unittest.TestCase):
+    """Test the load test tooling against the mock Gibson AI server"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.gibson = MockGibsonServer().start()
+        cls.db = Database()
+        cls.db.endpoint = cls.gibson.endpoint
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.gibson.stop()
+    
+    def test_database_round_trip(self):
+        """Test that Database creates and reads a goal with breakdowns through the mock server"""
+        user_uuid = self.db.create_user("mock_user", "hashed")
+        self.assertEqual(self.db.get_user_by_username("mock_user")['uuid'], user_uuid)
+        
+        goal_uuid = self.db.create_goal(user_uuid, "Mock goal", "Description", 2025)
+        self.db.create_monthly_breakdown(goal_uuid, 1, "January milestone")
+        goals = self.db.get_goals_by_user_uuid(user_uuid)
+        self.assertEqual(len(goals), 1)
+        self.assertEqual(goals[0]['uuid'], goal_uuid)
+        self.assertEqual(len(self.db.get_monthly_breakdowns(goal_uuid)), 1)
+        print("Mock Gibson round trip test passed!")
+    
+    def test_percentile_and_saturation(self):
+        """Test the nearest-rank percentile and the saturation point of the load report"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+        
+        stages = [{"users": 5, "throughput": 10.0}, {"users": 10, "throughput": 19.0},
+                  {"users": 20, "throughput": 20.0}]
+        self.assertEqual(find_saturation(stages)["users"], 10)
+        self.assertIsNone(find_saturation(stages[:2]))
+        print("Load report test passed!")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import openai
+import deadlines
+import metrics
+from ai_service import AIService
+from local_planner import plan_year, split_steps
+from model_router import ModelRouter
+from tests.fakes import openai_response
+
+MONTHS = {"months": [{"month": month, "description": f"Step {month}"} for month in range(1, 13)]}
+
+class TestModelRouter(unittest.TestCase):
+    """Test latency-aware model choice"""
+
+    def setUp(self):
+        self.router = ModelRouter("fast-model", models={"breakdowns": ["big-model", "fast-model"]},
+                                  slos={"breakdowns": 1.0}, min_samples=2)
+
+    def test_prefers_first_model_without_history(self):
+        """Test that models without enough history are assumed to fit"""
+        self.assertEqual(self.router.choose("monthly_breakdowns"), "big-model")
+        self.assertEqual(self.router.choose("goal_feedback"), "fast-model")
+
+    def test_slow_model_is_skipped_within_budget(self):
+        """Test that a model slower than the budget gives way to the next one, and then to none"""
+        for _ in range(2):
+            self.router.record("big-model", "monthly_breakdowns", 5.0)
+        with self.router.slo("breakdowns"):
+            self.assertEqual(self.router.choose("monthly_breakdowns"), "fast-model")
+            for _ in range(2):
+                self.router.record("fast-model", "monthly_breakdowns", 3.0)
+            self.assertIsNone(self.router.choose("monthly_breakdowns"))
+        # Without a deadline every model fits
+        self.assertEqual(self.router.choose("monthly_breakdowns"), "big-model")
+
+    def test_old_history_is_probed_again(self):
+        """Test that a slow model is tried again once its history is older than probe_seconds"""
+        self.router.probe_seconds = 0.05
+        for _ in range(2):
+            self.router.record("big-model", "monthly_breakdowns", 5.0)
+        time.sleep(0.1)
+        with deadlines.deadline(1.0):
+            self.assertEqual(self.router.choose("monthly_breakdowns"), "big-model")
+
+class TestRoutedAIService(unittest.TestCase):
+    """Test routing and the local fallback in AIService"""
+
+    def setUp(self):
+        self.router = ModelRouter("fast-model", models={"breakdowns": ["big-model", "fast-model"]},
+                                  slos={"breakdowns": 0.5}, min_samples=1)
+        self.ai_service = AIService("test_api_key", router=self.router)
+
+    def test_request_goes_to_routed_model(self):
+        """Test that the request uses the model chosen by the router"""
+        self.router.record("big-model", "monthly_breakdowns", 2.0)
+        with patch('openai.chat.completions.create', return_value=openai_response(MONTHS)) as mock_create:
+            breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+        self.assertEqual(mock_create.call_args.kwargs["model"], "fast-model")
+        self.assertLessEqual(mock_create.call_args.kwargs["timeout"], 0.5)
+        self.assertEqual(breakdowns[0]["description"], "Step 1")
+        self.assertIsNotNone(self.router.estimate("fast-model", "monthly_breakdowns"))
+
+    def test_local_plan_when_no_model_fits(self):
+        """Test that goal creation gets the local plan without a request when every model is too slow"""
+        for model in ("big-model", "fast-model"):
+            self.router.record(model, "monthly_breakdowns", 2.0)
+        before = metrics.AI_ROUTES.value(operation="monthly_breakdowns", model="local")
+        with patch('openai.chat.completions.create') as mock_create:
+            breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+        mock_create.assert_not_called()
+        self.assertEqual([b["description"] for b in breakdowns],
+                         [plan_year("Run", "Run a marathon", 2025)[month] for month in range(1, 13)])
+        self.assertEqual(metrics.AI_ROUTES.value(operation="monthly_breakdowns", model="local"), before + 1)
+
+    def test_timed_out_request_is_recorded(self):
+        """Test that a cancelled request counts as slow for its model"""
+        timeout = openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        with patch('openai.chat.completions.create', side_effect=timeout):
+            breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+        self.assertTrue(all(b["placeholder"] for b in breakdowns))
+        self.assertIsNotNone(self.router.estimate("big-model", "monthly_breakdowns"))
+
+    def test_timeout_falls_back_within_slo(self):
+        """Test that a request running into its timeout is given up once and the local plan arrives within the SLO"""
+        def slow_create(**kwargs):
+            # Like the SDK: wait out the timeout, then give up
+            time.sleep(kwargs["timeout"])
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        start = time.monotonic()
+        with patch('openai.chat.completions.create', side_effect=slow_create) as mock_create:
+            breakdowns = self.ai_service.generate_monthly_breakdowns("Run", "Run a marathon", 2025)
+        elapsed = time.monotonic() - start
+        self.assertLess(elapsed, self.router.slos["breakdowns"] + 0.2)
+        mock_create.assert_called_once()
+        self.assertEqual([b["description"] for b in breakdowns],
+                         [plan_year("Run", "Run a marathon", 2025)[month] for month in range(1, 13)])
+        # One sample for the one attempt, as long as the attempt itself
+        self.assertEqual(len(self.router._history[("big-model", "monthly_breakdowns")]), 1)
+        self.assertLessEqual(self.router.estimate("big-model", "monthly_breakdowns"), elapsed)
+
+class TestLocalPlanner(unittest.TestCase):
+    """Test the rule-based fallback planner"""
+
+    def test_plan_covers_every_step(self):
+        """Test that the plan has twelve months and places each step of the description"""
+        description = "Finish the beginner course. Take weekly lessons with a tutor, then read a novel; pass the B1 exam"
+        steps = split_steps(description)
+        self.assertEqual(steps, ["finish the beginner course", "take weekly lessons with a tutor",
+                                 "read a novel", "pass the B1 exam"])
+        plan = plan_year("Learn Spanish", description, 2025)
+        self.assertEqual(sorted(plan), list(range(1, 13)))
+        text = " ".join(plan.values())
+        for step in steps:
+            self.assertIn(step, text)
+        self.assertIn("2026", plan[12])
+        self.assertEqual(plan, plan_year("Learn Spanish", description, 2025))
+
+    def test_plan_without_description(self):
+        """Test that a goal without a description still gets a full plan"""
+        plan = plan_year("Run", "", 2025)
+        self.assertTrue(all(plan[month] for month in range(1, 13)))
+
+if __name__ == "__main__":
+    unittest.main()
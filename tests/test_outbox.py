@@ -0,0 +1,163 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from database import Database, QueryError
+import outbox as outbox_module
+from outbox import Outbox, OutboxDatabase
+from mock_servers import MockGibsonServer
+
+class TestOutbox(unittest.TestCase):
+    """Test the write-ahead outbox against the mock Gibson AI server"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.gibson = MockGibsonServer().start()
+        cls.db = Database()
+        cls.db.endpoint = cls.gibson.endpoint
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.gibson.stop()
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        user_uuid = self.db.create_user(f"outbox_{os.path.basename(self.directory)}", "hashed")
+        self.goal_uuid = self.db.create_goal(user_uuid, "Outbox goal", "Description", 2025)
+        self.breakdown_uuids = [self.db.create_monthly_breakdown(self.goal_uuid, month, f"Month {month}")
+                                for month in (1, 2)]
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def make_outbox(self, db=None, **kwargs):
+        return Outbox(db or self.db, self.directory, fsync=False, **kwargs)
+    
+    def test_writes_are_acknowledged_then_replayed(self):
+        """Test that journaled writes are visible through the overlay at once and reach the database on flush"""
+        outbox = self.make_outbox()
+        db = OutboxDatabase(self.db, outbox)
+        db.update_monthly_breakdown(self.breakdown_uuids[0], status="ahead")
+        db.update_monthly_breakdown(self.breakdown_uuids[0], status="behind")
+        db.update_monthly_breakdown(self.breakdown_uuids[1], description="New plan")
+        feedback_uuid = db.create_feedback(self.goal_uuid, "Keep going", "affirm", fingerprint="abc")
+        
+        # Nothing has reached the database yet, but reads see the writes
+        self.assertEqual(self.db.get_monthly_breakdowns(self.goal_uuid)[0]['status'], "not_started")
+        breakdowns = db.get_monthly_breakdowns(self.goal_uuid)
+        self.assertEqual(breakdowns[0]['status'], "behind")
+        self.assertEqual(breakdowns[1]['description'], "New plan")
+        self.assertEqual(db.get_feedback_by_fingerprint(self.goal_uuid, "abc")['uuid'], feedback_uuid)
+        
+        queries = self.gibson.requests
+        self.assertTrue(outbox.flush())
+        # One UPDATE for both breakdowns and one feedback insert
+        self.assertEqual(self.gibson.requests - queries, 2)
+        self.assertEqual(outbox.pending_count(), 0)
+        breakdowns = self.db.get_monthly_breakdowns(self.goal_uuid)
+        self.assertEqual([b['status'] for b in breakdowns], ["behind", "not_started"])
+        self.assertEqual(breakdowns[1]['description'], "New plan")
+        self.assertEqual([f['uuid'] for f in db.get_feedback_for_goal(self.goal_uuid)], [feedback_uuid])
+        self.assertEqual(os.path.getsize(outbox.journal_path), 0)
+        outbox.close()
+        print("Outbox replay test passed!")
+    
+    def test_recovery_after_crash(self):
+        """Test that unreplayed writes survive a restart, a torn last line is dropped and replays are idempotent"""
+        unreachable = MagicMock()
+        unreachable.update_rows.side_effect = QueryError("Database query error: connection refused")
+        outbox = self.make_outbox(db=unreachable)
+        outbox.update_monthly_breakdown(self.breakdown_uuids[0], status="on_track")
+        outbox.create_feedback(self.goal_uuid, "Nice", "affirm")
+        self.assertFalse(outbox.flush())
+        self.assertEqual(outbox.pending_count(), 2)
+        outbox.close()
+        with open(os.path.join(self.directory, "journal.jsonl"), "a") as f:
+            f.write('{"seq": 3, "op": "upd')
+        
+        recovered = self.make_outbox()
+        self.assertEqual(recovered.pending_count(), 2)
+        entries = recovered.pending_entries()
+        # Simulate a crash after the replay but before the checkpoint
+        recovered._apply(entries)
+        self.assertTrue(recovered.flush())
+        self.assertEqual(self.db.get_monthly_breakdowns(self.goal_uuid)[0]['status'], "on_track")
+        self.assertEqual(len(self.db.get_feedback_for_goal(self.goal_uuid)), 1)
+        
+        # The next write continues the sequence
+        self.assertEqual(recovered.record("update_goal", goal_uuid=self.goal_uuid, status="behind")["seq"], 3)
+        recovered.close()
+        self.assertEqual(self.db.get_goal_by_uuid(self.goal_uuid)['status'], "behind")
+        print("Outbox recovery test passed!")
+    
+    def test_rejected_write_is_dead_lettered(self):
+        """Test that a write the database keeps rejecting is moved aside without blocking later writes"""
+        def update_rows(table, updates):
+            if table == "goal" and updates:
+                raise QueryError("Database query error: 400 Client Error - invalid value", status=400)
+            self.db.update_rows(table, updates)
+        rejecting = MagicMock(wraps=self.db)
+        rejecting.update_rows.side_effect = update_rows
+        
+        outbox = self.make_outbox(db=rejecting, max_attempts=2)
+        outbox.update_monthly_breakdown(self.breakdown_uuids[0], status="ahead")
+        outbox.update_goal(self.goal_uuid, status="behind")
+        outbox.update_monthly_breakdown(self.breakdown_uuids[1], status="ahead")
+        
+        self.assertFalse(outbox.flush())
+        self.assertTrue(outbox.flush())
+        self.assertEqual(outbox.pending_count(), 0)
+        self.assertEqual([b['status'] for b in self.db.get_monthly_breakdowns(self.goal_uuid)], ["ahead", "ahead"])
+        with open(outbox.failed_path) as f:
+            failed = [json.loads(line) for line in f]
+        self.assertEqual([entry['op'] for entry in failed], ["update_goal"])
+        outbox.close()
+        print("Outbox dead letter test passed!")
+
+    def test_second_process_journals_to_own_directory(self):
+        """Test that an outbox finding the directory locked journals apart and its leftovers are replayed later"""
+        owner = self.make_outbox()
+        unreachable = MagicMock()
+        unreachable.update_rows.side_effect = QueryError("Database query error: connection refused")
+        # flock locks conflict between open files of one process too, so this stands in for a second process
+        other = self.make_outbox(db=unreachable)
+        self.assertEqual(other.directory, os.path.join(self.directory, f"pid-{os.getpid()}"))
+        with self.assertRaises(RuntimeError):
+            self.make_outbox()
+        
+        other.update_monthly_breakdown(self.breakdown_uuids[0], status="ahead")
+        owner.update_monthly_breakdown(self.breakdown_uuids[1], status="behind")
+        self.assertEqual(owner.pending_count(), 1)
+        # Still running: its journal is left alone
+        self.assertEqual(owner.adopt_orphans(), 0)
+        other.close()
+        self.assertEqual(other.pending_count(), 1)
+        
+        self.assertEqual(owner.adopt_orphans(), 1)
+        self.assertFalse(os.path.exists(other.directory))
+        self.assertTrue(owner.flush())
+        owner.close()
+        self.assertEqual([b['status'] for b in self.db.get_monthly_breakdowns(self.goal_uuid)], ["ahead", "behind"])
+        print("Outbox directory lock test passed!")
+
+    def test_outbox_without_lock_support(self):
+        """Test that the outbox journals and replays without a directory lock where fcntl is missing (Windows)"""
+        with patch.object(outbox_module, "fcntl", None):
+            outbox = self.make_outbox()
+            self.assertEqual(outbox.directory, self.directory)
+            outbox.update_monthly_breakdown(self.breakdown_uuids[0], status="ahead")
+            self.assertTrue(outbox.flush())
+            outbox.close()
+        self.assertEqual(self.db.get_monthly_breakdowns(self.goal_uuid)[0]['status'], "ahead")
+        print("Outbox without lock files test passed!")
+
+if __name__ == '__main__':
+    unittest.main()
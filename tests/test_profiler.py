@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+import tempfile
+import contextvars
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiler
+
+def busy_work(seconds):
+    """Spin the CPU for a while so the sampler has something to see"""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+class TestProfiler(unittest.TestCase):
+    """Test the opt-in sampling profiler"""
+    
+    def test_disabled_by_default(self):
+        """Test that profiled blocks are not sampled unless profiling is enabled"""
+        with tempfile.TemporaryDirectory() as directory:
+            with patch("config.PROFILE_DIR", directory), patch("config.PROFILE_ENABLED", False):
+                with profiler.profile("rerun"):
+                    busy_work(0.05)
+                self.assertEqual(os.listdir(directory), [])
+        
+        print("Profiler disabled test passed!")
+    
+    def test_profile_writes_collapsed_stacks(self):
+        """Test that an enabled session writes a rotating collapsed-stack file and a hot function summary"""
+        def run():
+            profiler.set_session_profiling(True)
+            for _ in range(3):
+                with profiler.profile("rerun"):
+                    # Nested profiled blocks share the outer profile
+                    with profiler.profile("goals.create_goal"):
+                        busy_work(0.1)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            with patch("config.PROFILE_DIR", directory), patch("config.PROFILE_KEEP_FILES", 2):
+                contextvars.copy_context().run(run)
+                files = sorted(os.listdir(directory))
+                self.assertEqual(len(files), 2)
+                self.assertTrue(all(name.endswith("-rerun.folded") for name in files))
+                with open(os.path.join(directory, files[-1])) as f:
+                    line = f.readline().strip()
+            
+        stack, count = line.rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn("run (test_profiler.py", stack)
+        self.assertIn(";busy_work (test_profiler.py", stack)
+        self.assertFalse(profiler.is_enabled())
+        
+        hot = profiler.hot_functions(5)
+        self.assertTrue(any(function.startswith("busy_work") for function, samples, share in hot))
+        
+        print("Collapsed stack profile test passed!")
+    
+    def test_session_lookup_and_per_session_summary(self):
+        """Test that a session found by the lookup is profiled and sees only its own hot functions"""
+        def other_work(seconds):
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+        
+        sessions = {"current": "alice"}
+        profiler.set_session_lookup(lambda: sessions["current"])
+        self.addCleanup(profiler.set_session_lookup, None)
+        with tempfile.TemporaryDirectory() as directory:
+            with patch("config.PROFILE_DIR", directory), patch("config.PROFILE_ENABLED", False):
+                # No context flag is set, as in a Streamlit callback
+                self.assertTrue(profiler.is_enabled())
+                with profiler.profile("callback"):
+                    busy_work(0.1)
+                sessions["current"] = "bob"
+                with profiler.profile("callback"):
+                    other_work(0.1)
+                sessions["current"] = None
+                self.assertFalse(profiler.is_enabled())
+                with profiler.profile("callback"):
+                    busy_work(0.05)
+                self.assertEqual(len(os.listdir(directory)), 2)
+        
+        alice = [function for function, _, _ in profiler.hot_functions(10, session="alice")]
+        bob = [function for function, _, _ in profiler.hot_functions(10, session="bob")]
+        self.assertTrue(any(function.startswith("busy_work") for function in alice))
+        self.assertFalse(any(function.startswith("other_work") for function in alice))
+        self.assertTrue(any(function.startswith("other_work") for function in bob))
+        self.assertFalse(any(function.startswith("busy_work") for function in bob))
+        self.assertEqual(profiler.hot_functions(10, session="carol"), [])
+        
+        print("Per-session profiling test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens, summarize_progress
+from ai_service import AIService
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test prompt token budgeting and compaction"""
+    
+    def test_truncate_to_tokens(self):
+        """Test that truncated text stays within its budget"""
+        text = "practice conversational Spanish every single day " * 50
+        self.assertGreater(count_tokens(text), 100)
+        
+        truncated = truncate_to_tokens(text, 100)
+        self.assertLessEqual(count_tokens(truncated), 100)
+        self.assertTrue(truncated.endswith("…"))
+        
+        # Short text is left untouched
+        self.assertEqual(truncate_to_tokens("Run a marathon", 100), "Run a marathon")
+        
+        print("Token truncation test passed!")
+    
+    def test_template_is_dedented(self):
+        """Test that template indentation is stripped before filling"""
+        builder = PromptBuilder("""
+            Goal: {goal_title}
+            Description: {goal_description}
+        """)
+        builder.add("goal_title", "Learn Spanish")
+        builder.add("goal_description", "word " * 500, max_tokens=20)
+        prompt = builder.build()
+        
+        self.assertTrue(prompt.startswith("Goal: Learn Spanish\nDescription: "))
+        self.assertLessEqual(builder.usage["goal_description"], 20)
+        self.assertEqual(builder.usage["total"], count_tokens(prompt))
+        
+        print("Template dedent test passed!")
+    
+    def test_summarize_progress_compacts_older_months(self):
+        """Test that older months are compacted when the progress section is over budget"""
+        breakdowns = [
+            {"month": m, "description": f"Very detailed plan for month {m} " * 40, "status": "on_track"}
+            for m in range(1, 13)
+        ]
+        
+        summary = summarize_progress(breakdowns, 10, max_tokens=300, recent_months=3)
+        self.assertLessEqual(count_tokens(summary), 300)
+        self.assertIn("Earlier months (status only): Month 1 on_track", summary)
+        self.assertIn("Month 10: Very detailed plan for month 10", summary)
+        self.assertNotIn("Month 11", summary)
+        
+        # Everything is kept when it fits
+        short = [{"month": 1, "description": "Start", "status": "ahead"}]
+        self.assertEqual(summarize_progress(short, 1, max_tokens=300), "Month 1: Start - Status: ahead")
+        
+        print("Progress summary compaction test passed!")
+    
+    def test_summarize_progress_keeps_one_month_per_line(self):
+        """Test that a budget too small for the compacted summary shortens lines without joining them"""
+        breakdowns = [{"month": m, "description": f"Plan for month {m}", "status": "on_track"} for m in range(1, 13)]
+        summary = summarize_progress(breakdowns, 12, max_tokens=60, recent_months=3)
+        self.assertLessEqual(count_tokens(summary), 60)
+        lines = summary.split("\n")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("Earlier months (status only):"))
+        self.assertTrue(lines[0].endswith("…"))
+        self.assertEqual([line.split(":")[0] for line in lines[1:]], ["Month 10", "Month 11", "Month 12"])
+        
+        print("Progress summary line test passed!")
+    
+    @patch('openai.chat.completions.create')
+    def test_ai_service_reports_token_usage(self, mock_create):
+        """Test that long descriptions are capped and token usage is reported per call"""
+        ai_service = AIService("test_api_key")
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = '{"months": [{"month": 1, "description": "Start"}]}'
+        mock_response.usage.prompt_tokens = 321
+        mock_create.return_value = mock_response
+        
+        ai_service.generate_monthly_breakdowns("Test Goal", "very long description " * 2000, 2025)
+        
+        args, kwargs = mock_create.call_args
+        prompt = kwargs["messages"][1]["content"]
+        self.assertTrue(prompt.startswith("I'm planning to achieve the following goal in 2025:"))
+        usage = ai_service.token_usage["monthly_breakdowns"]
+        self.assertLessEqual(usage["goal_description_tokens"], 400)
+        self.assertEqual(usage["reported_prompt_tokens"], 321)
+        
+        print("AI service token usage test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import Auth
+from goals import GoalManager
+from tests.fakes import FakeAIService, FakeDatabase, budget
+
+class TestQueryBudgets(unittest.TestCase):
+    """Test the database round trips and AI calls each operation may take"""
+
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.ai_service = FakeAIService()
+        self.auth = Auth(db=self.db)
+        self.goal_manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service,
+                                        prefetch_feedback=False)
+        self.user_uuid = self.db.create_user("budget_user", self.auth.hash_password("password123"))
+
+    def _goals(self, count):
+        return [self.goal_manager.create_goal(self.user_uuid, f"Goal {n}", "Run three times a week", 2025)
+                for n in range(count)]
+
+    def test_auth(self):
+        """Test that registering takes two queries and logging in one"""
+        with budget(self.db, queries=2):
+            success, _ = self.auth.register_user("new_user", "password123")
+        self.assertTrue(success)
+        with budget(self.db, queries=1):
+            success, user_uuid = self.auth.login_user("budget_user", "password123")
+        self.assertEqual(user_uuid, self.user_uuid)
+
+    def test_create_goal(self):
+        """Test that a goal and its twelve months are saved with three queries and one AI call"""
+        with budget(self.db, queries=3, ai=self.ai_service, ai_calls=1):
+            goal_uuid = self.goal_manager.create_goal(self.user_uuid, "Run", "Run a marathon", 2025)
+        self.assertEqual(len(self.db.get_monthly_breakdowns(goal_uuid)), 12)
+
+    def test_get_user_goals_does_not_grow_with_goals(self):
+        """Test that a user's goals load with three queries however many goals there are"""
+        for count in (2, 10):
+            with self.subTest(goals=count):
+                self.setUp()
+                goal_uuids = self._goals(count)
+                self.db.create_feedback(goal_uuids[0], "Keep going", "affirm")
+                with budget(self.db, queries=3):
+                    goals = self.goal_manager.get_user_goals(self.user_uuid)
+                self.assertEqual(len(goals), count)
+                self.assertTrue(all([b['month'] for b in goal['monthly_breakdowns']] == list(range(1, 13))
+                                    for goal in goals))
+                self.assertEqual(sum(len(goal['feedback']) for goal in goals), 1)
+
+    def test_get_user_goals_without_goals(self):
+        """Test that a user without goals costs the goal query and the user check"""
+        with budget(self.db, queries=2):
+            self.assertEqual(self.goal_manager.get_user_goals(self.user_uuid), [])
+
+    def test_update_monthly_breakdown(self):
+        """Test that a status change is one query"""
+        goal_uuid = self._goals(1)[0]
+        breakdown_uuid = self.db.get_monthly_breakdowns(goal_uuid)[0]['uuid']
+        with budget(self.db, queries=1):
+            self.assertTrue(self.goal_manager.update_monthly_breakdown(breakdown_uuid, status="ahead"))
+
+    def test_generate_feedback(self):
+        """Test that new feedback takes four queries and one AI call, and unchanged progress three and none"""
+        goal_uuid = self._goals(1)[0]
+        with budget(self.db, queries=4, ai=self.ai_service, ai_calls=1):
+            feedback = self.goal_manager.generate_feedback(goal_uuid)
+        self.assertEqual(feedback['feedback_type'], "double_down")
+        with budget(self.db, queries=3, ai=self.ai_service, ai_calls=0):
+            self.assertEqual(self.goal_manager.generate_feedback(goal_uuid)['feedback_text'], feedback['feedback_text'])
+
+    def test_budget_reports_the_queries(self):
+        """Test that an exceeded budget fails with the queries that were made"""
+        with self.assertRaises(AssertionError) as context:
+            with budget(self.db, queries=0):
+                self.db.get_user_by_username("budget_user")
+        self.assertIn("1 queries, budget 0", str(context.exception))
+        self.assertIn("FROM `user_profile`", str(context.exception))
+
+if __name__ == "__main__":
+    unittest.main()
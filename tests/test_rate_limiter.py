@@ -0,0 +1,111 @@
+import sys
+import os
+import time
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+from rate_limiter import RateLimiter, RateLimitExceeded, INTERACTIVE, WRITE, BACKGROUND
+from ai_service import AIService
+from goals import GoalManager
+from tests.fakes import FakeDatabase
+
+def make_limiter(rate_per_second=1000.0, burst=1, max_concurrent=1, max_wait=2.0, max_queue=10):
+    max_waits = {INTERACTIVE: max_wait, WRITE: max_wait, BACKGROUND: max_wait}
+    return RateLimiter("test", rate_per_second, burst, max_concurrent, max_waits, max_queue)
+
+class TestRateLimiter(unittest.TestCase):
+    """Test the priority-aware rate limiter"""
+    
+    def test_waiters_are_admitted_by_priority(self):
+        """Test that a queued interactive call goes before earlier background and write calls"""
+        limiter = make_limiter()
+        limiter.acquire(INTERACTIVE)
+        
+        order = []
+        def worker(priority):
+            with limiter.limit(priority):
+                order.append(priority)
+        
+        threads = []
+        for priority in (BACKGROUND, WRITE, INTERACTIVE):
+            thread = threading.Thread(target=worker, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+        
+        limiter.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [INTERACTIVE, WRITE, BACKGROUND])
+        
+        print("Priority admission test passed!")
+    
+    def test_bounded_wait_sheds_load(self):
+        """Test that a call which cannot get a token in time is rejected"""
+        limiter = make_limiter(rate_per_second=0.01, burst=1, max_concurrent=5)
+        limiter.acquire(INTERACTIVE)
+        limiter.release()
+        
+        start = time.monotonic()
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire(BACKGROUND, timeout=0.1)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(limiter._waiters, [])
+        
+        print("Bounded wait test passed!")
+    
+    def test_full_queue_rejects_immediately(self):
+        """Test that new calls are rejected when the wait queue is full"""
+        limiter = make_limiter(max_queue=0)
+        with self.assertRaises(RateLimitExceeded) as context:
+            limiter.acquire(WRITE)
+        self.assertIn("overloaded", str(context.exception))
+        
+        print("Queue limit test passed!")
+    
+    def test_priority_scope(self):
+        """Test that priority() sets the default class for enclosed calls"""
+        self.assertEqual(rate_limiter.current_priority(), INTERACTIVE)
+        with rate_limiter.priority(BACKGROUND):
+            self.assertEqual(rate_limiter.current_priority(), BACKGROUND)
+        self.assertEqual(rate_limiter.current_priority(WRITE), WRITE)
+        
+        print("Priority scope test passed!")
+
+class TestRateLimitedAI(unittest.TestCase):
+    """Test that AI calls shed by the rate limiter surface as errors instead of degraded answers"""
+    
+    def setUp(self):
+        self.ai_service = AIService("test_api_key")
+        self.limiter = make_limiter(max_queue=0)
+        patcher = patch('rate_limiter.get_limiter', return_value=self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_rejected_breakdowns_raise(self):
+        """Test that goal creation fails with RateLimitExceeded and saves nothing"""
+        db = FakeDatabase()
+        user_uuid = db.create_user("limited_user", "hashed")
+        goal_manager = GoalManager("test_api_key", db=db, ai_service=self.ai_service, prefetch_feedback=False)
+        with patch('openai.chat.completions.create') as mock_create:
+            with self.assertRaises(RateLimitExceeded):
+                goal_manager.create_goal(user_uuid, "Run", "Run a marathon", 2025)
+        mock_create.assert_not_called()
+        self.assertEqual(db.get_goals_by_user_uuid(user_uuid), [])
+        
+        print("Rate-limited goal creation test passed!")
+    
+    def test_rejected_feedback_raises(self):
+        """Test that feedback generation raises rather than returning the generic fallback"""
+        with self.assertRaises(RateLimitExceeded):
+            self.ai_service.generate_goal_feedback("Run", "Run a marathon", [], 1)
+        
+        print("Rate-limited feedback test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import datetime
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fcntl
+from goals import GoalManager
+from scheduler import FeedbackScheduler, covered_years, parse_schedule, last_slot, next_slot
+from sqlite_backend import SQLiteDatabase
+
+class TestSchedule(unittest.TestCase):
+    """Test parsing of schedules and the times they give"""
+
+    def test_monthly_schedule(self):
+        """Test monthly slots, with late days clamped to the end of shorter months"""
+        schedule = parse_schedule("monthly 31 03:00")
+        self.assertEqual(last_slot(schedule, datetime.datetime(2025, 3, 10)), datetime.datetime(2025, 2, 28, 3, 0))
+        self.assertEqual(next_slot(schedule, datetime.datetime(2025, 3, 10)), datetime.datetime(2025, 3, 31, 3, 0))
+        self.assertEqual(last_slot(parse_schedule("monthly 1 03:00"), datetime.datetime(2025, 1, 1, 2, 0)),
+                         datetime.datetime(2024, 12, 1, 3, 0))
+
+    def test_daily_schedule(self):
+        """Test daily slots before and after the time of day"""
+        schedule = parse_schedule("daily 02:30")
+        self.assertEqual(last_slot(schedule, datetime.datetime(2025, 5, 2, 1, 0)), datetime.datetime(2025, 5, 1, 2, 30))
+        self.assertEqual(next_slot(schedule, datetime.datetime(2025, 5, 2, 3, 0)), datetime.datetime(2025, 5, 3, 2, 30))
+
+    def test_invalid_and_disabled(self):
+        """Test that "off" disables the schedule and malformed ones are rejected"""
+        self.assertIsNone(parse_schedule("off"))
+        self.assertIsNone(parse_schedule(""))
+        for spec in ("weekly 03:00", "monthly 0 03:00", "daily 25:00"):
+            with self.assertRaises(ValueError):
+                parse_schedule(spec)
+
+class TestFeedbackScheduler(unittest.TestCase):
+    """Test scheduled feedback runs"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db = SQLiteDatabase()
+        user_uuid = self.db.create_user("scheduled_user", "hashed")
+        year = datetime.datetime.now().year
+        self.active = [self.db.create_goal(user_uuid, f"Goal {n}", "Description", year) for n in range(3)]
+        self.old = self.db.create_goal(user_uuid, "Old goal", "Description", year - 1)
+        self.ai_service = MagicMock()
+        self.ai_service.generate_goal_feedback.return_value = {"feedback_text": "Nice work", "feedback_type": "affirm"}
+        self.manager = GoalManager("test_api_key", db=self.db, ai_service=self.ai_service, prefetch_feedback=False)
+        self.scheduler = FeedbackScheduler(self.manager, self.directory.name, "daily 03:00", page_size=2)
+        self.now = datetime.datetime.combine(datetime.date.today(), datetime.time(3, 30))
+
+    def test_run_covers_active_goals_once(self):
+        """Test that a due slot generates and saves feedback for each active goal, and runs only once"""
+        counts = self.scheduler.run_due(self.now)
+
+        self.assertEqual(counts, {"ok": 3, "fallback": 0, "error": 0})
+        for goal_uuid in self.active:
+            self.assertEqual(self.db.get_feedback_for_goal(goal_uuid)[0]["feedback_text"], "Nice work")
+        self.assertEqual(self.db.get_feedback_for_goal(self.old), [])
+        self.assertIsNone(self.scheduler.run_due(self.now + datetime.timedelta(minutes=5)))
+        self.assertEqual(self.ai_service.generate_goal_feedback.call_count, 3)
+
+    def test_january_run_covers_the_year_just_ended(self):
+        """Test that the monthly run on January 1 also reviews the goals of the year before"""
+        scheduler = FeedbackScheduler(self.manager, self.directory.name, "monthly 1 03:00", page_size=2)
+        year = datetime.datetime.now().year
+        counts = scheduler.run_due(datetime.datetime(year, 1, 1, 3, 30))
+        self.assertEqual(counts, {"ok": 4, "fallback": 0, "error": 0})
+        self.assertEqual(self.db.get_feedback_for_goal(self.old)[0]["feedback_text"], "Nice work")
+        self.assertEqual(covered_years(scheduler.schedule, datetime.datetime(year, 2, 1, 3)), {year})
+        self.assertEqual(covered_years(scheduler.schedule, datetime.datetime(year, 1, 15, 3)), {year - 1, year})
+
+    def test_missed_slot_is_not_caught_up_too_late(self):
+        """Test that a slot older than the catch-up window is skipped"""
+        self.scheduler.catch_up_seconds = 600
+        self.assertIsNone(self.scheduler.run_due(self.now + datetime.timedelta(hours=2)))
+        self.ai_service.generate_goal_feedback.assert_not_called()
+
+    def test_only_the_leader_runs(self):
+        """Test that a replica that cannot take the lock file does not run the slot"""
+        with open(self.scheduler.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.assertIsNone(self.scheduler.run_due(self.now))
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self.ai_service.generate_goal_feedback.assert_not_called()
+        self.assertEqual(self.scheduler.due_slot(self.now), self.now.replace(minute=0))
+
+if __name__ == "__main__":
+    unittest.main()
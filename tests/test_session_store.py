@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from session_store import SessionStore, deep_size
+
+def _goals(count, text_size=1000):
+    return [{"uuid": f"goal-{g}", "monthly_breakdowns": [{"month": m, "description": "x" * text_size}
+                                                        for m in range(1, 13)]} for g in range(count)]
+
+class TestSessionStore(unittest.TestCase):
+    """Test the process-wide per-session data store"""
+
+    def test_deep_size_counts_nested_data(self):
+        """Test that the size estimate grows with nested content"""
+        self.assertGreater(deep_size(_goals(2)), deep_size(_goals(1)))
+        self.assertGreater(deep_size(_goals(1)), 12 * 1000)
+
+    def test_budget_evicts_least_recently_used(self):
+        """Test that the least recently used session is evicted when the store is over budget"""
+        goals = _goals(1)
+        store = SessionStore(max_bytes=int(deep_size(goals) * 2.5))
+        store.set("a", "goals", goals)
+        store.set("b", "goals", _goals(1))
+        store.get("a", "goals")
+        before = metrics.SESSION_STORE_EVICTIONS.value(reason="budget")
+
+        store.set("c", "goals", _goals(1))
+
+        self.assertEqual(set(store.stats()["per_session"]), {"a", "c"})
+        self.assertLessEqual(store.stats()["bytes"], store.max_bytes)
+        self.assertEqual(metrics.SESSION_STORE_EVICTIONS.value(reason="budget"), before + 1)
+
+    def test_idle_sessions_are_dropped(self):
+        """Test that sessions idle for longer than idle_seconds are dropped on the next write"""
+        store = SessionStore(max_bytes=10 ** 9, idle_seconds=0.05)
+        store.set("idle", "goals", _goals(1))
+        time.sleep(0.1)
+        store.set("active", "goals", _goals(1))
+        self.assertEqual(store.stats()["sessions"], 1)
+        self.assertEqual(store.session_bytes("idle"), 0)
+
+    def test_evicted_data_reloads_on_demand(self):
+        """Test that get() reloads evicted data with its loader and keeps it"""
+        store = SessionStore(max_bytes=10 ** 9, max_sessions=1)
+        loader = MagicMock(return_value=_goals(1))
+        store.set("a", "goals", _goals(1))
+        store.set("b", "goals", _goals(1))
+
+        self.assertEqual(store.get("a", "goals", loader=loader), loader.return_value)
+        self.assertEqual(store.get("a", "goals", loader=loader), loader.return_value)
+        loader.assert_called_once()
+        self.assertIsNone(store.get("b", "current_feedback"))
+
+    def test_update_and_drop(self):
+        """Test merging dict values and dropping a session's data"""
+        store = SessionStore(max_bytes=10 ** 9)
+        store.update("a", "debug_info", {"goals_loaded": 1})
+        store.update("a", "debug_info", {"load_error": "boom"})
+        self.assertEqual(store.get("a", "debug_info"), {"goals_loaded": 1, "load_error": "boom"})
+        size = store.session_bytes("a")
+        self.assertEqual(store.stats()["bytes"], size)
+        store.drop("a")
+        self.assertEqual(store.stats()["bytes"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_cache import SharedCache, CachedDatabase
+from sqlite_backend import SQLiteDatabase
+from ai_service import AIService
+
+class TestSharedCache(unittest.TestCase):
+    """Test the cross-process shared cache"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite3")
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_entries_expire(self):
+        """Test that entries are shared between instances on one file and expire after their TTL"""
+        writer = SharedCache(self.path)
+        reader = SharedCache(self.path)
+        writer.set("key", {"value": [1, 2]}, ttl=0.2)
+        self.assertEqual(reader.get("key"), {"value": [1, 2]})
+        time.sleep(0.3)
+        self.assertIsNone(reader.get("key"))
+        print("Shared cache TTL test passed!")
+    
+    def test_writes_invalidate_other_processes(self):
+        """Test that a write through one process's CachedDatabase invalidates the reads cached by another"""
+        db = SQLiteDatabase()
+        user_uuid = db.create_user("cached_user", "hashed")
+        goal_uuid = db.create_goal(user_uuid, "Goal", "Description", 2025)
+        breakdown_uuid = db.create_monthly_breakdown(goal_uuid, 1, "January")
+        
+        # Two workers sharing the database and the cache file
+        first = CachedDatabase(db, SharedCache(self.path))
+        second = CachedDatabase(db, SharedCache(self.path))
+        
+        self.assertEqual(first.get_monthly_breakdowns(goal_uuid)[0]['status'], "not_started")
+        queries = len(db.queries)
+        # Warm in the other worker too
+        self.assertEqual(second.get_monthly_breakdowns(goal_uuid)[0]['status'], "not_started")
+        self.assertEqual(len(db.queries), queries)
+        
+        second.update_monthly_breakdown(breakdown_uuid, status="ahead")
+        self.assertEqual(first.get_monthly_breakdowns(goal_uuid)[0]['status'], "ahead")
+        # Other tables stay cached
+        queries = len(db.queries)
+        first.get_goals_by_user_uuid(user_uuid)
+        first.get_goals_by_user_uuid(user_uuid)
+        # One query for the first read, none for the second
+        self.assertEqual(len(db.queries), queries + 1)
+        print("Cross-process invalidation test passed!")
+    
+    def test_writes_invalidate_only_their_entity(self):
+        """Test that a write bumps the versions of the goal it changes and leaves other goals cached"""
+        db = SQLiteDatabase()
+        user_uuid = db.create_user("cached_user", "hashed")
+        cached = CachedDatabase(db, SharedCache(self.path))
+        goal_uuids = [cached.create_goal(user_uuid, f"Goal {n}", "Description", 2025) for n in range(2)]
+        breakdown_uuid = cached.create_monthly_breakdown(goal_uuids[0], 1, "January")
+        cached.create_monthly_breakdown(goal_uuids[1], 1, "January")
+        for goal_uuid in goal_uuids:
+            cached.get_monthly_breakdowns(goal_uuid)
+            cached.get_feedback_for_goal(goal_uuid)
+        cached.get_goals_by_user_uuid(user_uuid)
+        
+        cached.update_monthly_breakdown(breakdown_uuid, status="ahead")
+        cached.create_feedback(goal_uuids[0], "Keep going", "affirm")
+        queries = len(db.queries)
+        self.assertEqual(cached.get_monthly_breakdowns(goal_uuids[1])[0]['status'], "not_started")
+        self.assertEqual(cached.get_feedback_for_goal(goal_uuids[1]), [])
+        cached.get_goals_by_user_uuid(user_uuid)
+        self.assertEqual(len(db.queries), queries)
+        self.assertEqual(cached.get_monthly_breakdowns(goal_uuids[0])[0]['status'], "ahead")
+        self.assertEqual(len(cached.get_feedback_for_goal(goal_uuids[0])), 1)
+        self.assertEqual(len(db.queries), queries + 2)
+        
+        # A goal update invalidates its owner's goal list
+        cached.update_goal(goal_uuids[1], title="Renamed")
+        self.assertIn("Renamed", [goal['title'] for goal in cached.get_goals_by_user_uuid(user_uuid)])
+        
+        # A write whose owner is not known (written by a process without the cache) bumps the whole table
+        other_breakdown = db.create_monthly_breakdown(goal_uuids[1], 2, "February")
+        cached.get_monthly_breakdowns(goal_uuids[0])
+        cached.update_rows("goal_monthly_breakdown", {other_breakdown: {"status": "behind"}})
+        queries = len(db.queries)
+        cached.get_monthly_breakdowns(goal_uuids[0])
+        self.assertEqual(len(db.queries), queries + 1)
+        print("Per-entity invalidation test passed!")
+    
+    @patch('openai.chat.completions.create')
+    def test_ai_results_are_shared(self, mock_create):
+        """Test that an AI result computed by one process is reused by another, and fallbacks are not cached"""
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = '{"feedback_text": "Good", "feedback_type": "affirm"}'
+        mock_create.return_value = mock_response
+        breakdowns = [{"month": 1, "status": "ahead", "description": "January"}]
+        
+        first = AIService("test_api_key", cache=SharedCache(self.path))
+        second = AIService("test_api_key", cache=SharedCache(self.path))
+        self.assertEqual(first.generate_goal_feedback("Goal", "Description", breakdowns, 1)["feedback_type"], "affirm")
+        self.assertEqual(second.generate_goal_feedback("Goal", "Description", breakdowns, 1)["feedback_text"], "Good")
+        self.assertEqual(mock_create.call_count, 1)
+        
+        mock_create.side_effect = Exception("API error")
+        self.assertTrue(first.generate_goal_feedback("Other", "Description", breakdowns, 1)["fallback"])
+        self.assertTrue(second.generate_goal_feedback("Other", "Description", breakdowns, 1)["fallback"])
+        self.assertEqual(mock_create.call_count, 3)
+        print("Shared AI result test passed!")
+
+if __name__ == '__main__':
+    unittest.main()
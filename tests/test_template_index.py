@@ -0,0 +1,134 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from goals import GoalManager
+from sqlite_backend import SQLiteDatabase
+import template_index
+from template_index import TemplateIndex, vectorize
+
+SPANISH = ("Learn Spanish", "I want to become conversational in Spanish by the end of the year")
+USER = "user-1"
+
+def _breakdowns(title, year):
+    return [{"month": month, "description": f"{title}: milestone {month} of {year}"} for month in range(1, 13)]
+
+class TestTemplateIndex(unittest.TestCase):
+    """Test the similarity index of monthly breakdown templates"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "templates.jsonl")
+
+    def test_vectorize_is_normalized_and_stable(self):
+        """Test that vectors are unit length and do not depend on case or stop words"""
+        vector = vectorize(*SPANISH)
+        self.assertAlmostEqual(float(vector @ vector), 1.0, places=5)
+        self.assertAlmostEqual(float(vector @ vectorize("learn spanish", "Become conversational in Spanish by the end of the year")), 1.0, places=5)
+        self.assertFalse(vectorize("", "the and of").any())
+
+    def test_lookup_adapts_similar_goal(self):
+        """Test that a near-identical goal reuses the stored breakdowns with its own title and year"""
+        index = TemplateIndex(self.path, threshold=0.9)
+        index.add(*SPANISH, 2025, _breakdowns("Learn Spanish", 2025), USER)
+
+        reused = index.lookup("learn spanish", "Become conversational in Spanish by the end of the year", 2026, USER)
+        self.assertEqual(reused[0]["description"], "learn spanish: milestone 1 of 2026")
+        self.assertIsNone(index.lookup("Learn French", "I want to become conversational in French by the end of the year", 2026, USER))
+        self.assertIsNone(index.lookup("Run a marathon", "Finish a marathon", 2026, USER))
+
+    def test_templates_are_scoped_to_their_user(self):
+        """Test that another user's template is only reused when sharing is switched on"""
+        for shared in (False, True):
+            with self.subTest(shared=shared):
+                index = TemplateIndex(threshold=0.9, shared=shared)
+                index.add(*SPANISH, 2025, _breakdowns("Learn Spanish", 2025), USER)
+                index.add("Run a marathon", "", 2025, _breakdowns("Run a marathon", 2025), "user-2")
+                self.assertEqual(index.lookup(*SPANISH, 2025, "user-2") is not None, shared)
+                self.assertIsNotNone(index.lookup(*SPANISH, 2025, USER))
+                self.assertEqual(index.lookup(*SPANISH, 2025) is not None, shared)
+
+    def test_index_is_shared_through_file(self):
+        """Test that templates added by one index are found by another on the same file"""
+        writer = TemplateIndex(self.path)
+        reader = TemplateIndex(self.path)
+        self.assertEqual(len(reader), 0)
+        writer.add(*SPANISH, 2025, _breakdowns("Learn Spanish", 2025), USER)
+        self.assertEqual(len(reader), 1)
+        self.assertIsNotNone(reader.lookup(*SPANISH, 2025, USER))
+
+    def test_max_entries(self):
+        """Test that only the most recent templates are kept"""
+        index = TemplateIndex(max_entries=2)
+        for title in ("Learn Spanish", "Run a marathon", "Read fifty books"):
+            index.add(title, "", 2025, _breakdowns(title, 2025), USER)
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.lookup("Learn Spanish", "", 2025, USER))
+        self.assertIsNotNone(index.lookup("Run a marathon", "", 2025, USER))
+
+    def test_file_is_compacted(self):
+        """Test that the file is rewritten with the kept entries and other processes reload it"""
+        writer = TemplateIndex(self.path, max_entries=3)
+        reader = TemplateIndex(self.path, max_entries=3)
+        titles = [f"Goal number {word}" for word in ("one", "two", "three", "four", "five", "six", "seven")]
+        for title in titles:
+            writer.add(title, "", 2025, _breakdowns(title, 2025), USER)
+        with open(self.path) as f:
+            lines = f.readlines()
+        # Compacted at six lines down to three, then one more appended
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(len(reader), 3)
+        self.assertIsNotNone(reader.lookup(titles[-1], "", 2025, USER))
+        self.assertIsNone(reader.lookup(titles[0], "", 2025, USER))
+
+    def test_file_without_lock_support(self):
+        """Test that the file is written and compacted without lock files where fcntl is missing (Windows)"""
+        with patch.object(template_index, "fcntl", None):
+            index = TemplateIndex(self.path, max_entries=1)
+            for title in ("Learn Spanish", "Run a marathon", "Read fifty books"):
+                index.add(title, "", 2025, _breakdowns(title, 2025), USER)
+            self.assertIsNotNone(TemplateIndex(self.path).lookup("Read fifty books", "", 2025, USER))
+
+class TestGoalManagerTemplates(unittest.TestCase):
+    """Test that GoalManager.create_goal reuses templates instead of calling the AI"""
+
+    def test_create_goal_reuses_template(self):
+        """Test that the second of two near-identical goals makes no AI call"""
+        db = SQLiteDatabase()
+        user_uuid = db.create_user("template_user", "hashed")
+        ai_service = MagicMock()
+        ai_service.generate_monthly_breakdowns.return_value = _breakdowns("Learn Spanish", 2025)
+        manager = GoalManager("test_api_key", db=db, ai_service=ai_service, prefetch_feedback=False,
+                              template_index=TemplateIndex(threshold=0.9))
+        hits = metrics.CACHE_REQUESTS.value(cache="goal_templates", result="hit")
+
+        manager.create_goal(user_uuid, *SPANISH, 2025)
+        goal_uuid = manager.create_goal(user_uuid, "learn spanish", SPANISH[1], 2025)
+
+        ai_service.generate_monthly_breakdowns.assert_called_once()
+        self.assertEqual(len(db.get_monthly_breakdowns(goal_uuid)), 12)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="goal_templates", result="hit"), hits + 1)
+
+    def test_placeholder_plans_are_not_stored(self):
+        """Test that breakdowns with placeholder months do not become templates"""
+        db = SQLiteDatabase()
+        user_uuid = db.create_user("template_placeholder", "hashed")
+        ai_service = MagicMock()
+        ai_service.generate_monthly_breakdowns.return_value = [
+            {"month": month, "description": f"Month {month} milestone", "placeholder": True} for month in range(1, 13)
+        ]
+        index = TemplateIndex()
+        manager = GoalManager("test_api_key", db=db, ai_service=ai_service, prefetch_feedback=False,
+                              template_index=index)
+        manager.create_goal(user_uuid, *SPANISH, 2025)
+        self.assertEqual(len(index), 0)
+
+if __name__ == "__main__":
+    unittest.main()
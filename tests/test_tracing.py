@@ -0,0 +1,132 @@
+import sys
+import os
+import json
+import tempfile
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from goals import GoalManager
+from outbox import Outbox
+from tests.fakes import FakeDatabase
+
+class TestTracing(unittest.TestCase):
+    """Test the tracing spans and trace export"""
+    
+    def setUp(self):
+        # Start from an empty collection on this thread
+        tracing.finish_rerun()
+    
+    def test_nested_spans_form_a_tree(self):
+        """Test that spans opened inside other spans become their children"""
+        with tracing.span("callback.create_goal"):
+            with tracing.span("goals.create_goal"):
+                with tracing.span("db.query", table="goal"):
+                    pass
+        with tracing.span("render"):
+            pass
+        
+        trace = tracing.finish_rerun("rerun")
+        names = [span["name"] for span in trace["spans"]]
+        self.assertEqual(names, ["callback.create_goal", "goals.create_goal", "db.query", "render"])
+        by_name = {span["name"]: span for span in trace["spans"]}
+        self.assertEqual(by_name["db.query"]["parent_id"], by_name["goals.create_goal"]["span_id"])
+        self.assertIsNone(by_name["render"]["parent_id"])
+        self.assertEqual(by_name["db.query"]["attributes"], {"table": "goal"})
+        self.assertIsNone(tracing.finish_rerun())
+        
+        print("Span tree test passed!")
+    
+    def test_spans_propagate_across_threads(self):
+        """Test that wrap() attaches spans opened on another thread to the current span"""
+        def work():
+            with tracing.span("llm.monthly_breakdowns"):
+                pass
+        
+        with tracing.span("goals.import"):
+            thread = threading.Thread(target=tracing.wrap(work))
+            thread.start()
+            thread.join()
+        
+        trace = tracing.finish_rerun("rerun")
+        child = trace["spans"][1]
+        self.assertEqual(child["name"], "llm.monthly_breakdowns")
+        self.assertEqual(child["parent_id"], trace["spans"][0]["span_id"])
+        self.assertNotEqual(child["thread"], trace["spans"][0]["thread"])
+        
+        print("Cross-thread propagation test passed!")
+    
+    def test_detached_work_links_to_its_origin(self):
+        """Test that background feedback queued by a status change is traced with a link to that change"""
+        db = MagicMock()
+        db.get_goal_by_uuid.return_value = {"id": 1, "uuid": "goal_uuid", "title": "Run", "description": ""}
+        db.get_monthly_breakdowns.return_value = [{"month": 1, "description": "January", "status": "ahead"}]
+        db.get_feedback_by_fingerprint.return_value = None
+        ai_service = MagicMock()
+        ai_service.generate_goal_feedback.return_value = {"feedback_text": "Nice", "feedback_type": "affirm"}
+        goal_manager = GoalManager("test_api_key", db=db, ai_service=ai_service, prefetch_feedback=True)
+        goal_manager.feedback_prefetcher.delay_seconds = 0.01
+        self.addCleanup(goal_manager.feedback_prefetcher.shutdown)
+        
+        with tracing.span("callback.update_status_callback") as origin:
+            goal_manager.update_monthly_breakdown("bd_uuid", status="ahead", goal_uuid="goal_uuid")
+        rerun = tracing.finish_rerun("rerun")
+        
+        deadline = time.time() + 2
+        while not db.create_feedback.called and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        traces = [trace for trace in tracing.recent_traces() if trace["name"] == "feedback_prefetch"]
+        self.assertTrue(traces)
+        root = traces[-1]["spans"][0]
+        # The link names the span that queued the job, inside the status change's trace
+        link = root["attributes"]["follows_from"]
+        queued_by = {span["span_id"]: span for span in rerun["spans"]}[link["span_id"]]
+        self.assertEqual(queued_by["name"], "goals.update_monthly_breakdown")
+        self.assertEqual(queued_by["parent_id"], origin.span_id)
+        self.assertIsNone(root["parent_id"])
+        
+        print("Detached propagation test passed!")
+    
+    def test_outbox_replay_links_to_writers(self):
+        """Test that the replay of journaled writes records the spans that made them"""
+        db = FakeDatabase()
+        user_uuid = db.create_user("traced_user", "hashed")
+        goal_uuid = db.create_goal(user_uuid, "Run", "Run a marathon", 2025)
+        with tempfile.TemporaryDirectory() as directory:
+            outbox = Outbox(db, directory)
+            with tracing.span("callback.update_goal") as origin:
+                outbox.update_goal(goal_uuid, status="ahead")
+            tracing.finish_rerun("rerun")
+            self.assertTrue(outbox.flush())
+            outbox.close()
+        flush = [trace for trace in tracing.recent_traces() if trace["name"] == "outbox_flush"][-1]
+        self.assertEqual(flush["spans"][0]["attributes"]["follows_from"][0]["span_id"], origin.span_id)
+        
+        print("Outbox replay link test passed!")
+    
+    def test_errors_and_jsonl_export(self):
+        """Test that failed spans record the error and traces export as JSON Lines"""
+        with self.assertRaises(ValueError):
+            with tracing.span("goals.generate_feedback"):
+                raise ValueError("boom")
+        trace = tracing.finish_rerun("rerun")
+        self.assertEqual(trace["spans"][0]["error"], "ValueError: boom")
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracing.export_jsonl([trace, trace], path)
+            with open(path) as f:
+                lines = f.readlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["trace_id"], trace["trace_id"])
+        
+        print("Trace error and export test passed!")
+
+if __name__ == "__main__":
+    unittest.main()
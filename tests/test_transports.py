@@ -0,0 +1,84 @@
+import sys
+import os
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+import transports
+from database import Database, QueryError
+from mock_servers import MockGibsonServer
+
+class TestTransports(unittest.TestCase):
+    """Test the Gibson AI query transports against the mock server"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gibson = MockGibsonServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.gibson.stop()
+
+    def _database(self, name, **options):
+        db = Database(transport=transports.create_transport(name, **options))
+        db.endpoint = self.gibson.endpoint
+        self.addCleanup(db.transport.close)
+        return db
+
+    def test_round_trip_with_each_transport(self):
+        """Test that both transports write and read the same rows, with gzip responses"""
+        for name in transports.TRANSPORTS:
+            with self.subTest(transport=name):
+                db = self._database(name, http2=False)
+                user_uuid = db.create_user(f"transport_{name}", "hashed")
+                goal_uuid = db.create_goal(user_uuid, "Transport goal", "x" * 2000, 2025)
+                before = self.gibson.bytes_sent
+                goal = db.get_goal_by_uuid(goal_uuid)
+                self.assertEqual(goal['description'], "x" * 2000)
+                # The 2 KB row arrives gzip-compressed
+                self.assertLess(self.gibson.bytes_sent - before, 1024)
+        print("Transport round trip test passed!")
+
+    def test_request_compression(self):
+        """Test that large request bodies are compressed and accepted by the server"""
+        body, headers = transports.encode_body({"query": "y" * 2000}, "gzip", min_bytes=1024)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), {"query": "y" * 2000})
+        _, headers = transports.encode_body({"query": "short"}, "gzip", min_bytes=1024)
+        self.assertNotIn("Content-Encoding", headers)
+
+        db = self._database("httpx", http2=False, request_encoding="gzip", compress_min_bytes=64)
+        user_uuid = db.create_user("transport_compressed", "hashed")
+        self.assertEqual(db.get_user_by_username("transport_compressed")['uuid'], user_uuid)
+
+    def test_errors_carry_status_and_detail(self):
+        """Test that a rejected query raises QueryError with the HTTP status and server detail"""
+        for name in transports.TRANSPORTS:
+            with self.subTest(transport=name):
+                db = self._database(name, http2=False)
+                with self.assertRaises(QueryError) as raised:
+                    db.execute_query("SELECT * FROM `no_such_table`")
+                self.assertEqual(raised.exception.status, 400)
+                self.assertIn("no_such_table", str(raised.exception))
+
+    def test_http2_falls_back_without_h2(self):
+        """Test that HTTP/2 is only used when the h2 package is installed"""
+        with patch.object(transports, "HTTP2_AVAILABLE", False):
+            transport = transports.create_transport("httpx", http2=True)
+        self.addCleanup(transport.close)
+        self.assertFalse(transport.http2)
+
+    def test_unknown_transport(self):
+        """Test that unknown transport names and encodings are rejected"""
+        with self.assertRaises(ValueError):
+            transports.create_transport("carrier_pigeon")
+        with self.assertRaises(ValueError):
+            transports.create_transport("requests", request_encoding="zstd")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from auth import Auth
+from goals import GoalManager
+from shared_cache import CachedDatabase, SharedCache
+from tests.fakes import FakeDatabase, budget
+from warmup import RecentUsers, WarmUp
+
+class TestWarmUp(unittest.TestCase):
+    """Test the start-up warm-up steps and readiness"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db = FakeDatabase()
+        self.auth = Auth(db=self.db)
+        self.ai_service = MagicMock()
+        self.goal_manager = GoalManager(
+            "test_api_key", db=CachedDatabase(self.db, SharedCache(os.path.join(self.directory.name, "cache.sqlite3"))),
+            ai_service=self.ai_service, prefetch_feedback=False
+        )
+        self.recent_users = RecentUsers(os.path.join(self.directory.name, "recent_users.json"))
+        self.user_uuid = self.db.create_user("recent_user", "hashed")
+        goal_uuid = self.db.create_goal(self.user_uuid, "Run", "Run a marathon", 2025)
+        self.db.create_monthly_breakdown(goal_uuid, 1, "January")
+        self.recent_users.note(self.user_uuid)
+
+    def _warmup(self, db=None):
+        return WarmUp(db or self.db, self.auth, self.goal_manager, recent_users=self.recent_users,
+                      imports=["json"], timeout=1.0)
+
+    def test_steps_warm_connections_and_cache(self):
+        """Test that every step runs and the goals of recent users are then read from the cache"""
+        warmup = self._warmup().start()
+        self.assertTrue(warmup.wait(5))
+        self.assertEqual({step: outcome for step, (outcome, _) in warmup.results.items()},
+                         {"imports": "ok", "gibson": "ok", "openai": "ok", "bcrypt": "ok", "goals": "ok"})
+        self.ai_service.openai.models.retrieve.assert_called_once()
+        self.assertEqual(metrics.WARMUP_READY.value(), 1)
+        self.assertIsNotNone(metrics.WARMUP_SECONDS.value(step="total", outcome="ok"))
+        with budget(self.db, queries=0):
+            goals = self.goal_manager.get_user_goals(self.user_uuid)
+        self.assertEqual(goals[0]['monthly_breakdowns'][0]['description'], "January")
+
+    def test_failed_step_does_not_block_readiness(self):
+        """Test that a step that fails is reported and the later steps still run"""
+        db = MagicMock()
+        db.execute_query.side_effect = Exception("Gibson AI is down")
+        warmup = self._warmup(db)
+        results = warmup.run()
+        self.assertEqual(results["gibson"][0], "error")
+        self.assertEqual(results["bcrypt"][0], "ok")
+        self.assertTrue(warmup.is_ready())
+        self.assertIsNotNone(metrics.WARMUP_SECONDS.value(step="total", outcome="partial"))
+
+    def test_ready_endpoint(self):
+        """Test that /ready answers 503 until the warm-up has finished"""
+        server = metrics.start_metrics_server(0, "127.0.0.1")
+        url = f"http://127.0.0.1:{server.server_address[1]}/ready"
+        warmup = self._warmup()
+        metrics.set_readiness_check(warmup.is_ready)
+        self.addCleanup(metrics.set_readiness_check, None)
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(url, timeout=5)
+        self.assertEqual(context.exception.code, 503)
+        warmup.run()
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertEqual(response.status, 200)
+
+class TestRecentUsers(unittest.TestCase):
+    """Test the list of recently logged-in users"""
+
+    def test_newest_first_and_bounded(self):
+        """Test that a login moves the user to the front and old users drop off"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "recent", "users.json")
+            recent_users = RecentUsers(path, max_users=2)
+            for user_uuid in ("a", "b", "a", "c"):
+                recent_users.note(user_uuid)
+            self.assertEqual(recent_users.load(), ["c", "a"])
+            with open(path, "w") as f:
+                json.dump({"not": "a list"}, f)
+            self.assertEqual(recent_users.load(), [])
+
+if __name__ == "__main__":
+    unittest.main()
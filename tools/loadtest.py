@@ -0,0 +1,359 @@
+"""Load test the Goal Tracker against local mock Gibson AI and OpenAI servers.
+
+Each simulated user signs up, logs in, creates two goals, toggles the status of
+a few months and requests feedback, with a think time between steps. Users are
+driven through Auth and GoalManager (the code path a rerun takes), or with
+--apptest through full Streamlit AppTest reruns of app.py. Users start evenly
+over the ramp-up period and all share one process, like sessions of one server.
+
+Passing several user counts (--users 5,10,20) runs one stage per count and
+reports where throughput stops growing: the saturation point.
+
+Usage: python tools/loadtest.py [--users 10] [--ramp-up 5] [--think-time 0.5]
+"""
+import os
+import math
+import sys
+import time
+import random
+import argparse
+import importlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import MockGibsonServer, MockOpenAIServer
+
+# A stage saturates when adding users raises throughput by less than this
+SATURATION_GAIN = 0.10
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class Recorder:
+    """Collect latencies and errors per operation from many threads"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+        self._lock = threading.Lock()
+
+    def measure(self, operation, function, *args, **kwargs):
+        """Run function, record its latency and return its result (None if it raised)"""
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            self.fail(operation, time.perf_counter() - start, f"{type(e).__name__}: {str(e)}")
+            return None
+        with self._lock:
+            self.latencies[operation].append(time.perf_counter() - start)
+        return result
+
+    def fail(self, operation, elapsed, message):
+        with self._lock:
+            self.latencies[operation].append(elapsed)
+            self.errors[operation] += 1
+            self.error_samples.setdefault(operation, message)
+
+    def merge(self, other):
+        """Add the results recorded by another Recorder (e.g. one returned by a worker process)"""
+        with self._lock:
+            for operation, values in other.latencies.items():
+                self.latencies[operation].extend(values)
+            for operation, count in other.errors.items():
+                self.errors[operation] += count
+            for operation, message in other.error_samples.items():
+                self.error_samples.setdefault(operation, message)
+
+    def __getstate__(self):
+        return {"latencies": dict(self.latencies), "errors": dict(self.errors),
+                "error_samples": self.error_samples}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.latencies.update(state["latencies"])
+        self.errors.update(state["errors"])
+        self.error_samples.update(state["error_samples"])
+
+def run_user_services(index, stage, recorder, think_time, auth, goal_manager):
+    """Signup → login → two goals → status toggles → feedback, through Auth and GoalManager"""
+    username = f"load-{stage}-{index}-{random.randrange(10**9)}"
+    password = "load-test-password"
+
+    def think():
+        if think_time:
+            time.sleep(random.uniform(0.5, 1.5) * think_time)
+
+    result = recorder.measure("signup", auth.register_user, username, password)
+    if not result or not result[0]:
+        if result:
+            recorder.fail("signup", 0.0, result[1])
+        return False
+    think()
+    result = recorder.measure("login", auth.login_user, username, password)
+    if not result or not result[0]:
+        return False
+    user_uuid = result[1]
+    think()
+
+    year = time.localtime().tm_year
+    for number in (1, 2):
+        recorder.measure("create_goal", goal_manager.create_goal, user_uuid,
+                         f"Goal {number} of {username}", "Load test goal description", year)
+        think()
+
+    goals = recorder.measure("get_user_goals", goal_manager.get_user_goals, user_uuid) or []
+    think()
+    for goal in goals:
+        for breakdown in goal.get('monthly_breakdowns', [])[:3]:
+            recorder.measure("toggle_status", goal_manager.update_monthly_breakdown,
+                             breakdown['uuid'], status="on_track", goal_uuid=goal['uuid'])
+        think()
+        recorder.measure("feedback", goal_manager.generate_feedback, goal['uuid'])
+        think()
+    return len(goals) == 2
+
+def _prune_stale_widgets(node):
+    """Drop widgets left in an AppTest element tree by a pass that st.rerun() interrupted.
+
+    Their state is gone from the session, so the next AppTest.run() would fail
+    with a KeyError while collecting widget states.
+    """
+    children = getattr(node, "children", None)
+    if not children:
+        return
+    for position, child in list(children.items()):
+        try:
+            child._widget_state
+        except KeyError:
+            del children[position]
+            continue
+        except Exception:
+            pass
+        _prune_stale_widgets(child)
+
+def run_user_apptest(index, stage, recorder, think_time, timeout):
+    """The same journey as full reruns of app.py through Streamlit's AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    username = f"load-{stage}-{index}-{random.randrange(10**9)}"
+    password = "load-test-password"
+
+    def think():
+        if think_time:
+            time.sleep(random.uniform(0.5, 1.5) * think_time)
+
+    def rerun(operation, action):
+        start = time.perf_counter()
+        try:
+            action()
+            at.run(timeout=timeout)
+            _prune_stale_widgets(at._tree)
+        except Exception as e:
+            recorder.fail(operation, time.perf_counter() - start, f"{type(e).__name__}: {str(e)}")
+            return False
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            recorder.fail(operation, elapsed, str(at.exception[0].value))
+            return False
+        with recorder._lock:
+            recorder.latencies[operation].append(elapsed)
+        return True
+
+    os.chdir(ROOT)
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=timeout)
+    if not rerun("page_load", lambda: None):
+        return False
+
+    def button(label):
+        return next(button for button in at.button if button.label.startswith(label))
+
+    # Login form: username, password; signup form: username, password, confirm
+    def signup():
+        inputs = at.text_input
+        inputs[2].input(username)
+        inputs[3].input(password)
+        inputs[4].input(password)
+        button("Sign Up").click()
+    if not rerun("signup", signup):
+        return False
+    think()
+
+    # Signing up logs the user in; log out to exercise the login form as well
+    if not rerun("logout", lambda: button("Logout").click()):
+        return False
+
+    def login():
+        at.text_input[0].input(username)
+        at.text_input[1].input(password)
+        button("Login").click()
+    if not rerun("login", login):
+        return False
+    think()
+
+    for number in (1, 2):
+        def create_goal():
+            at.text_input[0].input(f"Goal {number} of {username}")
+            at.text_area[0].input("Load test goal description")
+            button("Create Goal").click()
+        rerun("create_goal", create_goal)
+        think()
+
+    status_keys = [box.key for box in at.selectbox if box.key and box.key.startswith("status_")]
+    for key in status_keys[:3]:
+        rerun("toggle_status", lambda: at.selectbox(key=key).set_value("on_track"))
+        think()
+
+    feedback_keys = [button.key for button in at.button if button.key and button.key.startswith("feedback_btn_")]
+    for key in feedback_keys:
+        rerun("feedback", lambda: at.button(key=key).click())
+        think()
+    return len(feedback_keys) == 2
+
+def _apptest_worker(index, stage, think_time, timeout):
+    """Run one AppTest user in a worker process and return (completed, recorder)"""
+    recorder = Recorder()
+    try:
+        ok = run_user_apptest(index, stage, recorder, think_time, timeout)
+    except Exception as e:
+        recorder.fail("journey", 0.0, f"{type(e).__name__}: {str(e)}")
+        ok = False
+    return ok, recorder
+
+def run_stage(users, ramp_up, think_time, apptest, timeout, stage):
+    """Run one stage with the given number of concurrent users and return its results"""
+    import services
+
+    auth = services.get_auth()
+    goal_manager = services.get_goal_manager()
+    recorder = Recorder()
+    completed = []
+    threads = []
+
+    # AppTest keeps its runtime in process-wide state, so every AppTest user
+    # runs in its own worker process
+    pool = ProcessPoolExecutor(max_workers=users, mp_context=multiprocessing.get_context("spawn")) if apptest else None
+
+    def user(index):
+        try:
+            if apptest:
+                ok, worker_recorder = pool.submit(_apptest_worker, index, stage, think_time, timeout).result()
+                recorder.merge(worker_recorder)
+            else:
+                ok = run_user_services(index, stage, recorder, think_time, auth, goal_manager)
+        except Exception as e:
+            recorder.fail("journey", 0.0, f"{type(e).__name__}: {str(e)}")
+            ok = False
+        if ok:
+            completed.append(index)
+
+    start = time.perf_counter()
+    for index in range(users):
+        thread = threading.Thread(target=user, args=(index,), name=f"load-user-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+        if ramp_up and index < users - 1:
+            time.sleep(ramp_up / max(users - 1, 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if pool:
+        pool.shutdown()
+
+    operations = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "users": users,
+        "elapsed": elapsed,
+        "journeys": len(completed),
+        "operations": operations,
+        "throughput": operations / elapsed if elapsed else 0.0,
+        "recorder": recorder
+    }
+
+def print_stage(result):
+    recorder = result["recorder"]
+    print(f"\n== {result['users']} users: {result['journeys']}/{result['users']} journeys completed "
+          f"in {result['elapsed']:.1f}s, {result['throughput']:.1f} operations/s ==")
+    print(f"{'operation':<16}{'count':>7}{'errors':>8}{'error %':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for operation, values in recorder.latencies.items():
+        errors = recorder.errors.get(operation, 0)
+        print(f"{operation:<16}{len(values):>7}{errors:>8}{errors / len(values) * 100:>8.1f}%"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    for operation, message in recorder.error_samples.items():
+        print(f"  first {operation} error: {message}")
+
+def find_saturation(results):
+    """Get the first stage after which more users no longer raise throughput (None if throughput kept growing)"""
+    for previous, current in zip(results, results[1:]):
+        if current["throughput"] < previous["throughput"] * (1 + SATURATION_GAIN):
+            return previous
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="10", help="concurrent users, or a comma-separated list of stages")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between a user's steps in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds the mock Gibson adds to every query")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds the mock OpenAI adds to every completion")
+    parser.add_argument("--apptest", action="store_true", help="drive full Streamlit reruns through AppTest")
+    parser.add_argument("--timeout", type=float, default=30.0, help="AppTest rerun timeout in seconds")
+    args = parser.parse_args()
+    stages = [int(value) for value in args.users.split(",")]
+
+    gibson = MockGibsonServer(latency=args.db_latency).start()
+    openai_server = MockOpenAIServer(latency=args.llm_latency).start()
+
+    # Point the app at the mocks before its modules read their configuration
+    os.environ["GIBSON_ENDPOINT"] = gibson.endpoint
+    os.environ["OPENAI_BASE_URL"] = openai_server.base_url
+    os.environ.setdefault("GOAL_TRACKER_METRICS_PORT", "0")
+    os.environ.setdefault("GOAL_TRACKER_FEEDBACK_PREFETCH", "0")
+    if not os.path.exists(os.path.join(ROOT, os.environ.get("OPENAI_KEY_FILE", "openaikey.txt"))):
+        # The mock accepts any key
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("sk-load-test")
+        os.environ["OPENAI_KEY_FILE"] = f.name
+    os.chdir(ROOT)
+    # The mock servers import the app's modules, so settings were read before the overrides above
+    import config
+    importlib.reload(config)
+
+    print(f"Mock Gibson AI at {gibson.endpoint} (+{args.db_latency * 1000:.0f} ms), "
+          f"mock OpenAI at {openai_server.base_url} (+{args.llm_latency * 1000:.0f} ms)")
+    results = []
+    try:
+        for stage, users in enumerate(stages):
+            result = run_stage(users, args.ramp_up, args.think_time, args.apptest, args.timeout, stage)
+            results.append(result)
+            print_stage(result)
+    finally:
+        gibson.stop()
+        openai_server.stop()
+
+    print(f"\nUpstream requests: {gibson.requests} Gibson AI, {openai_server.requests} OpenAI")
+    if len(results) > 1:
+        saturated = find_saturation(results)
+        if saturated:
+            print(f"Saturation: throughput stops growing above {saturated['users']} users "
+                  f"({saturated['throughput']:.1f} operations/s)")
+        else:
+            print("Saturation: not reached, throughput grew at every stage")
+
+if __name__ == "__main__":
+    main()
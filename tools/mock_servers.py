@@ -0,0 +1,191 @@
+"""Local mock Gibson AI and OpenAI servers for load tests and benchmarks.
+
+The Gibson mock runs every query against the SQLite stand-in. The OpenAI mock
+answers chat completion requests with canned monthly breakdowns or feedback.
+Both can add a fixed latency per request to imitate the network round trip.
+
+Usage: python tools/mock_servers.py [--gibson-port 8601] [--openai-port 8602]
+"""
+import os
+import sys
+import re
+import gzip
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_backend import SQLiteBackend
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        encoding = self.headers.get("Content-Encoding", "")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "br":
+            import brotli
+            body = brotli.decompress(body)
+        return json.loads(body or b"{}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        # Compress large responses for clients that accept gzip, like a production server would
+        if self.mock.compress and len(body) >= 1024 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.mock.count_bytes(len(body))
+
+class _MockServer:
+    handler = None
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, compress=True):
+        self.latency = latency
+        self.compress = compress
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(self.handler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def count_bytes(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _GibsonHandler(_QuietHandler):
+    mock = None
+
+    def do_POST(self):
+        self.mock.count_request()
+        if not self.headers.get("X-Gibson-API-Key"):
+            self._send_json(401, {"detail": "Missing API key"})
+            return
+        try:
+            query = self._read_json()["query"]
+            result = self.mock.backend.execute(query)
+        except Exception as e:
+            self._send_json(400, {"detail": str(e)})
+            return
+        self._send_json(200, result)
+
+class MockGibsonServer(_MockServer):
+    """HTTP server answering Gibson AI query requests from a SQLite database"""
+    handler = _GibsonHandler
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, db_path=":memory:", compress=True):
+        super().__init__(host, port, latency, compress)
+        self.backend = SQLiteBackend(db_path)
+
+    @property
+    def endpoint(self):
+        return f"{self.url}/v1/-/query"
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December"]
+
+class _OpenAIHandler(_QuietHandler):
+    mock = None
+
+    def do_POST(self):
+        self.mock.count_request()
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        request = self._read_json()
+        system_prompt = request["messages"][0]["content"]
+        # Batched requests tag each goal with [goal_N] and get one entry per id
+        goal_ids = re.findall(r"^\[(goal_\d+)\]", request["messages"][-1]["content"], re.MULTILINE)
+        if "monthly breakdowns" in system_prompt:
+            months = [
+                {"month": month, "description": f"{name}: work on the next milestone of the goal"}
+                for month, name in enumerate(MONTH_NAMES, start=1)
+            ]
+            content = {"goals": [{"id": goal_id, "months": months} for goal_id in goal_ids]} if goal_ids \
+                else {"months": months}
+        else:
+            feedback = {"feedback_text": "Steady progress, keep the current pace.", "feedback_type": "affirm"}
+            content = {"goals": [dict(feedback, id=goal_id) for goal_id in goal_ids]} if goal_ids else feedback
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(content)}
+            }],
+            "usage": {"prompt_tokens": 200, "completion_tokens": 300, "total_tokens": 500}
+        })
+
+class MockOpenAIServer(_MockServer):
+    """HTTP server answering OpenAI chat completion requests with canned JSON"""
+    handler = _OpenAIHandler
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gibson-port", type=int, default=8601)
+    parser.add_argument("--openai-port", type=int, default=8602)
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to every query")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every completion")
+    parser.add_argument("--db-path", default=":memory:")
+    args = parser.parse_args()
+
+    gibson = MockGibsonServer(port=args.gibson_port, latency=args.db_latency, db_path=args.db_path).start()
+    openai_server = MockOpenAIServer(port=args.openai_port, latency=args.llm_latency).start()
+    print(f"GIBSON_ENDPOINT={gibson.endpoint}")
+    print(f"OPENAI_BASE_URL={openai_server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gibson.stop()
+        openai_server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+import config
+
+# Lightweight tracing.
+# span() opens a timed span as a child of the span active in the current
+# context. Spans started while no span is active are roots; they are grouped per
+# thread until finish_rerun() turns them into one trace for the rerun. Use
+# wrap() to carry the active span into work handed to another thread, and
+# wrap(detached=True) for work that can outlive it: that work's root spans get
+# a "follows_from" attribute naming the span that started it.
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_follows_from = contextvars.ContextVar("follows_from", default=None)
+_rerun = threading.local()
+# Root spans kept per thread between finish_rerun() calls
+MAX_PENDING_ROOTS = 500
+_recent_traces = deque(maxlen=50)
+_recent_lock = threading.Lock()
+
+class Span:
+    """One timed operation in a trace"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes)
+        self.thread = threading.current_thread().name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.children = []
+        self._lock = threading.Lock()
+
+    def set(self, **attributes) -> None:
+        """Add attributes to the span"""
+        self.attributes.update(attributes)
+
+    def _add_child(self, child: "Span") -> None:
+        with self._lock:
+            self.children.append(child)
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def to_dicts(self, trace_start: float) -> List[Dict[str, Any]]:
+        """Flatten the span and its descendants into dicts, ordered by start time"""
+        spans = [{
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": self.start_time,
+            "offset_ms": round((self.start_time - trace_start) * 1000, 3),
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "error": self.error
+        }]
+        with self._lock:
+            children = sorted(self.children, key=lambda child: child.start_time)
+        for child in children:
+            spans.extend(child.to_dicts(trace_start))
+        return spans
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a span of the current trace"""
+    parent = _current_span.get()
+    if parent is None and _follows_from.get() is not None:
+        attributes.setdefault("follows_from", _follows_from.get())
+    current = Span(name, parent, attributes)
+    if parent is not None:
+        parent._add_child(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        # Streamlit's rerun/stop signals are BaseExceptions but not failures
+        if isinstance(e, Exception):
+            current.error = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        if parent is None:
+            roots = getattr(_rerun, "roots", None)
+            if roots is None:
+                roots = _rerun.roots = []
+            roots.append(current)
+            if len(roots) > MAX_PENDING_ROOTS:
+                del roots[0]
+
+def traced(name: str):
+    """Decorator running the function inside a span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def link() -> Optional[Dict[str, str]]:
+    """A reference to the active span, for recording which span caused later work (None outside spans)"""
+    current = _current_span.get()
+    if current is None:
+        return _follows_from.get()
+    return {"span_id": current.span_id, "name": current.name}
+
+def wrap(function, detached: bool = False):
+    """Bind function to the current context so spans it opens on another thread join this trace.
+
+    With detached=True, for work that may run after the current span has
+    finished (timers, queued jobs), the function instead runs in a fresh context
+    - without the caller's deadline or rate limiter priority - and its root
+    spans record the current span as "follows_from".
+    """
+    if not detached:
+        context = contextvars.copy_context()
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return context.run(function, *args, **kwargs)
+        return wrapper
+    origin = link()
+    def run(*args, **kwargs):
+        _follows_from.set(origin)
+        return function(*args, **kwargs)
+    @functools.wraps(function)
+    def detached_wrapper(*args, **kwargs):
+        return contextvars.Context().run(run, *args, **kwargs)
+    return detached_wrapper
+
+def current_span() -> Optional[Span]:
+    """Get the span active in the current context"""
+    return _current_span.get()
+
+def _build_trace(name: str, roots: List[Span]) -> Dict[str, Any]:
+    trace_id = uuid.uuid4().hex
+    start = min(root.start_time for root in roots)
+    end = max(root.start_time + (root.duration or 0) for root in roots)
+    spans = []
+    for root in sorted(roots, key=lambda root: root.start_time):
+        for item in root.to_dicts(start):
+            item["trace_id"] = trace_id
+            spans.append(item)
+    return {
+        "trace_id": trace_id,
+        "name": name,
+        "start": start,
+        "duration_ms": round((end - start) * 1000, 3),
+        "spans": spans
+    }
+
+def finish_rerun(name: str = "rerun", **attributes) -> Optional[Dict[str, Any]]:
+    """Collect the root spans recorded on this thread into one trace and reset the collection"""
+    roots = getattr(_rerun, "roots", None) or []
+    _rerun.roots = []
+    if not roots:
+        return None
+    trace = _build_trace(name, roots)
+    trace["attributes"] = attributes
+    record(trace)
+    return trace
+
+def record(trace: Dict[str, Any]) -> None:
+    """Keep a finished trace in the in-memory buffer and append it to the export file if configured"""
+    with _recent_lock:
+        _recent_traces.append(trace)
+    if config.TRACE_EXPORT_PATH:
+        try:
+            export_jsonl([trace], config.TRACE_EXPORT_PATH)
+        except Exception as e:
+            print(f"Error exporting trace: {str(e)}")
+
+def recent_traces() -> List[Dict[str, Any]]:
+    """Get the most recent traces of this process, oldest first"""
+    with _recent_lock:
+        return list(_recent_traces)
+
+def to_jsonl(traces: List[Dict[str, Any]]) -> str:
+    """Serialize traces as JSON Lines, one trace per line"""
+    return "".join(json.dumps(trace, default=str) + "\n" for trace in traces)
+
+def export_jsonl(traces: List[Dict[str, Any]], path: str) -> None:
+    """Append traces to a JSON Lines file, one trace per line"""
+    with _recent_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(to_jsonl(traces))
@@ -0,0 +1,130 @@
+import gzip
+import json
+import importlib.util
+from typing import Any, Dict, Optional
+import requests
+import httpx
+
+# HTTP transports for Gibson AI queries.
+# Database.execute_query hands each query to a transport that POSTs it and
+# returns the decoded JSON result. "requests" is the pooled HTTP/1.1 session
+# the app has always used; "httpx" multiplexes concurrent queries over one
+# HTTP/2 connection when the h2 package is installed (HTTP/1.1 otherwise).
+# Both ask for compressed responses (gzip, and brotli when the brotli package
+# is installed) and can compress large request bodies. post() takes the
+# timeout of the call, which Database derives from the current deadline.
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+TRANSPORTS = ("requests", "httpx")
+REQUEST_ENCODINGS = ("", "gzip", "br")
+
+class TransportError(Exception):
+    """Raised when a request fails; status and detail come from the response, if there was one"""
+
+    def __init__(self, message, status=None, detail=None):
+        super().__init__(message)
+        self.status = status
+        self.detail = detail
+
+def accept_encoding() -> str:
+    """The response encodings this process can decode"""
+    return "br, gzip, deflate" if BROTLI_AVAILABLE else "gzip, deflate"
+
+def encode_body(payload: Any, encoding: str = "", min_bytes: int = 1024):
+    """Serialize payload to JSON and compress it when it is at least min_bytes long.
+
+    Returns (body, headers). Brotli falls back to gzip when the brotli package
+    is not installed.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if not encoding or len(body) < min_bytes:
+        return body, headers
+    if encoding == "br" and BROTLI_AVAILABLE:
+        import brotli
+        body = brotli.compress(body)
+    else:
+        encoding = "gzip"
+        body = gzip.compress(body, compresslevel=5)
+    headers["Content-Encoding"] = encoding
+    return body, headers
+
+def _error_detail(text: str) -> Optional[str]:
+    if not text:
+        return None
+    try:
+        return json.loads(text).get("detail", "")
+    except (ValueError, AttributeError):
+        return text
+
+class RequestsTransport:
+    """Pooled keep-alive HTTP/1.1 connections through a requests.Session"""
+    name = "requests"
+
+    def __init__(self, request_encoding: str = "", compress_min_bytes: int = 1024):
+        self.request_encoding = request_encoding
+        self.compress_min_bytes = compress_min_bytes
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = accept_encoding()
+
+    def post(self, url: str, headers: Dict[str, str], payload: Any, timeout: Optional[float] = None) -> Any:
+        body, body_headers = encode_body(payload, self.request_encoding, self.compress_min_bytes)
+        try:
+            response = self.session.post(url, headers={**headers, **body_headers}, data=body, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            response = getattr(e, 'response', None)
+            if response is None:
+                raise TransportError(str(e))
+            raise TransportError(str(e), status=response.status_code, detail=_error_detail(response.text))
+
+    def close(self) -> None:
+        self.session.close()
+
+class HttpxTransport:
+    """httpx client; concurrent queries share one HTTP/2 connection when h2 is installed"""
+    name = "httpx"
+
+    def __init__(self, http2: bool = True, request_encoding: str = "", compress_min_bytes: int = 1024,
+                 max_connections: int = 16, timeout: float = 30.0):
+        self.request_encoding = request_encoding
+        self.compress_min_bytes = compress_min_bytes
+        if http2 and not HTTP2_AVAILABLE:
+            print("HTTP/2 requested for Gibson AI but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"Accept-Encoding": accept_encoding()},
+            timeout=timeout
+        )
+
+    def post(self, url: str, headers: Dict[str, str], payload: Any, timeout: Optional[float] = None) -> Any:
+        body, body_headers = encode_body(payload, self.request_encoding, self.compress_min_bytes)
+        try:
+            response = self.client.post(url, headers={**headers, **body_headers}, content=body,
+                                        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            raise TransportError(str(e), status=e.response.status_code, detail=_error_detail(e.response.text))
+        except (httpx.HTTPError, ValueError) as e:
+            raise TransportError(str(e))
+
+    def close(self) -> None:
+        self.client.close()
+
+def create_transport(name: str, http2: bool = True, request_encoding: str = "",
+                     compress_min_bytes: int = 1024, max_connections: int = 16):
+    """Build the transport called name ("requests" or "httpx")"""
+    if request_encoding not in REQUEST_ENCODINGS:
+        raise ValueError(f"Unknown request encoding {request_encoding!r}, expected one of {REQUEST_ENCODINGS}")
+    if name == "requests":
+        return RequestsTransport(request_encoding, compress_min_bytes)
+    if name == "httpx":
+        return HttpxTransport(http2, request_encoding, compress_min_bytes, max_connections)
+    raise ValueError(f"Unknown Gibson AI transport {name!r}, expected one of {TRANSPORTS}")
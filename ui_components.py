@@ -1,6 +1,13 @@
 import streamlit as st
 import datetime
+import html
 from typing import Dict, List, Any, Callable
+import config
+import tracing
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+STATUS_OPTIONS = ['not_started', 'ahead', 'on_track', 'behind']
+STATUS_ICONS = {'ahead': '🟢', 'on_track': '🔵', 'behind': '🔴', 'not_started': '⚪'}
 
 def render_header():
     """Render the app header"""
@@ -70,16 +77,23 @@ def render_goal_creation_form(create_goal_callback: Callable, year: int = None):
 
 def render_year_timeline(goals_data: List[Dict[str, Any]], 
                         update_status_callback: Callable,
-                        view_feedback_callback: Callable):
+                        view_feedback_callback: Callable,
+                        mode: str = None):
     """Render a visual timeline of the year with monthly goal tracking"""
     if not goals_data:
         st.info("No goals have been created yet. Create your first goal above.")
         return
         
+    if mode is None:
+        mode = config.TIMELINE_RENDER_MODE
+    if mode == "editor":
+        render_year_timeline_editor(goals_data, update_status_callback, view_feedback_callback)
+        return
+        
     st.header("Year Timeline")
     
     # Month abbreviations
-    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    months = MONTH_NAMES
     current_month = datetime.datetime.now().month
     
     # Create a goal section for each goal
@@ -132,14 +146,14 @@ def render_year_timeline(goals_data: List[Dict[str, Any]],
                     # Show status selection for all months
                     new_status = st.selectbox(
                         f"Status", 
-                        options=['not_started', 'ahead', 'on_track', 'behind'],
-                        index=['not_started', 'ahead', 'on_track', 'behind'].index(status),
+                        options=STATUS_OPTIONS,
+                        index=STATUS_OPTIONS.index(status),
                         key=f"status_{goal['uuid']}_{month_num}",
                         label_visibility="collapsed"
                     )
                     
                     if new_status != status:
-                        update_status_callback(breakdown['uuid'], new_status)
+                        update_status_callback(breakdown['uuid'], new_status, goal['uuid'])
                     
                     # Format the milestone text with color
                     st.markdown(
@@ -163,6 +177,70 @@ def render_year_timeline(goals_data: List[Dict[str, Any]],
                  on_click=lambda uuid=goal['uuid']: view_feedback_callback(uuid))
         st.divider()
 
+def render_year_timeline_editor(goals_data: List[Dict[str, Any]],
+                               update_status_callback: Callable,
+                               view_feedback_callback: Callable):
+    """Render the timeline with a single data editor per goal instead of a 12-column grid"""
+    st.header("Year Timeline")
+    current_month = datetime.datetime.now().month
+    
+    for goal in goals_data:
+        st.subheader(f"Goal: {goal['title']}")
+        
+        # One line of text replaces the four metric widgets
+        progress = int(goal.get('progress_percent', 0))
+        st.markdown(
+            f"**Overall Progress:** {progress}% &nbsp;·&nbsp; "
+            f"{STATUS_ICONS['ahead']} Ahead: {goal.get('ahead_count', 0)} &nbsp;·&nbsp; "
+            f"{STATUS_ICONS['on_track']} On Track: {goal.get('on_track_count', 0)} &nbsp;·&nbsp; "
+            f"{STATUS_ICONS['behind']} Behind: {goal.get('behind_count', 0)}"
+        )
+        
+        breakdowns = sorted(goal.get('monthly_breakdowns', []), key=lambda bd: bd['month'])
+        rows = []
+        for breakdown in breakdowns:
+            month_name = MONTH_NAMES[breakdown['month'] - 1]
+            status = breakdown.get('status', 'not_started')
+            rows.append({
+                "Month": f"{month_name} ◀" if breakdown['month'] == current_month else month_name,
+                "●": STATUS_ICONS.get(status, STATUS_ICONS['not_started']),
+                "Milestone": breakdown['description'],
+                "Status": status,
+            })
+        
+        if rows:
+            editor_key = f"timeline_editor_{goal['uuid']}"
+            st.data_editor(
+                rows,
+                key=editor_key,
+                hide_index=True,
+                use_container_width=True,
+                disabled=["Month", "●", "Milestone"],
+                column_config={
+                    "Status": st.column_config.SelectboxColumn(
+                        "Status", options=STATUS_OPTIONS, required=True
+                    ),
+                },
+                on_change=_apply_timeline_edits,
+                args=(editor_key, goal['uuid'], breakdowns, update_status_callback),
+            )
+        else:
+            st.caption("No milestones set")
+            
+        st.button("Get AI Feedback & Analysis", key=f"feedback_btn_{goal['uuid']}", 
+                 on_click=lambda uuid=goal['uuid']: view_feedback_callback(uuid))
+        st.divider()
+
+def _apply_timeline_edits(editor_key: str, goal_uuid: str, breakdowns: List[Dict[str, Any]],
+                          update_status_callback: Callable):
+    """Forward only the status cells that were edited in a timeline data editor"""
+    edited_rows = st.session_state[editor_key].get("edited_rows", {})
+    for row_index, changes in edited_rows.items():
+        new_status = changes.get("Status")
+        breakdown = breakdowns[int(row_index)]
+        if new_status and new_status != breakdown.get('status'):
+            update_status_callback(breakdown['uuid'], new_status, goal_uuid)
+
 def render_feedback(feedback_data: Dict[str, Any]):
     """Render AI feedback and analysis"""
     if not feedback_data:
@@ -197,8 +275,59 @@ def render_feedback(feedback_data: Dict[str, Any]):
         f"</div>",
         unsafe_allow_html=True
     )
+    if feedback_data.get('stale'):
+        st.caption("New feedback took too long to generate; showing the most recent earlier feedback.")
 
-def render_debug_info(debug_data: Dict[str, Any]):
+def render_debug_info(debug_data: Dict[str, Any], traces: List[Dict[str, Any]] = None,
+                      hot_functions: List[tuple] = None):
     """Render debug information in a collapsible section"""
     with st.expander("Debug Information", expanded=False):
         st.json(debug_data)
+        
+        if hot_functions:
+            st.markdown("**Hot functions** (self samples across profiled reruns)")
+            st.markdown(
+                "| Function | Samples | Share |\n|---|---:|---:|\n" +
+                "\n".join(f"| `{function}` | {samples} | {share}% |" for function, samples, share in hot_functions)
+            )
+        
+        if traces:
+            trace = traces[-1]
+            st.markdown(f"**Last rerun trace** ({trace['duration_ms']:.1f} ms, {len(trace['spans'])} spans)")
+            render_trace_waterfall(trace)
+            st.download_button(
+                "Download traces (JSON Lines)",
+                data=tracing.to_jsonl(traces),
+                file_name="traces.jsonl",
+                mime="application/x-ndjson"
+            )
+
+def render_trace_waterfall(trace: Dict[str, Any]):
+    """Render the spans of a trace as a waterfall of horizontal bars"""
+    total = max(trace['duration_ms'], 0.001)
+    depths = {}
+    rows = []
+    for span in trace['spans']:
+        depth = depths.get(span['parent_id'], -1) + 1
+        depths[span['span_id']] = depth
+        
+        left = min(span['offset_ms'] / total * 100, 100)
+        width = max(min(span['duration_ms'] / total * 100, 100 - left), 0.3)
+        color = '#F44336' if span.get('error') else '#2196F3'
+        label = span['name']
+        table = span['attributes'].get('table')
+        if table:
+            label += f" ({table})"
+        rows.append(
+            f"<tr title='{html.escape(span.get('error') or '', quote=True)}'>"
+            f"<td style='padding-left: {depth * 12}px; white-space: nowrap;'>{html.escape(label)}</td>"
+            f"<td style='width: 60%;'><div style='position: relative; height: 12px;'>"
+            f"<div style='position: absolute; left: {left:.2f}%; width: {width:.2f}%; height: 12px; "
+            f"background-color: {color};'></div></div></td>"
+            f"<td style='text-align: right; white-space: nowrap;'>{span['duration_ms']:.1f} ms</td>"
+            f"</tr>"
+        )
+    st.markdown(
+        f"<table style='width: 100%; font-size: 0.75em;'>{''.join(rows)}</table>",
+        unsafe_allow_html=True
+    )
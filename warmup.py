@@ -0,0 +1,163 @@
+"""Warm-up of connections and caches after the process starts.
+
+Without it the first user after a deploy pays for the TLS handshakes to
+Gibson AI and OpenAI, the import of the openai package, bcrypt's first hash
+and empty caches. services.get_warmup() starts one WarmUp per process from
+app.py; its steps run in order in a background thread, at background priority,
+and a step that fails does not stop the ones after it:
+
+  imports   import the modules in GOAL_TRACKER_WARMUP_IMPORTS
+  gibson    send one query, opening a pooled connection to Gibson AI
+  openai    build the AIService and fetch its model, opening a connection to OpenAI
+  bcrypt    hash and verify a throwaway password
+  goals     load the goals of the users who logged in most recently on this
+            host through the Database read cache
+
+The process is ready once every step has finished, whatever its outcome:
+WarmUp.is_ready(), /ready on the metrics server and goal_tracker_warmup_ready
+report it, and goal_tracker_warmup_seconds the time each step took.
+"""
+import os
+import json
+import time
+import secrets
+import importlib
+import threading
+from typing import Dict, List, Optional, Tuple
+import metrics
+import rate_limiter
+import tracing
+import deadlines
+
+STEPS = ("imports", "gibson", "openai", "bcrypt", "goals")
+
+class RecentUsers:
+    """UUIDs of the users who logged in most recently on this host, newest first, in a small JSON file"""
+
+    def __init__(self, path: str, max_users: int = 20):
+        self.path = path
+        self.max_users = max_users
+        self._lock = threading.Lock()
+
+    def load(self) -> List[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                users = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+        return users[:self.max_users] if isinstance(users, list) else []
+
+    def note(self, user_uuid: str) -> None:
+        """Move user_uuid to the front; errors are printed, never raised to the login that called this"""
+        if self.max_users <= 0:
+            return
+        with self._lock:
+            users = [user_uuid] + [known for known in self.load() if known != user_uuid]
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "w", encoding="utf-8") as f:
+                    json.dump(users[:self.max_users], f)
+                # Other app processes on the host read and replace the same file
+                os.replace(temporary, self.path)
+            except OSError as e:
+                print(f"Failed to record recent user: {str(e)}")
+
+class WarmUp:
+    """Runs the warm-up steps once, in a background thread"""
+
+    def __init__(self, db, auth, goal_manager, recent_users: Optional[RecentUsers] = None,
+                 imports: List[str] = (), timeout: float = 10.0):
+        self.db = db
+        self.auth = auth
+        self.goal_manager = goal_manager
+        self.recent_users = recent_users
+        self.imports = list(imports)
+        self.timeout = timeout
+        # (outcome, seconds) of each finished step
+        self.results: Dict[str, Tuple[str, float]] = {}
+        self.seconds = None
+        self._ready = threading.Event()
+        self._thread = None
+        metrics.WARMUP_READY.set(0)
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait until the warm-up has finished; returns whether it has"""
+        return self._ready.wait(timeout)
+
+    def start(self) -> "WarmUp":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self) -> Dict[str, Tuple[str, float]]:
+        """Run every step in order and mark the process ready"""
+        start = time.monotonic()
+        try:
+            with rate_limiter.priority(rate_limiter.BACKGROUND):
+                for step in STEPS:
+                    self._run_step(step)
+        finally:
+            self.seconds = time.monotonic() - start
+            outcome = "ok" if all(result[0] != "error" for result in self.results.values()) else "partial"
+            metrics.WARMUP_SECONDS.set(self.seconds, step="total", outcome=outcome)
+            metrics.WARMUP_READY.set(1)
+            self._ready.set()
+        print(f"Warm-up finished in {self.seconds:.1f}s: "
+              + ", ".join(f"{step} {outcome}" for step, (outcome, _) in self.results.items()))
+        return self.results
+
+    def _run_step(self, step: str) -> None:
+        start = time.monotonic()
+        try:
+            outcome = getattr(self, f"_{step}")() or "ok"
+        except Exception as e:
+            print(f"Warm-up step {step} failed: {str(e)}")
+            outcome = "error"
+        finally:
+            tracing.finish_rerun("warmup", step=step)
+        seconds = time.monotonic() - start
+        self.results[step] = (outcome, seconds)
+        metrics.WARMUP_SECONDS.set(seconds, step=step, outcome=outcome)
+
+    def _imports(self) -> Optional[str]:
+        if not self.imports:
+            return "skipped"
+        for module in self.imports:
+            importlib.import_module(module)
+
+    def _gibson(self) -> None:
+        with deadlines.deadline(self.timeout):
+            self.db.execute_query("SELECT 1 AS `ok`", priority=rate_limiter.BACKGROUND)
+
+    def _openai(self) -> None:
+        ai_service = self.goal_manager.ai_service
+        try:
+            ai_service.openai.models.retrieve(ai_service.model, timeout=self.timeout)
+        except ai_service.openai.APIStatusError:
+            # Any HTTP answer means the connection is open
+            pass
+
+    def _bcrypt(self) -> None:
+        password = secrets.token_hex(8)
+        self.auth.verify_password(password, self.auth.hash_password(password))
+
+    def _goals(self) -> Optional[str]:
+        user_uuids = self.recent_users.load() if self.recent_users is not None else []
+        if not user_uuids:
+            return "skipped"
+        failed = 0
+        for user_uuid in user_uuids:
+            try:
+                with deadlines.deadline(self.timeout):
+                    self.goal_manager.get_user_goals(user_uuid)
+            except Exception as e:
+                print(f"Warm-up: failed to load goals of a recent user: {str(e)}")
+                failed += 1
+            finally:
+                tracing.finish_rerun("warmup", step="goals")
+        return "error" if failed == len(user_uuids) else "ok"